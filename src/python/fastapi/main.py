@@ -1,11 +1,83 @@
-from fastapi import FastAPI
+import os
+import sys
+from contextlib import asynccontextmanager
+from typing import List, Literal, Optional
+
+from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel, Field
+
+# Todoドメイン（Streamlitアプリのsrc）をパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'streamlit', 'src'))
+
+from async_repository import AsyncTodoRepositoryFactory
+from async_service import AsyncTodoService
+from instrumentation import REPOSITORY_METRICS, InstrumentedAsyncTodoRepository
+from write_behind import write_behind_prometheus
+
+
+class TodoCreate(BaseModel):
+    """Todo作成リクエスト"""
+    title: str = Field(..., min_length=1, max_length=255)
+    category_ids: List[int] = Field(default_factory=list)
+
+
+class TodoBulkCreate(BaseModel):
+    """Todo一括作成リクエスト"""
+    todos: List[TodoCreate]
+    batch_size: int = Field(1000, ge=1, le=10000)
+
+
+class TodoStateUpdate(BaseModel):
+    """Todo状態更新リクエスト"""
+    state: Literal["todo", "done"]
+
+
+class TodoBulkStateUpdate(BaseModel):
+    """Todo一括状態更新リクエスト（ids を省略するとフィルター条件に合う全てのTodoが対象）"""
+    state: Literal["todo", "done"]
+    ids: Optional[List[int]] = Field(None, max_length=10000)
+    filter_state: Literal["all", "todo", "done"] = "all"
+    category_id: Optional[int] = None
+
+
+class TodoBulkDelete(BaseModel):
+    """Todo一括削除リクエスト（ids を省略するとフィルター条件に合う全てのTodoが対象）"""
+    ids: Optional[List[int]] = Field(None, max_length=10000)
+    filter_state: Literal["all", "todo", "done"] = "all"
+    category_id: Optional[int] = None
+
+
+class CategoryCreate(BaseModel):
+    """カテゴリ作成リクエスト"""
+    title: str = Field(..., min_length=1, max_length=255)
+
+
+class CategoryBulkCreate(BaseModel):
+    """カテゴリ一括作成リクエスト"""
+    titles: List[str]
+    batch_size: int = Field(1000, ge=1, le=10000)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """アプリケーションの起動・終了処理（サービスはワーカー内で共有する）"""
+    # リポジトリの呼び出しは REPOSITORY_METRICS に記録し、/metrics で公開する
+    app.state.todo_service = AsyncTodoService(
+        InstrumentedAsyncTodoRepository(AsyncTodoRepositoryFactory.create_repository())
+    )
+    await app.state.todo_service.initialize_schema()
+    yield
+    await app.state.todo_service.close()
+
 
 # FastAPIアプリケーションのインスタンスを作成
 app = FastAPI(
     title="Hello World API",
-    description="A simple FastAPI Hello World application",
-    version="1.0.0"
+    description="A simple FastAPI Hello World application with a Todo API",
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORSミドルウェアを追加
@@ -17,6 +89,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+def get_todo_service() -> AsyncTodoService:
+    """共有のTodoサービスを取得"""
+    return app.state.todo_service
+
+
+def ensure_all_created(created_ids: List[int], expected: int, label: str) -> None:
+    """一括作成で全件が追加されなかった場合は400を返す（途中まで追加したIDは detail に含める）"""
+    if expected and not created_ids:
+        raise HTTPException(status_code=400, detail=f"{label}の追加に失敗しました")
+    if len(created_ids) < expected:
+        raise HTTPException(status_code=400, detail={
+            "message": f"{label}の一括追加が途中で失敗しました（{expected}件中{len(created_ids)}件を追加）",
+            "ids": created_ids,
+        })
+
 @app.get("/")
 async def root():
     """
@@ -38,6 +126,148 @@ async def health_check():
     """
     return {"status": "healthy", "service": "fastapi-hello-world"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    リポジトリ呼び出し・SQL・ライトビハインドのメトリクス（Prometheusのテキスト形式）
+    """
+    return PlainTextResponse(REPOSITORY_METRICS.to_prometheus() + write_behind_prometheus(),
+                             media_type="text/plain; version=0.0.4")
+
+@app.get("/todos")
+async def list_todos(
+    state: Literal["all", "todo", "done"] = "all",
+    category_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    with_categories: bool = True
+):
+    """
+    Todo一覧（新しい順、キーセットページング）- 次ページは next_cursor を cursor に指定
+    """
+    try:
+        return await get_todo_service().get_todos_page(state, category_id, limit, cursor, with_categories)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/todos/search")
+async def search_todos(
+    q: str = Query(..., min_length=1, max_length=255),
+    state: Literal["all", "todo", "done"] = "all",
+    category_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
+    with_categories: bool = True
+):
+    """
+    Todo検索（タイトルの部分一致、空白区切りの語は全て含むもの）- 新しい順
+    """
+    return await get_todo_service().search_todos(q, state, category_id, limit, with_categories)
+
+@app.post("/todos", status_code=201)
+async def create_todo(todo: TodoCreate):
+    """
+    Todo作成
+    """
+    todo_ids = await get_todo_service().bulk_add_todos([todo.model_dump()])
+    if not todo_ids:
+        raise HTTPException(status_code=400, detail="Todoの追加に失敗しました")
+    return {"id": todo_ids[0]}
+
+@app.post("/todos/bulk", status_code=201)
+async def bulk_create_todos(request: TodoBulkCreate):
+    """
+    Todo一括作成（空白だけのタイトルは追加しない）
+    """
+    todos = [todo.model_dump() for todo in request.todos if todo.title.strip()]
+    todo_ids = await get_todo_service().bulk_add_todos(todos, request.batch_size)
+    ensure_all_created(todo_ids, len(todos), "Todo")
+    return {"ids": todo_ids}
+
+@app.post("/todos/bulk/state")
+async def bulk_update_todo_state(request: TodoBulkStateUpdate):
+    """
+    Todo一括状態更新（1つのUPDATE文）
+    """
+    todo_service = get_todo_service()
+    if request.ids is not None:
+        updated = await todo_service.bulk_update_state(request.ids, request.state)
+    else:
+        updated = await todo_service.update_state_where(request.state, request.filter_state, request.category_id)
+    return {"updated": updated}
+
+@app.post("/todos/bulk/delete")
+async def bulk_delete_todos(request: TodoBulkDelete):
+    """
+    Todo一括削除（1つのDELETE文）
+    """
+    todo_service = get_todo_service()
+    if request.ids is not None:
+        return {"deleted": await todo_service.bulk_delete(request.ids)}
+    if request.filter_state == "all" and request.category_id is None:
+        raise HTTPException(status_code=400, detail="ids または絞り込み条件を指定してください")
+    return {"deleted": await todo_service.delete_where(request.filter_state, request.category_id)}
+
+@app.patch("/todos/{todo_id}")
+async def update_todo_state(todo_id: int, update: TodoStateUpdate):
+    """
+    Todo状態更新
+    """
+    if not await get_todo_service().update_todo_state(todo_id, update.state):
+        raise HTTPException(status_code=404, detail="Todoが見つかりません")
+    return {"id": todo_id, "state": update.state}
+
+@app.delete("/todos/{todo_id}", status_code=204)
+async def delete_todo(todo_id: int):
+    """
+    Todo削除
+    """
+    if not await get_todo_service().delete_todo(todo_id):
+        raise HTTPException(status_code=404, detail="Todoが見つかりません")
+    return Response(status_code=204)
+
+@app.get("/todos/{todo_id}/categories")
+async def get_todo_categories(todo_id: int):
+    """
+    Todoのカテゴリ一覧
+    """
+    return await get_todo_service().get_todo_categories(todo_id)
+
+@app.get("/categories")
+async def list_categories():
+    """
+    カテゴリ一覧
+    """
+    return await get_todo_service().get_all_categories()
+
+@app.post("/categories", status_code=201)
+async def create_category(category: CategoryCreate):
+    """
+    カテゴリ作成
+    """
+    category_ids = await get_todo_service().bulk_add_categories([category.title])
+    if not category_ids:
+        raise HTTPException(status_code=400, detail="カテゴリの追加に失敗しました")
+    return {"id": category_ids[0]}
+
+@app.post("/categories/bulk", status_code=201)
+async def bulk_create_categories(request: CategoryBulkCreate):
+    """
+    カテゴリ一括作成（空白だけのタイトルは追加しない）
+    """
+    titles = [title for title in request.titles if title.strip()]
+    category_ids = await get_todo_service().bulk_add_categories(titles, request.batch_size)
+    ensure_all_created(category_ids, len(titles), "カテゴリ")
+    return {"ids": category_ids}
+
+@app.get("/statistics")
+async def get_statistics():
+    """
+    統計情報（全体とカテゴリ別）
+    """
+    todo_service = get_todo_service()
+    statistics = await todo_service.get_statistics()
+    return {**statistics, "by_category": await todo_service.get_category_statistics()}
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -27,6 +27,8 @@ def test_memory_database():
     # リポジトリを作成
     repository = TodoRepositoryFactory.create_repository()
     service = TodoService(repository)
+    # スキーマ移行を適用（最初の操作の前にも自動で適用されるが、失敗をここで検出する）
+    service.initialize_schema()
     
     # テストデータを作成
     print("📝 テストデータを作成中...")
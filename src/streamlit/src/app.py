@@ -1,20 +1,55 @@
 import streamlit as st
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 import os
 from dotenv import load_dotenv
 from service import TodoService
+from repository import TodoRepositoryFactory
+from instrumentation import REPOSITORY_METRICS, InstrumentedTodoRepository, RequestStats
+from profiler import RerunProfiler
 
 # 環境変数の読み込み
 load_dotenv('env.local')
 
+# Todoリストの1ページあたりの表示件数（既定値）と選択肢
+TODO_PAGE_SIZE = int(os.getenv('TODO_PAGE_SIZE', '20'))
+TODO_PAGE_SIZE_OPTIONS = sorted({10, 20, 50, 100, TODO_PAGE_SIZE})
+# Todoリストの表示形式
+VIEW_MODES = {"list": "リスト", "table": "テーブル"}
+# 検索結果の最大表示件数
+TODO_SEARCH_LIMIT = int(os.getenv('TODO_SEARCH_LIMIT', '50'))
+# デバッグ情報パネルを表示するか（本番では無効）
+APP_DEBUG = os.getenv('APP_DEBUG', 'false').lower() in ('1', 'true', 'yes', 'on')
+# デバッグ情報に含めるTodo・カテゴリの件数
+DEBUG_SAMPLE_SIZE = int(os.getenv('DEBUG_SAMPLE_SIZE', '10'))
+
+@st.cache_resource
+def get_todo_service() -> TodoService:
+    """プロセス内で共有するTodoサービスを取得（初回のみ作成し、スキーマ移行を適用）
+
+    リポジトリ・接続プール・キャッシュは全セッションで共有される。
+    リポジトリの呼び出しは REPOSITORY_METRICS に記録される。
+    """
+    todo_service = TodoService(InstrumentedTodoRepository(TodoRepositoryFactory.create_repository()))
+    todo_service.initialize_schema()
+    return todo_service
+
 def initialize_session_state() -> None:
     """初期化処理：セッション状態の設定"""
     if 'todo_service' not in st.session_state:
-        st.session_state.todo_service = TodoService()
+        st.session_state.todo_service = get_todo_service()
     if 'filter_state' not in st.session_state:
         st.session_state.filter_state = "all"
     if 'filter_category' not in st.session_state:
         st.session_state.filter_category = None
+    if 'page_cursor' not in st.session_state:
+        st.session_state.page_cursor = None
+    if 'page_history' not in st.session_state:
+        # 前のページのカーソル（戻る操作用のスタック）
+        st.session_state.page_history = []
+    if 'page_size' not in st.session_state:
+        st.session_state.page_size = TODO_PAGE_SIZE
+    if 'debug_cursor' not in st.session_state:
+        st.session_state.debug_cursor = None
 
 def display_database_info() -> None:
     """データベース情報の表示"""
@@ -28,21 +63,38 @@ def display_database_info() -> None:
     db_type = db_info['database_type']
     if db_type == 'MEMORY':
         st.sidebar.info("💾 メモリ内データベース")
+        persistence = db_info.get('persistence')
+        if persistence:
+            st.sidebar.caption(f"永続化: {persistence['data_dir']}（fsync: {persistence['fsync']}）")
     elif db_type == 'NEON':
         st.sidebar.success("☁️ Neon PostgreSQL")
         st.sidebar.caption(f"ホスト: {db_info.get('neon_host', 'N/A')}")
         st.sidebar.caption(f"データベース: {db_info.get('neon_database', 'N/A')}")
+        pool_stats = db_info.get('pool')
+        if pool_stats:
+            st.sidebar.caption(
+                f"接続プール: 使用中 {pool_stats['in_use']} / "
+                f"接続数 {pool_stats['size']} (最大 {pool_stats['max_size']})"
+            )
+        write_behind = db_info.get('write_behind')
+        if write_behind:
+            st.sidebar.caption(f"ライトビハインド: 未反映 {write_behind['pending'] + write_behind['in_flight']} 件")
+            if write_behind['dropped']:
+                st.sidebar.warning(f"⚠️ 反映できずに破棄した書き込み: {write_behind['dropped']} 件")
+                with st.sidebar.expander("破棄した書き込み"):
+                    st.json(db_info.get('write_behind_dead_letters', []))
+    elif db_type == 'SQLITE':
+        st.sidebar.success("🗃️ SQLite（WALモード）")
+        st.sidebar.caption(f"ファイル: {db_info.get('sqlite_path', 'N/A')}")
     
     st.sidebar.caption(f"リポジトリ: {db_info['repository_class']}")
 
 def display_todos(todos: List[Dict[str, Any]]) -> None:
-    """Todoリストの表示"""
+    """Todoリストの表示（各Todoに 'categories' が付与されていること）"""
     if not todos:
         st.info("📝 該当するTodoはありません")
         return
     
-    todo_service = st.session_state.todo_service
-    
     for todo in todos:
         with st.container():
             col1, col2 = st.columns([5, 1])
@@ -52,17 +104,96 @@ def display_todos(todos: List[Dict[str, Any]]) -> None:
                 st.write(f"{status_icon} **{todo['title']}** ({status_text})")
                 
                 # カテゴリの表示
-                categories = todo_service.get_todo_categories(todo['id'])
+                categories = todo.get('categories', [])
                 if categories:
                     category_tags = " ".join([f"🏷️{cat['title']}" for cat in categories])
                     st.caption(category_tags)
                 
                 # 作成日時の表示（存在する場合）
                 if 'created_at' in todo:
-                    st.caption(f"作成: {todo['created_at'][:19]}")
+                    st.caption(f"作成: {str(todo['created_at'])[:19]}")
             with col2:
                 st.caption(f"ID: {todo['id']}")
 
+def reset_paging() -> None:
+    """Todoリストを先頭ページに戻す（フィルターや表示件数を変えたとき）"""
+    st.session_state.page_cursor = None
+    st.session_state.page_history = []
+
+def display_todo_table(todos: List[Dict[str, Any]]) -> List[int]:
+    """Todoリストを1つの表として表示し、選択された行のTodoIDを返す（各Todoに 'categories' が付与されていること）"""
+    if not todos:
+        st.info("📝 該当するTodoはありません")
+        return []
+    
+    event = st.dataframe(
+        [
+            {
+                "ID": todo['id'],
+                "タイトル": todo['title'],
+                "状態": "完了" if todo['state'] == 'done' else "未完了",
+                "カテゴリ": ", ".join(cat['title'] for cat in todo.get('categories', [])),
+                "作成日時": str(todo.get('created_at', ''))[:19],
+            }
+            for todo in todos
+        ],
+        hide_index=True,
+        use_container_width=True,
+        key="todo_table",
+        on_select="rerun",
+        selection_mode="multi-row"
+    )
+    return [todos[row]['id'] for row in event.selection.rows if row < len(todos)]
+
+def display_bulk_actions(todo_ids: List[int], selected_ids: List[int], filter_label: str) -> None:
+    """表示中のTodoに対する一括操作（それぞれ1回のリポジトリ呼び出しで実行）"""
+    todo_service = st.session_state.todo_service
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        # 選択が無い場合は表示中のページ全体が対象
+        target_ids = selected_ids or todo_ids
+        label = f"選択した{len(selected_ids)}件" if selected_ids else "このページの全て"
+        if st.button(f"✅ {label}を完了にする", use_container_width=True, disabled=not target_ids):
+            updated = todo_service.bulk_update_state(target_ids, "done")
+            st.toast(f"{updated}件を完了にしました")
+            st.rerun()
+    with col2:
+        if st.button(f"✅ {filter_label} を全て完了にする", use_container_width=True):
+            updated = todo_service.update_state_where(
+                "done", st.session_state.filter_state, st.session_state.filter_category
+            )
+            st.toast(f"{updated}件を完了にしました")
+            st.rerun()
+    with col3:
+        if st.button(f"🗑️ 選択した{len(selected_ids)}件を削除", use_container_width=True, disabled=not selected_ids):
+            deleted = todo_service.bulk_delete(selected_ids)
+            reset_paging()
+            st.toast(f"{deleted}件を削除しました")
+            st.rerun()
+
+def display_page_navigation(next_cursor: Optional[str]) -> None:
+    """Todoリストのページ送りの表示"""
+    page_number = len(st.session_state.page_history) + 1
+    col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
+    with col1:
+        if st.session_state.page_history:
+            if st.button("⏮ 最初のページ", use_container_width=True):
+                reset_paging()
+                st.rerun()
+    with col2:
+        if st.session_state.page_history:
+            if st.button("◀ 前のページ", use_container_width=True):
+                st.session_state.page_cursor = st.session_state.page_history.pop()
+                st.rerun()
+    with col3:
+        st.caption(f"{page_number} ページ目")
+    with col4:
+        if next_cursor is not None:
+            if st.button("次のページ ▶", use_container_width=True):
+                st.session_state.page_history.append(st.session_state.page_cursor)
+                st.session_state.page_cursor = next_cursor
+                st.rerun()
+
 def display_statistics() -> None:
     """統計情報の表示"""
     todo_service = st.session_state.todo_service
@@ -75,29 +206,127 @@ def display_statistics() -> None:
         st.metric("未完了", stats['todo'])
     with col3:
         st.metric("完了", stats['done'])
+    
+    # カテゴリ別の完了状況
+    category_stats = [cat for cat in todo_service.get_category_statistics() if cat['total'] > 0]
+    if category_stats:
+        st.caption(" ".join(
+            f"🏷️{cat['title']}: {cat['done']}/{cat['total']} 完了" for cat in category_stats
+        ))
 
 def main() -> None:
-    """メイン処理"""
+    """メイン処理（1回の再実行で行ったリポジトリ操作を集計する）"""
     st.set_page_config(
         page_title="Simple Todo App",
         page_icon="📝",
         layout="wide"
     )
     
-    initialize_session_state()
+    with REPOSITORY_METRICS.request_scope() as request_stats:
+        # TODO_PROFILE が有効な場合のみ計測する
+        profiler = RerunProfiler(request_stats)
+        profiler.start()
+        try:
+            render_page(request_stats, profiler)
+        finally:
+            profiler.finish()
+        display_profile(profiler)
+
+def display_profile(profiler: RerunProfiler) -> None:
+    """再実行のプロファイル（ウォーターフォール）をサイドバーに表示"""
+    if not profiler.enabled:
+        return
+    import altair as alt
+    import pandas as pd
+    
+    rows = profiler.timeline()
+    st.sidebar.markdown("---")
+    st.sidebar.subheader("⏱️ プロファイル")
+    repository_ms = sum(row['ms'] for row in rows if row['kind'] == 'repository')
+    st.sidebar.caption(f"再実行: {profiler.total_ms:.1f} ms / リポジトリ呼び出し: {repository_ms:.1f} ms")
+    if rows:
+        # 同名の呼び出しが重ならないよう、行番号付きのラベルにする
+        frame = pd.DataFrame(rows)
+        frame['label'] = [f"{i:02d} {row['name']}" for i, row in enumerate(rows)]
+        chart = alt.Chart(frame).mark_bar().encode(
+            x=alt.X('start_ms:Q', title='ms'),
+            x2='end_ms:Q',
+            y=alt.Y('label:N', sort=None, title=None),
+            color=alt.Color('kind:N', legend=alt.Legend(orient='bottom', title=None)),
+            tooltip=['kind', 'name', 'start_ms', 'ms']
+        )
+        st.sidebar.altair_chart(chart, use_container_width=True)
+    if profiler.dump_path:
+        st.sidebar.caption(f"cProfile: {profiler.dump_path}")
+        with st.sidebar.expander("累積時間の長い関数"):
+            st.code(profiler.top_functions())
+
+def display_debug_panel(request_stats: RequestStats) -> None:
+    """デバッグ情報の表示（折りたたみ中も実行されるため、データは要求されたときだけ読み込む）"""
+    todo_service = st.session_state.todo_service
+    with st.expander("🔧 デバッグ情報", expanded=False):
+        # この再実行でのリポジトリ呼び出し・SQL（キャッシュヒットは含まれない）
+        summary = request_stats.summary()
+        st.caption(
+            f"この再実行のリポジトリ呼び出し: {summary['calls']} 回 / {summary['repository_ms']} ms, "
+            f"DB往復: {summary['round_trips']} 回"
+        )
+        st.json(summary, expanded=False)
+        
+        if not st.toggle("診断情報を読み込む", key="debug_load"):
+            return
+        debug_info = todo_service.get_debug_info(DEBUG_SAMPLE_SIZE)
+        debug_info.update({
+            "current_filter": st.session_state.filter_state,
+            "filter_category": st.session_state.filter_category,
+            "database_info": todo_service.get_database_info()
+        })
+        st.json(debug_info, expanded=False)
+        
+        # 全Todoをページ単位で確認
+        if not st.toggle("全Todoをページ送りで表示", key="debug_browse"):
+            return
+        page = todo_service.get_todos_page(
+            limit=DEBUG_SAMPLE_SIZE, cursor=st.session_state.debug_cursor, with_categories=True
+        )
+        st.json(page['items'])
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.session_state.debug_cursor is not None:
+                if st.button("⏮ 先頭", key="debug_first"):
+                    st.session_state.debug_cursor = None
+                    st.rerun()
+        with col2:
+            if page['next_cursor'] is not None:
+                if st.button("次へ ▶", key="debug_next"):
+                    st.session_state.debug_cursor = page['next_cursor']
+                    st.rerun()
+
+def render_page(request_stats: RequestStats, profiler: RerunProfiler) -> None:
+    """ページの描画（フェーズごとに profiler で計測する）"""
+    profiler.start_phase("initialize")
+    try:
+        initialize_session_state()
+    except Exception as e:
+        # 失敗はキャッシュされないため、次回の再実行で再試行される
+        st.error(f"データベースの初期化に失敗しました: {e}")
+        st.stop()
     todo_service = st.session_state.todo_service
     
     # サイドバーにデータベース情報を表示
+    profiler.start_phase("database_info")
     display_database_info()
     
     st.title("📝 Simple Todo App")
     st.markdown("---")
     
     # 統計情報表示
+    profiler.start_phase("statistics")
     display_statistics()
     st.markdown("---")
     
     # カテゴリ管理
+    profiler.start_phase("categories")
     st.subheader("🏷️ カテゴリ管理")
     with st.form("add_category_form", clear_on_submit=True):
         col1, col2 = st.columns([4, 1])
@@ -130,6 +359,7 @@ def main() -> None:
     st.markdown("---")
 
     # Todo追加フォーム
+    profiler.start_phase("add_todo_form")
     st.subheader("✏️ 新しいTodoを追加")
     with st.form("add_todo_form", clear_on_submit=True):
         new_todo_title = st.text_input(
@@ -162,6 +392,7 @@ def main() -> None:
     st.markdown("---")
     
     # フィルター機能
+    profiler.start_phase("filters")
     st.subheader("🔍 フィルター")
     
     col1, col2 = st.columns(2)
@@ -182,6 +413,7 @@ def main() -> None:
         
         if selected_filter != st.session_state.filter_state:
             st.session_state.filter_state = selected_filter
+            reset_paging()
             st.rerun()
     
     with col2:
@@ -198,30 +430,78 @@ def main() -> None:
             
             if selected_category != st.session_state.filter_category:
                 st.session_state.filter_category = selected_category
+                reset_paging()
                 st.rerun()
     
+    # タイトル検索（検索結果は上位のみ取得し、全件は読み込まない）
+    search_query = st.text_input(
+        "タイトルで検索",
+        key="search_query",
+        placeholder="キーワード（空白区切りで複数指定）"
+    ).strip()
+    
     # Todoリスト表示
+    profiler.start_phase("todo_list")
     filter_label = filter_options[st.session_state.filter_state]
     if st.session_state.filter_category is not None:
         category_name = next(cat['title'] for cat in categories if cat['id'] == st.session_state.filter_category)
         filter_label += f" - カテゴリ: {category_name}"
     
-    st.subheader(f"📋 Todoリスト ({filter_label})")
-    filtered_todos = todo_service.get_filtered_todos(
-        st.session_state.filter_state, 
-        st.session_state.filter_category
-    )
-    display_todos(filtered_todos)
+    if search_query:
+        st.subheader(f"📋 検索結果: 「{search_query}」 ({filter_label})")
+        results = todo_service.search_todos(
+            search_query,
+            st.session_state.filter_state,
+            st.session_state.filter_category,
+            limit=TODO_SEARCH_LIMIT,
+            with_categories=True
+        )
+        display_todos(results)
+        if len(results) == TODO_SEARCH_LIMIT:
+            st.caption(f"新しい順に上位{TODO_SEARCH_LIMIT}件を表示しています。キーワードを追加して絞り込んでください。")
+    else:
+        st.subheader(f"📋 Todoリスト ({filter_label})")
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            view_mode = st.radio(
+                "表示形式",
+                options=list(VIEW_MODES.keys()),
+                format_func=lambda x: VIEW_MODES[x],
+                horizontal=True,
+                key="view_mode"
+            )
+        with col2:
+            page_size = st.selectbox(
+                "表示件数",
+                options=TODO_PAGE_SIZE_OPTIONS,
+                index=TODO_PAGE_SIZE_OPTIONS.index(st.session_state.page_size)
+            )
+            if page_size != st.session_state.page_size:
+                st.session_state.page_size = page_size
+                reset_paging()
+                st.rerun()
+        
+        # 表示するページの分だけ取得・描画する
+        page = todo_service.get_todos_page(
+            st.session_state.filter_state,
+            st.session_state.filter_category,
+            limit=st.session_state.page_size,
+            cursor=st.session_state.page_cursor,
+            with_categories=True
+        )
+        selected_ids: List[int] = []
+        if view_mode == "table":
+            selected_ids = display_todo_table(page['items'])
+        else:
+            display_todos(page['items'])
+        display_page_navigation(page['next_cursor'])
+        if page['items']:
+            display_bulk_actions([todo['id'] for todo in page['items']], selected_ids, filter_label)
     
-    # デバッグ情報（開発用）
-    with st.expander("🔧 デバッグ情報", expanded=False):
-        debug_info = todo_service.get_debug_info()
-        debug_info.update({
-            "current_filter": st.session_state.filter_state,
-            "filter_category": st.session_state.filter_category,
-            "database_info": todo_service.get_database_info()
-        })
-        st.json(debug_info)
+    # デバッグ情報（開発用。APP_DEBUG が有効な場合のみ）
+    if APP_DEBUG:
+        profiler.start_phase("debug_info")
+        display_debug_panel(request_stats)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,858 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, Any, AsyncIterator, Iterable, Optional, Tuple
+import asyncio
+import json
+import os
+import re
+from datetime import datetime
+from repository import (
+    MemoryTodoRepository, NeonTodoRepository, QueryListener, TodoRepository, batched,
+    decode_page_cursor, encode_page_cursor, get_database_type, get_neon_connection_string, split_search_terms
+)
+from migrations import apply_migrations_async, apply_state_count_triggers_async, ensure_schema_async
+
+try:
+    import asyncpg
+except ImportError:  # asyncpg はPostgreSQLの非同期リポジトリを使う場合のみ必要
+    asyncpg = None
+
+
+class AsyncTodoRepository(ABC):
+    """Todoデータアクセスの非同期版抽象基底クラス（TodoRepositoryと同じメソッドを持つ）"""
+
+    @abstractmethod
+    async def add_todo(self, title: str, category_ids: Optional[List[int]] = None) -> bool:
+        """新しいTodoを追加"""
+        pass
+
+    @abstractmethod
+    async def add_category(self, title: str) -> bool:
+        """新しいカテゴリを追加"""
+        pass
+
+    @abstractmethod
+    async def bulk_add_todos(self, todos: Iterable[Dict[str, Any]], batch_size: int = 1000) -> List[int]:
+        """Todoを一括追加し、追加したTodoのIDを入力順に返す"""
+        pass
+
+    @abstractmethod
+    async def bulk_add_categories(self, titles: Iterable[str], batch_size: int = 1000) -> List[int]:
+        """カテゴリを一括追加し、追加したカテゴリのIDを入力順に返す"""
+        pass
+
+    @abstractmethod
+    async def get_todo_categories(self, todo_id: int) -> List[Dict[str, Any]]:
+        """指定されたTodoのカテゴリを取得"""
+        pass
+
+    @abstractmethod
+    async def get_categories_for_todos(self, todo_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        """複数TodoのカテゴリをTodoIDごとにまとめて取得"""
+        pass
+
+    @abstractmethod
+    async def get_filtered_todos(self, filter_state: str = "all",
+                                 filter_category: Optional[int] = None) -> List[Dict[str, Any]]:
+        """フィルター条件に基づいてTodoを取得"""
+        pass
+
+    @abstractmethod
+    async def get_filtered_todos_with_categories(self, filter_state: str = "all",
+                                                 filter_category: Optional[int] = None) -> List[Dict[str, Any]]:
+        """フィルター条件に基づいてTodoを取得し、各Todoに 'categories' を付与"""
+        pass
+
+    @abstractmethod
+    async def get_todos_page(self, filter_state: str = "all", filter_category: Optional[int] = None,
+                             limit: int = 50, cursor: Optional[str] = None,
+                             with_categories: bool = False) -> Dict[str, Any]:
+        """(created_at, id) の降順でTodoを1ページ分取得"""
+        pass
+
+    @abstractmethod
+    def iter_todos(self, filter_state: str = "all", filter_category: Optional[int] = None,
+                   batch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """
+        (created_at, id) の降順でTodoを少しずつ読み込みながら返す非同期ジェネレータ
+
+        途中で読み込みに失敗した場合は例外を送出する。
+        """
+        pass
+
+    @abstractmethod
+    async def search_todos(self, query: str, filter_state: str = "all", filter_category: Optional[int] = None,
+                           limit: int = 50, with_categories: bool = False) -> List[Dict[str, Any]]:
+        """タイトルに検索語を含むTodoを (created_at, id) の降順で取得"""
+        pass
+
+    @abstractmethod
+    async def update_todo_state(self, todo_id: int, new_state: str) -> bool:
+        """Todoの状態を更新"""
+        pass
+
+    @abstractmethod
+    async def delete_todo(self, todo_id: int) -> bool:
+        """Todoを削除"""
+        pass
+
+    @abstractmethod
+    async def bulk_update_state(self, todo_ids: Iterable[int], new_state: str) -> int:
+        """複数Todoの状態を1回の操作で更新し、状態が変わった件数を返す"""
+        pass
+
+    @abstractmethod
+    async def bulk_delete(self, todo_ids: Iterable[int]) -> int:
+        """複数Todoを1回の操作で削除し、削除した件数を返す"""
+        pass
+
+    @abstractmethod
+    async def update_state_where(self, new_state: str, filter_state: str = "all",
+                                 filter_category: Optional[int] = None) -> int:
+        """フィルター条件に合う全てのTodoの状態を1回の操作で更新し、状態が変わった件数を返す"""
+        pass
+
+    @abstractmethod
+    async def delete_where(self, filter_state: str = "all", filter_category: Optional[int] = None) -> int:
+        """フィルター条件に合う全てのTodoを1回の操作で削除し、削除した件数を返す"""
+        pass
+
+    @abstractmethod
+    async def get_statistics(self) -> Dict[str, int]:
+        """統計情報を取得"""
+        pass
+
+    @abstractmethod
+    async def get_category_statistics(self) -> List[Dict[str, Any]]:
+        """カテゴリ別の統計情報を取得"""
+        pass
+
+    @abstractmethod
+    async def get_all_todos(self) -> List[Dict[str, Any]]:
+        """全てのTodoを取得"""
+        pass
+
+    @abstractmethod
+    async def get_all_categories(self) -> List[Dict[str, Any]]:
+        """全てのカテゴリを取得"""
+        pass
+
+    async def initialize_schema(self) -> List[int]:
+        """スキーマを初期化し、適用した移行のバージョンを返す（スキーマを持たない実装では何もしない）"""
+        return []
+
+    async def close(self) -> None:
+        """リソースを解放"""
+        pass
+
+
+class AsyncMemoryTodoRepository(AsyncTodoRepository):
+    """メモリ内データを使用する非同期Todoリポジトリ
+
+    メモリ内の操作はI/Oを伴わないため、MemoryTodoRepository をイベントループ上でそのまま呼び出す。
+    そのため、書き込みロックを待つ間や get_all_todos のような大きな読み込みの間は、他の全てのリクエストも待たされる。
+    開発・テスト用の構成を想定しており、件数が多い場合は get_todos_page / iter_todos で少しずつ読むこと。
+    （ワーカースレッドに移してもGILのためCPUを使う処理は並行にならないので、AsyncThreadedTodoRepository は使わない）
+    """
+
+    def __init__(self, repository: Optional[MemoryTodoRepository] = None):
+        """
+        メモリリポジトリの初期化
+
+        Args:
+            repository: 委譲先の同期リポジトリ（Noneの場合は新規作成）
+        """
+        self.repository = repository or MemoryTodoRepository()
+
+    async def add_todo(self, title: str, category_ids: Optional[List[int]] = None) -> bool:
+        """新しいTodoを追加"""
+        return self.repository.add_todo(title, category_ids)
+
+    async def add_category(self, title: str) -> bool:
+        """新しいカテゴリを追加"""
+        return self.repository.add_category(title)
+
+    async def bulk_add_todos(self, todos: Iterable[Dict[str, Any]], batch_size: int = 1000) -> List[int]:
+        """Todoを一括追加"""
+        return self.repository.bulk_add_todos(todos, batch_size)
+
+    async def bulk_add_categories(self, titles: Iterable[str], batch_size: int = 1000) -> List[int]:
+        """カテゴリを一括追加"""
+        return self.repository.bulk_add_categories(titles, batch_size)
+
+    async def get_todo_categories(self, todo_id: int) -> List[Dict[str, Any]]:
+        """指定されたTodoのカテゴリを取得"""
+        return self.repository.get_todo_categories(todo_id)
+
+    async def get_categories_for_todos(self, todo_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        """複数TodoのカテゴリをTodoIDごとにまとめて取得"""
+        return self.repository.get_categories_for_todos(todo_ids)
+
+    async def get_filtered_todos(self, filter_state: str = "all",
+                                 filter_category: Optional[int] = None) -> List[Dict[str, Any]]:
+        """フィルター条件に基づいてTodoを取得"""
+        return self.repository.get_filtered_todos(filter_state, filter_category)
+
+    async def get_filtered_todos_with_categories(self, filter_state: str = "all",
+                                                 filter_category: Optional[int] = None) -> List[Dict[str, Any]]:
+        """フィルター条件に基づいてTodoを取得し、各Todoに 'categories' を付与"""
+        return self.repository.get_filtered_todos_with_categories(filter_state, filter_category)
+
+    async def get_todos_page(self, filter_state: str = "all", filter_category: Optional[int] = None,
+                             limit: int = 50, cursor: Optional[str] = None,
+                             with_categories: bool = False) -> Dict[str, Any]:
+        """(created_at, id) の降順でTodoを1ページ分取得"""
+        return self.repository.get_todos_page(
+            filter_state, filter_category, limit, cursor, with_categories
+        )
+
+    async def iter_todos(self, filter_state: str = "all", filter_category: Optional[int] = None,
+                         batch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """(created_at, id) の降順でTodoを返す（ページごとに他のタスクへ制御を譲る）"""
+        cursor = None
+        while True:
+            page = self.repository.get_todos_page(filter_state, filter_category, batch_size, cursor)
+            for todo in page['items']:
+                yield todo
+            cursor = page['next_cursor']
+            if cursor is None:
+                return
+            await asyncio.sleep(0)
+
+    async def search_todos(self, query: str, filter_state: str = "all", filter_category: Optional[int] = None,
+                           limit: int = 50, with_categories: bool = False) -> List[Dict[str, Any]]:
+        """タイトルに検索語を含むTodoを (created_at, id) の降順で取得"""
+        return self.repository.search_todos(query, filter_state, filter_category, limit, with_categories)
+
+    async def update_todo_state(self, todo_id: int, new_state: str) -> bool:
+        """Todoの状態を更新"""
+        return self.repository.update_todo_state(todo_id, new_state)
+
+    async def delete_todo(self, todo_id: int) -> bool:
+        """Todoを削除"""
+        return self.repository.delete_todo(todo_id)
+
+    async def bulk_update_state(self, todo_ids: Iterable[int], new_state: str) -> int:
+        """複数Todoの状態を更新"""
+        return self.repository.bulk_update_state(todo_ids, new_state)
+
+    async def bulk_delete(self, todo_ids: Iterable[int]) -> int:
+        """複数Todoを削除"""
+        return self.repository.bulk_delete(todo_ids)
+
+    async def update_state_where(self, new_state: str, filter_state: str = "all",
+                                 filter_category: Optional[int] = None) -> int:
+        """フィルター条件に合う全てのTodoの状態を更新"""
+        return self.repository.update_state_where(new_state, filter_state, filter_category)
+
+    async def delete_where(self, filter_state: str = "all", filter_category: Optional[int] = None) -> int:
+        """フィルター条件に合う全てのTodoを削除"""
+        return self.repository.delete_where(filter_state, filter_category)
+
+    async def get_statistics(self) -> Dict[str, int]:
+        """統計情報を取得"""
+        return self.repository.get_statistics()
+
+    async def get_category_statistics(self) -> List[Dict[str, Any]]:
+        """カテゴリ別の統計情報を取得"""
+        return self.repository.get_category_statistics()
+
+    async def get_all_todos(self) -> List[Dict[str, Any]]:
+        """全てのTodoを取得"""
+        return self.repository.get_all_todos()
+
+    async def get_all_categories(self) -> List[Dict[str, Any]]:
+        """全てのカテゴリを取得"""
+        return self.repository.get_all_categories()
+
+
+class AsyncThreadedTodoRepository(AsyncTodoRepository):
+    """同期リポジトリの呼び出しをワーカースレッドで実行する非同期Todoリポジトリ
+
+    SQLiteのファイルI/OやfsyncのようにI/Oを待つ同期リポジトリを包み、
+    待っている間もイベントループが他のリクエストを処理できるようにする。
+    """
+
+    def __init__(self, repository: TodoRepository):
+        """
+        非同期リポジトリの初期化
+
+        Args:
+            repository: 委譲先の同期リポジトリ
+        """
+        self.repository = repository
+
+    async def _run(self, function: Any, *args: Any) -> Any:
+        """同期の呼び出しをワーカースレッドで実行"""
+        return await asyncio.to_thread(function, *args)
+
+    async def add_todo(self, title: str, category_ids: Optional[List[int]] = None) -> bool:
+        """新しいTodoを追加"""
+        return await self._run(self.repository.add_todo, title, category_ids)
+
+    async def add_category(self, title: str) -> bool:
+        """新しいカテゴリを追加"""
+        return await self._run(self.repository.add_category, title)
+
+    async def bulk_add_todos(self, todos: Iterable[Dict[str, Any]], batch_size: int = 1000) -> List[int]:
+        """Todoを一括追加"""
+        return await self._run(self.repository.bulk_add_todos, list(todos), batch_size)
+
+    async def bulk_add_categories(self, titles: Iterable[str], batch_size: int = 1000) -> List[int]:
+        """カテゴリを一括追加"""
+        return await self._run(self.repository.bulk_add_categories, list(titles), batch_size)
+
+    async def get_todo_categories(self, todo_id: int) -> List[Dict[str, Any]]:
+        """指定されたTodoのカテゴリを取得"""
+        return await self._run(self.repository.get_todo_categories, todo_id)
+
+    async def get_categories_for_todos(self, todo_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        """複数TodoのカテゴリをTodoIDごとにまとめて取得"""
+        return await self._run(self.repository.get_categories_for_todos, todo_ids)
+
+    async def get_filtered_todos(self, filter_state: str = "all",
+                                 filter_category: Optional[int] = None) -> List[Dict[str, Any]]:
+        """フィルター条件に基づいてTodoを取得"""
+        return await self._run(self.repository.get_filtered_todos, filter_state, filter_category)
+
+    async def get_filtered_todos_with_categories(self, filter_state: str = "all",
+                                                 filter_category: Optional[int] = None) -> List[Dict[str, Any]]:
+        """フィルター条件に基づいてTodoを取得し、各Todoに 'categories' を付与"""
+        return await self._run(self.repository.get_filtered_todos_with_categories, filter_state, filter_category)
+
+    async def get_todos_page(self, filter_state: str = "all", filter_category: Optional[int] = None,
+                             limit: int = 50, cursor: Optional[str] = None,
+                             with_categories: bool = False) -> Dict[str, Any]:
+        """(created_at, id) の降順でTodoを1ページ分取得"""
+        return await self._run(
+            self.repository.get_todos_page, filter_state, filter_category, limit, cursor, with_categories
+        )
+
+    async def iter_todos(self, filter_state: str = "all", filter_category: Optional[int] = None,
+                         batch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """(created_at, id) の降順でTodoを返す（1ページずつワーカースレッドで読み込む）"""
+        cursor = None
+        while True:
+            page = await self.get_todos_page(filter_state, filter_category, batch_size, cursor)
+            for todo in page['items']:
+                yield todo
+            cursor = page['next_cursor']
+            if cursor is None:
+                return
+
+    async def search_todos(self, query: str, filter_state: str = "all", filter_category: Optional[int] = None,
+                           limit: int = 50, with_categories: bool = False) -> List[Dict[str, Any]]:
+        """タイトルに検索語を含むTodoを (created_at, id) の降順で取得"""
+        return await self._run(
+            self.repository.search_todos, query, filter_state, filter_category, limit, with_categories
+        )
+
+    async def update_todo_state(self, todo_id: int, new_state: str) -> bool:
+        """Todoの状態を更新"""
+        return await self._run(self.repository.update_todo_state, todo_id, new_state)
+
+    async def delete_todo(self, todo_id: int) -> bool:
+        """Todoを削除"""
+        return await self._run(self.repository.delete_todo, todo_id)
+
+    async def bulk_update_state(self, todo_ids: Iterable[int], new_state: str) -> int:
+        """複数Todoの状態を更新"""
+        return await self._run(self.repository.bulk_update_state, list(todo_ids), new_state)
+
+    async def bulk_delete(self, todo_ids: Iterable[int]) -> int:
+        """複数Todoを削除"""
+        return await self._run(self.repository.bulk_delete, list(todo_ids))
+
+    async def update_state_where(self, new_state: str, filter_state: str = "all",
+                                 filter_category: Optional[int] = None) -> int:
+        """フィルター条件に合う全てのTodoの状態を更新"""
+        return await self._run(self.repository.update_state_where, new_state, filter_state, filter_category)
+
+    async def delete_where(self, filter_state: str = "all", filter_category: Optional[int] = None) -> int:
+        """フィルター条件に合う全てのTodoを削除"""
+        return await self._run(self.repository.delete_where, filter_state, filter_category)
+
+    async def get_statistics(self) -> Dict[str, int]:
+        """統計情報を取得"""
+        return await self._run(self.repository.get_statistics)
+
+    async def get_category_statistics(self) -> List[Dict[str, Any]]:
+        """カテゴリ別の統計情報を取得"""
+        return await self._run(self.repository.get_category_statistics)
+
+    async def get_all_todos(self) -> List[Dict[str, Any]]:
+        """全てのTodoを取得"""
+        return await self._run(self.repository.get_all_todos)
+
+    async def get_all_categories(self) -> List[Dict[str, Any]]:
+        """全てのカテゴリを取得"""
+        return await self._run(self.repository.get_all_categories)
+
+    async def initialize_schema(self) -> List[int]:
+        """委譲先のスキーマを初期化"""
+        return await self._run(self.repository.initialize_schema)
+
+    async def close(self) -> None:
+        """委譲先のリポジトリをクローズ"""
+        close = getattr(self.repository, 'close', None)
+        if close is not None:
+            await self._run(close)
+
+
+def to_asyncpg_query(query: str) -> str:
+    """psycopg2形式のプレースホルダ (%s) を asyncpg 形式 ($1, $2, ...) に変換"""
+    counter = iter(range(1, query.count('%s') + 1))
+    return re.sub(r'%s', lambda _: f"${next(counter)}", query)
+
+
+class AsyncPostgresTodoRepository(AsyncTodoRepository):
+    """asyncpg の接続プールを使用する非同期Todoリポジトリ（Neon PostgreSQL）"""
+
+    def __init__(self, connection_string: Optional[str] = None):
+        """
+        非同期PostgreSQLリポジトリの初期化（プールは初回アクセス時に作成）
+
+        Args:
+            connection_string: 接続文字列（Noneの場合は環境変数から取得）
+        """
+        if asyncpg is None:
+            raise ImportError("AsyncPostgresTodoRepository を使うには asyncpg をインストールしてください")
+        self.connection_string = connection_string or get_neon_connection_string()
+        self.pool_options = NeonTodoRepository._get_pool_options()
+        self.stats_mode = os.getenv('NEON_STATS_MODE', 'aggregate').lower()
+        self._pool = None
+        self._pool_lock = asyncio.Lock()
+        # プールの全ての接続で共有する、SQL実行のリスナー
+        self._query_listeners: List[QueryListener] = []
+
+    async def _get_pool(self):
+        """スキーマを初期化済みの接続プールを取得（初回は未適用の移行を適用する）"""
+        pool = await self._open_pool()
+        await self.initialize_schema()
+        return pool
+
+    async def _open_pool(self):
+        """接続プールを取得（初回のみ作成）"""
+        if self._pool is not None:
+            return self._pool
+        async with self._pool_lock:
+            if self._pool is None:
+                self._pool = await asyncpg.create_pool(
+                    self.connection_string,
+                    min_size=self.pool_options['min_size'],
+                    max_size=self.pool_options['max_size'],
+                    max_inactive_connection_lifetime=self.pool_options['max_idle_seconds'],
+                    init=self._init_connection
+                )
+        return self._pool
+
+    async def _init_connection(self, conn) -> None:
+        """json型をPythonのオブジェクトとして読み書きし、SQLの実行をリスナーへ通知する"""
+        await conn.set_type_codec('json', encoder=json.dumps, decoder=json.loads, schema='pg_catalog')
+        conn.add_query_logger(self._notify_query_listeners)
+
+    def add_query_listener(self, listener: QueryListener) -> None:
+        """
+        SQLを実行するたびに呼び出すリスナーを登録（作成済みの接続にも適用される）
+
+        Args:
+            listener: (SQL, 所要秒数, 失敗したか) を受け取る関数
+        """
+        self._query_listeners.append(listener)
+
+    def _notify_query_listeners(self, record) -> None:
+        """asyncpg のクエリログをリスナーへ渡す"""
+        for listener in self._query_listeners:
+            listener(record.query, record.elapsed, record.exception is not None)
+
+    async def _fetch(self, query: str, *args: Any) -> List[Dict[str, Any]]:
+        """クエリを実行して全行を辞書のリストで取得"""
+        pool = await self._get_pool()
+        async with pool.acquire(timeout=self.pool_options['timeout']) as conn:
+            return [dict(record) for record in await conn.fetch(to_asyncpg_query(query), *args)]
+
+    async def _execute(self, query: str, *args: Any) -> int:
+        """更新系のクエリを実行し、対象になった行数を返す（コマンドタグ 'UPDATE 3' などから取得）"""
+        pool = await self._get_pool()
+        async with pool.acquire(timeout=self.pool_options['timeout']) as conn:
+            status = await conn.execute(to_asyncpg_query(query), *args)
+        return int(status.rsplit(' ', 1)[-1])
+
+    async def initialize_schema(self) -> List[int]:
+        """未適用のスキーマ移行を適用（同じ接続先にはプロセス内で1回だけ実行。最初の操作の前にも自動で呼び出される）"""
+        return await ensure_schema_async(self.connection_string, self._apply_migrations)
+
+    async def _apply_migrations(self) -> List[int]:
+        """プールの接続で移行を適用し、統計の取得方法に合わせてカウンタのトリガーを設置・削除"""
+        pool = await self._open_pool()
+        async with pool.acquire() as conn:
+            versions = await apply_migrations_async(conn)
+            await apply_state_count_triggers_async(conn, self.stats_mode == 'counter')
+            return versions
+
+    async def close(self) -> None:
+        """接続プールをクローズ"""
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """接続プールのメトリクスを取得"""
+        if self._pool is None:
+            return {'size': 0, 'idle': 0, 'in_use': 0,
+                    'min_size': self.pool_options['min_size'], 'max_size': self.pool_options['max_size']}
+        size = self._pool.get_size()
+        idle = self._pool.get_idle_size()
+        return {'size': size, 'idle': idle, 'in_use': size - idle,
+                'min_size': self._pool.get_min_size(), 'max_size': self._pool.get_max_size()}
+
+    @staticmethod
+    def _todo_query(filter_state: str = "all", filter_category: Optional[int] = None,
+                    with_categories: bool = False, cursor: Optional[str] = None,
+                    limit: Optional[int] = None,
+                    search_terms: Optional[List[str]] = None) -> Tuple[str, List[Any]]:
+        """同期版と同じ形のTodo一覧クエリを組み立てる（カーソルの日時はdatetimeに変換）"""
+        after = None
+        if cursor is not None:
+            created_at, todo_id = decode_page_cursor(cursor)
+            after = (datetime.fromisoformat(created_at), todo_id)
+        return NeonTodoRepository._build_todo_query(
+            filter_state, filter_category, with_categories, after, limit, search_terms
+        )
+
+    async def add_todo(self, title: str, category_ids: Optional[List[int]] = None) -> bool:
+        """新しいTodoを追加"""
+        if not title.strip():
+            return False
+
+        try:
+            pool = await self._get_pool()
+            async with pool.acquire(timeout=self.pool_options['timeout']) as conn:
+                async with conn.transaction():
+                    todo_id = await conn.fetchval(
+                        "INSERT INTO todos (title) VALUES ($1) RETURNING id", title.strip()
+                    )
+                    if category_ids:
+                        await conn.executemany(
+                            "INSERT INTO todo_categories (todo_id, category_id) VALUES ($1, $2)",
+                            [(todo_id, category_id) for category_id in category_ids]
+                        )
+            return True
+        except Exception as e:
+            print(f"Todo追加エラー: {e}")
+            return False
+
+    async def add_category(self, title: str) -> bool:
+        """新しいカテゴリを追加"""
+        if not title.strip():
+            return False
+
+        try:
+            await self._fetch("INSERT INTO categories (title) VALUES (%s) RETURNING id", title.strip())
+            return True
+        except Exception as e:
+            print(f"カテゴリ追加エラー: {e}")
+            return False
+
+    async def bulk_add_todos(self, todos: Iterable[Dict[str, Any]], batch_size: int = 1000) -> List[int]:
+        """Todoを一括追加（unnest で batch_size 件ずつINSERTしてコミット）"""
+        todo_ids: List[int] = []
+        try:
+            pool = await self._get_pool()
+            for batch in batched((todo for todo in todos if todo['title'].strip()), batch_size):
+                async with pool.acquire(timeout=self.pool_options['timeout']) as conn:
+                    async with conn.transaction():
+                        records = await conn.fetch(
+                            """
+                            INSERT INTO todos (title)
+                            SELECT title FROM unnest($1::text[]) WITH ORDINALITY AS u(title, ord)
+                            ORDER BY ord
+                            RETURNING id
+                            """,
+                            [todo['title'].strip() for todo in batch]
+                        )
+                        batch_ids = [record['id'] for record in records]
+                        links = [
+                            (todo_id, category_id)
+                            for todo_id, todo in zip(batch_ids, batch)
+                            for category_id in (todo.get('category_ids') or [])
+                        ]
+                        if links:
+                            await conn.execute(
+                                """
+                                INSERT INTO todo_categories (todo_id, category_id)
+                                SELECT * FROM unnest($1::int[], $2::int[])
+                                ON CONFLICT DO NOTHING
+                                """,
+                                [link[0] for link in links], [link[1] for link in links]
+                            )
+                todo_ids.extend(batch_ids)
+        except Exception as e:
+            print(f"Todo一括追加エラー: {e}")
+        return todo_ids
+
+    async def bulk_add_categories(self, titles: Iterable[str], batch_size: int = 1000) -> List[int]:
+        """カテゴリを一括追加（unnest で batch_size 件ずつINSERTしてコミット）"""
+        category_ids: List[int] = []
+        try:
+            for batch in batched((title.strip() for title in titles if title.strip()), batch_size):
+                rows = await self._fetch(
+                    """
+                    INSERT INTO categories (title)
+                    SELECT title FROM unnest(%s::text[]) WITH ORDINALITY AS u(title, ord)
+                    ORDER BY ord
+                    RETURNING id
+                    """,
+                    batch
+                )
+                category_ids.extend(row['id'] for row in rows)
+        except Exception as e:
+            print(f"カテゴリ一括追加エラー: {e}")
+        return category_ids
+
+    async def get_todo_categories(self, todo_id: int) -> List[Dict[str, Any]]:
+        """指定されたTodoのカテゴリを取得"""
+        return (await self.get_categories_for_todos([todo_id]))[todo_id]
+
+    async def get_categories_for_todos(self, todo_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        """複数TodoのカテゴリをTodoIDごとにまとめて取得（1クエリ）"""
+        result: Dict[int, List[Dict[str, Any]]] = {todo_id: [] for todo_id in todo_ids}
+        if not todo_ids:
+            return result
+
+        try:
+            rows = await self._fetch("""
+                SELECT tc.todo_id, c.id, c.title, c.created_at
+                FROM todo_categories tc
+                JOIN categories c ON c.id = tc.category_id
+                WHERE tc.todo_id = ANY(%s::int[])
+                ORDER BY tc.todo_id, c.id
+            """, list(todo_ids))
+            for row in rows:
+                todo_id = row.pop('todo_id')
+                result.setdefault(todo_id, []).append(row)
+        except Exception as e:
+            print(f"カテゴリ一括取得エラー: {e}")
+        return result
+
+    async def get_filtered_todos(self, filter_state: str = "all",
+                                 filter_category: Optional[int] = None) -> List[Dict[str, Any]]:
+        """フィルター条件に基づいてTodoを取得"""
+        try:
+            query, params = self._todo_query(filter_state, filter_category)
+            return await self._fetch(query, *params)
+        except Exception as e:
+            print(f"Todo取得エラー: {e}")
+            return []
+
+    async def get_filtered_todos_with_categories(self, filter_state: str = "all",
+                                                 filter_category: Optional[int] = None) -> List[Dict[str, Any]]:
+        """フィルター条件に基づいてTodoを取得し、各Todoに 'categories' を付与（1クエリ）"""
+        try:
+            query, params = self._todo_query(filter_state, filter_category, with_categories=True)
+            return await self._fetch(query, *params)
+        except Exception as e:
+            print(f"カテゴリ付きTodo取得エラー: {e}")
+            return []
+
+    async def get_todos_page(self, filter_state: str = "all", filter_category: Optional[int] = None,
+                             limit: int = 50, cursor: Optional[str] = None,
+                             with_categories: bool = False) -> Dict[str, Any]:
+        """(created_at, id) の降順でTodoを1ページ分取得（キーセットページング）"""
+        query, params = self._todo_query(filter_state, filter_category, with_categories, cursor, limit + 1)
+        try:
+            rows = await self._fetch(query, *params)
+        except Exception as e:
+            print(f"Todoページ取得エラー: {e}")
+            return {'items': [], 'next_cursor': None}
+
+        items = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit and items:
+            next_cursor = encode_page_cursor(items[-1]['created_at'], items[-1]['id'])
+        return {'items': items, 'next_cursor': next_cursor}
+
+    async def iter_todos(self, filter_state: str = "all", filter_category: Optional[int] = None,
+                         batch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """サーバーサイドカーソルで batch_size 件ずつ読み込みながらTodoを返す"""
+        query, params = self._todo_query(filter_state, filter_category)
+        try:
+            pool = await self._get_pool()
+            async with pool.acquire(timeout=self.pool_options['timeout']) as conn:
+                async with conn.transaction():
+                    async for record in conn.cursor(to_asyncpg_query(query), *params, prefetch=batch_size):
+                        yield dict(record)
+        except Exception as e:
+            # 途中で終わったストリームを完了と誤認させないよう、ログに出力して呼び出し元へ伝える
+            print(f"Todoストリーム取得エラー: {e}")
+            raise
+
+    async def search_todos(self, query: str, filter_state: str = "all", filter_category: Optional[int] = None,
+                           limit: int = 50, with_categories: bool = False) -> List[Dict[str, Any]]:
+        """タイトルに検索語を含むTodoを (created_at, id) の降順で取得"""
+        search_terms = split_search_terms(query)
+        if not search_terms:
+            return []
+        sql, params = self._todo_query(
+            filter_state, filter_category, with_categories, limit=limit, search_terms=search_terms
+        )
+        try:
+            return await self._fetch(sql, *params)
+        except Exception as e:
+            print(f"Todo検索エラー: {e}")
+            return []
+
+    async def update_todo_state(self, todo_id: int, new_state: str) -> bool:
+        """Todoの状態を更新"""
+        try:
+            rows = await self._fetch(
+                "UPDATE todos SET state = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s RETURNING id",
+                new_state, todo_id
+            )
+            return len(rows) > 0
+        except Exception as e:
+            print(f"Todo更新エラー: {e}")
+            return False
+
+    async def delete_todo(self, todo_id: int) -> bool:
+        """Todoを削除"""
+        try:
+            rows = await self._fetch("DELETE FROM todos WHERE id = %s RETURNING id", todo_id)
+            return len(rows) > 0
+        except Exception as e:
+            print(f"Todo削除エラー: {e}")
+            return False
+
+    async def bulk_update_state(self, todo_ids: Iterable[int], new_state: str) -> int:
+        """複数Todoの状態を1つのUPDATE文で更新"""
+        todo_ids = list(todo_ids)
+        if not todo_ids:
+            return 0
+        try:
+            return await self._execute(
+                "UPDATE todos SET state = %s, updated_at = CURRENT_TIMESTAMP "
+                "WHERE id = ANY(%s::int[]) AND state <> %s",
+                new_state, todo_ids, new_state
+            )
+        except Exception as e:
+            print(f"Todo一括更新エラー: {e}")
+            return 0
+
+    async def bulk_delete(self, todo_ids: Iterable[int]) -> int:
+        """複数Todoを1つのDELETE文で削除"""
+        todo_ids = list(todo_ids)
+        if not todo_ids:
+            return 0
+        try:
+            return await self._execute("DELETE FROM todos WHERE id = ANY(%s::int[])", todo_ids)
+        except Exception as e:
+            print(f"Todo一括削除エラー: {e}")
+            return 0
+
+    async def update_state_where(self, new_state: str, filter_state: str = "all",
+                                 filter_category: Optional[int] = None) -> int:
+        """フィルター条件に合う全てのTodoの状態を1つのUPDATE文で更新"""
+        conditions, params = NeonTodoRepository._filter_conditions(filter_state, filter_category)
+        conditions.append("t.state <> %s")
+        query = (
+            "UPDATE todos t SET state = %s, updated_at = CURRENT_TIMESTAMP WHERE "
+            + " AND ".join(conditions)
+        )
+        try:
+            return await self._execute(query, new_state, *params, new_state)
+        except Exception as e:
+            print(f"Todo一括更新エラー: {e}")
+            return 0
+
+    async def delete_where(self, filter_state: str = "all", filter_category: Optional[int] = None) -> int:
+        """フィルター条件に合う全てのTodoを1つのDELETE文で削除"""
+        conditions, params = NeonTodoRepository._filter_conditions(filter_state, filter_category)
+        query = "DELETE FROM todos t"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        try:
+            return await self._execute(query, *params)
+        except Exception as e:
+            print(f"Todo一括削除エラー: {e}")
+            return 0
+
+    async def get_statistics(self) -> Dict[str, int]:
+        """統計情報を取得（1クエリ）"""
+        table = "todo_state_counts" if self.stats_mode == 'counter' else "todos"
+        count = "SUM(count)" if self.stats_mode == 'counter' else "COUNT(*)"
+        try:
+            rows = await self._fetch(f"""
+                SELECT COALESCE({count}, 0) AS total,
+                       COALESCE({count} FILTER (WHERE state = 'done'), 0) AS done
+                FROM {table}
+            """)
+            total, done = int(rows[0]['total']), int(rows[0]['done'])
+            return {'total': total, 'todo': total - done, 'done': done}
+        except Exception as e:
+            print(f"統計取得エラー: {e}")
+            return {'total': 0, 'todo': 0, 'done': 0}
+
+    async def get_category_statistics(self) -> List[Dict[str, Any]]:
+        """カテゴリ別の統計情報を取得（1クエリ。NEON_STATS_MODE=counter でも毎回集計する）"""
+        try:
+            rows = await self._fetch("""
+                SELECT c.id, c.title,
+                       COUNT(t.id) AS total,
+                       COUNT(t.id) FILTER (WHERE t.state = 'done') AS done
+                FROM categories c
+                LEFT JOIN todo_categories tc ON tc.category_id = c.id
+                LEFT JOIN todos t ON t.id = tc.todo_id
+                GROUP BY c.id, c.title
+                ORDER BY c.id
+            """)
+            for row in rows:
+                row['todo'] = row['total'] - row['done']
+            return rows
+        except Exception as e:
+            print(f"カテゴリ別統計取得エラー: {e}")
+            return []
+
+    async def get_all_todos(self) -> List[Dict[str, Any]]:
+        """全てのTodoを取得"""
+        try:
+            return await self._fetch(
+                "SELECT id, title, state, created_at, updated_at FROM todos ORDER BY created_at DESC"
+            )
+        except Exception as e:
+            print(f"全Todo取得エラー: {e}")
+            return []
+
+    async def get_all_categories(self) -> List[Dict[str, Any]]:
+        """全てのカテゴリを取得"""
+        try:
+            return await self._fetch("SELECT id, title, created_at FROM categories ORDER BY created_at")
+        except Exception as e:
+            print(f"全カテゴリ取得エラー: {e}")
+            return []
+
+
+class AsyncTodoRepositoryFactory:
+    """非同期Todoリポジトリのファクトリクラス"""
+
+    @staticmethod
+    def create_repository() -> AsyncTodoRepository:
+        """
+        環境変数に基づいて適切な非同期リポジトリを作成（DATABASE_TYPE の扱いは TodoRepositoryFactory と同じ）
+
+        Raises:
+            ValueError: DATABASE_TYPE が未対応の値の場合
+        """
+        database_type = get_database_type()
+
+        if database_type == 'NEON':
+            return AsyncPostgresTodoRepository()
+        elif database_type == 'SQLITE':
+            # 同期のSQLiteリポジトリをワーカースレッドで呼び出す（Streamlitアプリと同じファイルを使う）
+            from sqlite_repository import SqliteTodoRepository
+            return AsyncThreadedTodoRepository(SqliteTodoRepository())
+        else:
+            data_dir = os.getenv('MEMORY_DATA_DIR')
+            if data_dir:
+                # ログのfsyncでイベントループを止めないよう、永続化付きはワーカースレッドで呼び出す
+                from memory_persistence import create_durable_memory_repository_from_env
+                return AsyncThreadedTodoRepository(create_durable_memory_repository_from_env(data_dir))
+            return AsyncMemoryTodoRepository()
@@ -0,0 +1,129 @@
+from typing import Dict, List, Any, AsyncIterator, Iterable, Optional
+import os
+from async_repository import AsyncTodoRepository, AsyncTodoRepositoryFactory
+
+
+class AsyncTodoService:
+    """TodoServiceの非同期版（FastAPIなどイベントループ上で使用する）"""
+
+    def __init__(self, repository: Optional[AsyncTodoRepository] = None):
+        """
+        サービスの初期化
+
+        Args:
+            repository: データアクセス用の非同期リポジトリ（Noneの場合はファクトリから自動生成）
+        """
+        self.repository = repository or AsyncTodoRepositoryFactory.create_repository()
+
+    async def add_todo(self, title: str, category_ids: Optional[List[int]] = None) -> bool:
+        """新しいTodoを追加"""
+        return await self.repository.add_todo(title, category_ids)
+
+    async def add_category(self, title: str) -> bool:
+        """新しいカテゴリを追加"""
+        return await self.repository.add_category(title)
+
+    async def bulk_add_todos(self, todos: Iterable[Dict[str, Any]], batch_size: int = 1000) -> List[int]:
+        """Todoを一括追加し、追加したTodoのIDを返す"""
+        return await self.repository.bulk_add_todos(todos, batch_size)
+
+    async def bulk_add_categories(self, titles: Iterable[str], batch_size: int = 1000) -> List[int]:
+        """カテゴリを一括追加し、追加したカテゴリのIDを返す"""
+        return await self.repository.bulk_add_categories(titles, batch_size)
+
+    async def get_todo_categories(self, todo_id: int) -> List[Dict[str, Any]]:
+        """指定されたTodoのカテゴリを取得"""
+        return await self.repository.get_todo_categories(todo_id)
+
+    async def get_categories_for_todos(self, todo_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        """複数Todoのカテゴリをまとめて取得"""
+        return await self.repository.get_categories_for_todos(todo_ids)
+
+    async def get_filtered_todos(self, filter_state: str = "all",
+                                 filter_category: Optional[int] = None) -> List[Dict[str, Any]]:
+        """フィルター条件に基づいてTodoを取得"""
+        return await self.repository.get_filtered_todos(filter_state, filter_category)
+
+    async def get_filtered_todos_with_categories(self, filter_state: str = "all",
+                                                 filter_category: Optional[int] = None) -> List[Dict[str, Any]]:
+        """フィルター条件に基づいてTodoをカテゴリ付きで取得"""
+        return await self.repository.get_filtered_todos_with_categories(filter_state, filter_category)
+
+    async def get_todos_page(self, filter_state: str = "all", filter_category: Optional[int] = None,
+                             limit: int = 50, cursor: Optional[str] = None,
+                             with_categories: bool = False) -> Dict[str, Any]:
+        """Todoを新しい順に1ページ分取得"""
+        return await self.repository.get_todos_page(
+            filter_state, filter_category, limit, cursor, with_categories
+        )
+
+    def iter_todos(self, filter_state: str = "all", filter_category: Optional[int] = None,
+                   batch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """Todoを新しい順に少しずつ読み込みながら返す"""
+        return self.repository.iter_todos(filter_state, filter_category, batch_size)
+
+    async def search_todos(self, query: str, filter_state: str = "all", filter_category: Optional[int] = None,
+                           limit: int = 50, with_categories: bool = False) -> List[Dict[str, Any]]:
+        """タイトルに検索語を含むTodoを新しい順に取得"""
+        return await self.repository.search_todos(query, filter_state, filter_category, limit, with_categories)
+
+    async def update_todo_state(self, todo_id: int, new_state: str) -> bool:
+        """Todoの状態を更新"""
+        return await self.repository.update_todo_state(todo_id, new_state)
+
+    async def delete_todo(self, todo_id: int) -> bool:
+        """Todoを削除"""
+        return await self.repository.delete_todo(todo_id)
+
+    async def bulk_update_state(self, todo_ids: Iterable[int], new_state: str) -> int:
+        """複数Todoの状態をまとめて更新"""
+        return await self.repository.bulk_update_state(todo_ids, new_state)
+
+    async def bulk_delete(self, todo_ids: Iterable[int]) -> int:
+        """複数Todoをまとめて削除"""
+        return await self.repository.bulk_delete(todo_ids)
+
+    async def update_state_where(self, new_state: str, filter_state: str = "all",
+                                 filter_category: Optional[int] = None) -> int:
+        """フィルター条件に合う全てのTodoの状態を更新"""
+        return await self.repository.update_state_where(new_state, filter_state, filter_category)
+
+    async def delete_where(self, filter_state: str = "all", filter_category: Optional[int] = None) -> int:
+        """フィルター条件に合う全てのTodoを削除"""
+        return await self.repository.delete_where(filter_state, filter_category)
+
+    async def get_statistics(self) -> Dict[str, int]:
+        """統計情報を取得"""
+        return await self.repository.get_statistics()
+
+    async def get_category_statistics(self) -> List[Dict[str, Any]]:
+        """カテゴリ別の統計情報を取得"""
+        return await self.repository.get_category_statistics()
+
+    async def get_all_todos(self) -> List[Dict[str, Any]]:
+        """全てのTodoを取得"""
+        return await self.repository.get_all_todos()
+
+    async def get_all_categories(self) -> List[Dict[str, Any]]:
+        """全てのカテゴリを取得"""
+        return await self.repository.get_all_categories()
+
+    def get_database_info(self) -> Dict[str, Any]:
+        """データベース情報を取得"""
+        info: Dict[str, Any] = {
+            "database_type": os.getenv('DATABASE_TYPE', 'MEMORY').upper(),
+            # 計測用のラッパーに包まれている場合は中身のクラス名を表示する
+            "repository_class": type(getattr(self.repository, 'wrapped', self.repository)).__name__
+        }
+        # 接続プールを持つリポジトリの場合はメトリクスを追加
+        if hasattr(self.repository, 'get_pool_stats'):
+            info["pool"] = self.repository.get_pool_stats()
+        return info
+
+    async def initialize_schema(self) -> List[int]:
+        """スキーマ移行を適用（アプリ起動時に1回呼び出す）"""
+        return await self.repository.initialize_schema()
+
+    async def close(self) -> None:
+        """リポジトリのリソースを解放"""
+        await self.repository.close()
@@ -0,0 +1,145 @@
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Set
+
+
+class TTLCache:
+    """TTLとLRU追い出しを備えたサイズ上限付きのキャッシュ
+
+    各エントリには依存する「タグ」を付け、更新系の操作ではタグ単位で無効化する。
+    読み込み中に同じタグが無効化された場合、その結果はキャッシュしない。
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        キャッシュの初期化
+
+        Args:
+            maxsize: 保持する最大エントリ数
+            ttl: エントリの有効秒数
+            clock: 現在時刻を返す関数（テスト用）
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be >= 1")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        # キー -> (有効期限, 値, タグ)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # タグ -> そのタグを持つキー
+        self._tag_index: Dict[str, Set[Hashable]] = {}
+        # タグ -> 無効化された回数（読み込み中の無効化を検出する）
+        self._generations: Dict[str, int] = {}
+        # clear() された回数（索引に無いタグで読み込み中のものも含めて無効にする）
+        self._epoch = 0
+        self._metrics = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def get_or_load(self, key: Hashable, tags: Iterable[str], loader: Callable[[], Any]) -> Any:
+        """キャッシュから値を取得し、無ければ loader で読み込んで保存"""
+        tags = set(tags)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self._metrics['hits'] += 1
+                    return copy.copy(entry[1])
+                self._remove_locked(key)
+                self._metrics['expirations'] += 1
+            self._metrics['misses'] += 1
+            generations = {tag: self._generations.get(tag, 0) for tag in tags}
+            epoch = self._epoch
+
+        value = loader()
+
+        with self._lock:
+            if self._epoch == epoch and all(self._generations.get(tag, 0) == generation
+                                            for tag, generation in generations.items()):
+                self._remove_locked(key)
+                self._entries[key] = (self._clock() + self.ttl, value, tags)
+                for tag in tags:
+                    self._tag_index.setdefault(tag, set()).add(key)
+                while len(self._entries) > self.maxsize:
+                    oldest = next(iter(self._entries))
+                    self._remove_locked(oldest)
+                    self._metrics['evictions'] += 1
+        return copy.copy(value)
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        """指定したタグを持つエントリを無効化し、削除した件数を返す"""
+        removed = 0
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+                for key in list(self._tag_index.get(tag, ())):
+                    self._remove_locked(key)
+                    removed += 1
+            self._metrics['invalidations'] += removed
+        return removed
+
+    def clear(self) -> None:
+        """全てのエントリを削除"""
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._tag_index.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """キャッシュのメトリクスを取得"""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._metrics)
+            stats.update({'enabled': True, 'size': len(self._entries),
+                          'maxsize': self.maxsize, 'ttl': self.ttl})
+            return stats
+
+    def _remove_locked(self, key: Hashable) -> None:
+        """エントリとタグの索引を削除（ロック保持中に呼び出す）"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+
+
+class NullCache:
+    """キャッシュしないキャッシュ（キャッシュ無効時に使用）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._misses = 0
+
+    def get_or_load(self, key: Hashable, tags: Iterable[str], loader: Callable[[], Any]) -> Any:
+        """常に loader で読み込む"""
+        with self._lock:
+            self._misses += 1
+        return loader()
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        """何もしない"""
+        return 0
+
+    def clear(self) -> None:
+        """何もしない"""
+
+    def stats(self) -> Dict[str, Any]:
+        """キャッシュのメトリクスを取得"""
+        with self._lock:
+            return {'enabled': False, 'hits': 0, 'misses': self._misses}
+
+
+def create_cache_from_env() -> Any:
+    """環境変数に基づいてキャッシュを作成（TTLが0以下なら無効）"""
+    ttl = float(os.getenv('TODO_CACHE_TTL_SECONDS', '0'))
+    if ttl <= 0:
+        return NullCache()
+    return TTLCache(maxsize=int(os.getenv('TODO_CACHE_MAX_SIZE', '256')), ttl=ttl)
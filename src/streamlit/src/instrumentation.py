@@ -0,0 +1,343 @@
+"""リポジトリ操作の計測
+
+InstrumentedTodoRepository / InstrumentedAsyncTodoRepository は任意のリポジトリを包み、
+メソッドごとの呼び出し回数・エラー数・返却行数・レイテンシのヒストグラムを記録する。
+Neon（PostgreSQL）のリポジトリでは、実行したSQLとDBへの往復回数も記録する。
+
+集計は RepositoryMetrics にプロセス単位で保持され、Prometheusのテキスト形式で出力できる。
+request_scope() の中で行われた操作は、1リクエスト（Streamlitの1回の再実行）単位でも集計される。
+"""
+import bisect
+import contextvars
+import functools
+import inspect
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from async_repository import AsyncTodoRepository
+from repository import TodoRepository
+
+# レイテンシのヒストグラムの区切り（秒）
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)
+# 1リクエスト内で保持するSQLの最大件数
+MAX_REQUEST_QUERIES = 200
+# データの読み書きではないため計測しないメソッド
+UNMEASURED_METHODS = frozenset({'add_query_listener', 'close', 'get_dead_letters', 'get_persistence_stats',
+                                'get_pool_stats', 'get_write_behind_stats', 'unit_of_work'})
+
+
+def normalize_sql(sql: Any) -> str:
+    """SQLの空白を詰めて1行にする"""
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', errors='replace')
+    return re.sub(r'\s+', ' ', str(sql)).strip()
+
+
+def count_rows(result: Any) -> int:
+    """
+    リポジトリの戻り値に含まれる行数
+
+    - 一覧: 要素数
+    - ページ（'items' を持つ辞書）: items の件数
+    - キーごとの一覧（get_categories_for_todos など）: 一覧の件数の合計
+    - 統計のような値の辞書・真偽値・件数: 0（行を返していない）
+    """
+    if isinstance(result, (list, tuple, set)):
+        return len(result)
+    if isinstance(result, dict):
+        items = result.get('items')
+        if isinstance(items, list):
+            return len(items)
+        return sum(len(value) for value in result.values() if isinstance(value, (list, tuple, set)))
+    return 0
+
+
+class Histogram:
+    """累積バケットのヒストグラム（Prometheus形式）"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """値を記録"""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(le, 累積件数) の一覧（最後は +Inf）"""
+        result = []
+        running = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            running += count
+            result.append(('+Inf' if bound == float('inf') else repr(bound), running))
+        return result
+
+
+class RequestStats:
+    """1リクエスト内のリポジトリ操作とSQLの記録"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.calls: List[Dict[str, Any]] = []
+        self.queries: List[Dict[str, Any]] = []
+        self.round_trips = 0
+
+    def offset_ms(self, seconds: float) -> float:
+        """今終わった処理（所要 seconds 秒）の開始時刻を、リクエスト開始からのミリ秒で返す"""
+        return round((time.perf_counter() - seconds - self.started) * 1000, 3)
+
+    def summary(self) -> Dict[str, Any]:
+        """メソッドごとの集計と、実行したSQLの一覧"""
+        by_method: Dict[str, Dict[str, Any]] = {}
+        for call in self.calls:
+            method = by_method.setdefault(call['method'], {'calls': 0, 'total_ms': 0.0, 'rows': 0, 'errors': 0})
+            method['calls'] += 1
+            method['total_ms'] += call['ms']
+            method['rows'] += call['rows']
+            method['errors'] += call['error']
+        return {
+            'calls': len(self.calls),
+            'repository_ms': round(sum(call['ms'] for call in self.calls), 3),
+            'elapsed_ms': round((time.perf_counter() - self.started) * 1000, 3),
+            'round_trips': self.round_trips,
+            'by_method': {
+                name: {**method, 'total_ms': round(method['total_ms'], 3)}
+                for name, method in sorted(by_method.items(), key=lambda item: -item[1]['total_ms'])
+            },
+            'queries': self.queries,
+        }
+
+
+class RepositoryMetrics:
+    """リポジトリ操作のメトリクス（スレッドセーフ）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._current_request: contextvars.ContextVar = contextvars.ContextVar('repository_request', default=None)
+        self.reset()
+
+    def reset(self) -> None:
+        """全てのメトリクスを初期化"""
+        with self._lock:
+            self._calls: Dict[str, int] = {}
+            self._errors: Dict[str, int] = {}
+            self._rows: Dict[str, int] = {}
+            self._latency: Dict[str, Histogram] = {}
+            self._queries: Dict[str, int] = {}
+            self._query_errors: Dict[str, int] = {}
+            self._query_latency: Dict[str, Histogram] = {}
+
+    def record_call(self, method: str, seconds: float, rows: int = 0, error: bool = False) -> None:
+        """リポジトリのメソッド呼び出しを記録"""
+        with self._lock:
+            self._calls[method] = self._calls.get(method, 0) + 1
+            self._rows[method] = self._rows.get(method, 0) + rows
+            if error:
+                self._errors[method] = self._errors.get(method, 0) + 1
+            self._latency.setdefault(method, Histogram()).observe(seconds)
+        request = self._current_request.get()
+        if request is not None:
+            request.calls.append({
+                'method': method,
+                'offset_ms': request.offset_ms(seconds),
+                'ms': round(seconds * 1000, 3),
+                'rows': rows,
+                'error': error,
+            })
+
+    def record_query(self, sql: Any, seconds: float, error: bool = False) -> None:
+        """DBへの1往復（SQLの実行）を記録"""
+        text = normalize_sql(sql)
+        command = text.split(' ', 1)[0].upper() if text else 'UNKNOWN'
+        with self._lock:
+            self._queries[command] = self._queries.get(command, 0) + 1
+            if error:
+                self._query_errors[command] = self._query_errors.get(command, 0) + 1
+            self._query_latency.setdefault(command, Histogram()).observe(seconds)
+        request = self._current_request.get()
+        if request is not None:
+            request.round_trips += 1
+            if len(request.queries) < MAX_REQUEST_QUERIES:
+                request.queries.append({
+                    'sql': text, 'offset_ms': request.offset_ms(seconds), 'ms': round(seconds * 1000, 3), 'error': error
+                })
+
+    @contextmanager
+    def request_scope(self) -> Iterator[RequestStats]:
+        """ブロック内の操作を1リクエスト分として集計するコンテキスト"""
+        request = RequestStats()
+        token = self._current_request.set(request)
+        try:
+            yield request
+        finally:
+            self._current_request.reset(token)
+
+    def current_request(self) -> Optional[RequestStats]:
+        """実行中のリクエストの記録（request_scope の外ではNone）"""
+        return self._current_request.get()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """メソッドごとの集計値を取得"""
+        with self._lock:
+            return {
+                method: {
+                    'calls': calls,
+                    'errors': self._errors.get(method, 0),
+                    'rows': self._rows.get(method, 0),
+                    'total_seconds': self._latency[method].total,
+                }
+                for method, calls in sorted(self._calls.items())
+            }
+
+    def to_prometheus(self) -> str:
+        """Prometheusのテキスト形式で出力"""
+        lines: List[str] = []
+
+        def counter(name: str, help_text: str, label: str, values: Dict[str, int]) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(values.items()):
+                lines.append(f'{name}{{{label}="{key}"}} {value}')
+
+        def histogram(name: str, help_text: str, label: str, values: Dict[str, Histogram]) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, hist in sorted(values.items()):
+                for bound, count in hist.cumulative():
+                    lines.append(f'{name}_bucket{{{label}="{key}",le="{bound}"}} {count}')
+                lines.append(f'{name}_sum{{{label}="{key}"}} {hist.total}')
+                lines.append(f'{name}_count{{{label}="{key}"}} {hist.count}')
+
+        with self._lock:
+            counter("todo_repository_calls_total", "Repository method calls.", "method", self._calls)
+            counter("todo_repository_errors_total", "Repository method calls that raised.", "method", self._errors)
+            counter("todo_repository_rows_total", "Rows returned by repository methods.", "method", self._rows)
+            histogram("todo_repository_call_duration_seconds", "Repository method latency.",
+                      "method", self._latency)
+            counter("todo_db_queries_total", "Database round trips by SQL command.", "command", self._queries)
+            counter("todo_db_query_errors_total", "Failed database round trips by SQL command.",
+                    "command", self._query_errors)
+            histogram("todo_db_query_duration_seconds", "Database round-trip latency by SQL command.",
+                      "command", self._query_latency)
+        return "\n".join(lines) + "\n"
+
+
+# プロセス全体で共有する既定のメトリクス
+REPOSITORY_METRICS = RepositoryMetrics()
+
+
+class _InstrumentedRepository:
+    """リポジトリのメソッド呼び出しを計測するプロキシ（公開メソッドのみ）"""
+
+    def __init__(self, repository: Any, metrics: Optional[RepositoryMetrics] = None):
+        """
+        計測付きリポジトリの初期化
+
+        Args:
+            repository: 包むリポジトリ
+            metrics: 記録先（Noneの場合はプロセス共有の REPOSITORY_METRICS）
+        """
+        self.wrapped = repository
+        self.metrics = metrics or REPOSITORY_METRICS
+        # SQLを実行するリポジトリはDBへの往復も記録する
+        add_query_listener = getattr(repository, 'add_query_listener', None)
+        if add_query_listener is not None:
+            add_query_listener(self.metrics.record_query)
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self.wrapped, name)
+        if name.startswith('_') or name in UNMEASURED_METHODS or not callable(attribute):
+            return attribute
+        if inspect.iscoroutinefunction(attribute):
+            wrapper = self._wrap_coroutine(name, attribute)
+        elif inspect.isasyncgenfunction(attribute):
+            wrapper = self._wrap_async_generator(name, attribute)
+        else:
+            wrapper = self._wrap_function(name, attribute)
+        # 次回以降は __getattr__ を経由しないようにキャッシュする
+        self.__dict__[name] = wrapper
+        return wrapper
+
+    def _wrap_function(self, name: str, function: Callable) -> Callable:
+        """同期メソッドを計測（ジェネレータは読み切るまでを計測）"""
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+            except Exception:
+                self.metrics.record_call(name, time.perf_counter() - started, error=True)
+                raise
+            if inspect.isgenerator(result):
+                return self._measure_generator(name, result, started)
+            self.metrics.record_call(name, time.perf_counter() - started, count_rows(result))
+            return result
+        return wrapper
+
+    def _measure_generator(self, name: str, generator: Iterator[Any], started: float) -> Iterator[Any]:
+        """ジェネレータの返した件数と読み切るまでの時間を記録"""
+        rows = 0
+        error = False
+        try:
+            for item in generator:
+                rows += 1
+                yield item
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.metrics.record_call(name, time.perf_counter() - started, rows, error)
+
+    def _wrap_coroutine(self, name: str, function: Callable) -> Callable:
+        """非同期メソッドを計測"""
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = await function(*args, **kwargs)
+            except Exception:
+                self.metrics.record_call(name, time.perf_counter() - started, error=True)
+                raise
+            self.metrics.record_call(name, time.perf_counter() - started, count_rows(result))
+            return result
+        return wrapper
+
+    def _wrap_async_generator(self, name: str, function: Callable) -> Callable:
+        """非同期ジェネレータの返した件数と読み切るまでの時間を記録"""
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            rows = 0
+            error = False
+            try:
+                async for item in function(*args, **kwargs):
+                    rows += 1
+                    yield item
+            except Exception:
+                error = True
+                raise
+            finally:
+                self.metrics.record_call(name, time.perf_counter() - started, rows, error)
+        return wrapper
+
+
+class InstrumentedTodoRepository(_InstrumentedRepository):
+    """TodoRepository の呼び出しを計測するプロキシ"""
+
+
+class InstrumentedAsyncTodoRepository(_InstrumentedRepository):
+    """AsyncTodoRepository の呼び出しを計測するプロキシ"""
+
+
+# プロキシは __getattr__ で委譲するため、仮想サブクラスとして登録する
+TodoRepository.register(InstrumentedTodoRepository)
+AsyncTodoRepository.register(InstrumentedAsyncTodoRepository)
@@ -0,0 +1,108 @@
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+
+class ReadWriteLock:
+    """複数の読み込みと単一の書き込みを排他する読み書きロック
+
+    - 読み込み同士は並行して実行できる
+    - 書き込みは他の読み込み・書き込みと排他される
+    - 書き込み待ちがある間は新しい読み込みを待たせる（書き込みが飢餓状態にならない）
+    - 書き込みを保持したスレッドは、書き込み・読み込みを入れ子で取得できる
+
+    読み込みロックは再入できないため、読み込み中に同じロックの読み込みを
+    取得する処理はロックを取らない内部メソッドを呼び出すこと。
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer: Optional[int] = None
+        self._writer_depth = 0
+        self._waiting_writers = 0
+
+    def acquire_read(self) -> None:
+        """読み込みロックを取得"""
+        with self._condition:
+            if self._writer == threading.get_ident():
+                self._writer_depth += 1
+                return
+            while self._writer is not None or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+
+    def release_read(self) -> None:
+        """読み込みロックを解放"""
+        with self._condition:
+            if self._writer == threading.get_ident():
+                self._writer_depth -= 1
+                return
+            self._readers -= 1
+            if not self._readers:
+                self._condition.notify_all()
+
+    def acquire_write(self) -> None:
+        """書き込みロックを取得"""
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer == me:
+                self._writer_depth += 1
+                return
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._condition.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+            self._writer_depth = 1
+
+    def release_write(self) -> None:
+        """書き込みロックを解放"""
+        with self._condition:
+            if self._writer != threading.get_ident():
+                raise RuntimeError("書き込みロックを保持していないスレッドからの解放です")
+            self._writer_depth -= 1
+            if not self._writer_depth:
+                self._writer = None
+                self._condition.notify_all()
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        """読み込みロックを保持するコンテキスト"""
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        """書き込みロックを保持するコンテキスト"""
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class AtomicCounter:
+    """スレッドセーフな連番の採番器"""
+
+    def __init__(self, start: int = 1):
+        self._lock = threading.Lock()
+        self._next = start
+
+    @property
+    def value(self) -> int:
+        """次に採番される値"""
+        with self._lock:
+            return self._next
+
+    def next(self) -> int:
+        """値を1つ採番"""
+        with self._lock:
+            value = self._next
+            self._next += 1
+            return value
@@ -0,0 +1,715 @@
+"""メモリリポジトリの永続化（スナップショット + 追記ログ）
+
+MEMORY_DATA_DIR を指定すると、MemoryTodoRepository の代わりに DurableMemoryTodoRepository を使用する。
+
+- 更新操作は1件1行のJSONとして追記ログ（log-<開始番号>.jsonl）に書き込む
+- ログの書き込みとfsyncはバックグラウンドのスレッドがまとめて行う（グループコミット）
+- 一定件数ごとに全データのスナップショット（snapshot-<番号>.json）を書き出し、
+  それより古いログとスナップショットを削除する
+- 起動時は最新のスナップショットを読み込み、それ以降のログだけを再生する
+  （再生する件数はスナップショットの間隔で上限が決まる）
+
+MEMORY_FSYNC で書き込みの耐久性を選べる:
+    always   — 更新操作はログがfsyncされるまで待ってから戻る（同時に待つ操作は1回のfsyncにまとめる）
+    interval — MEMORY_FSYNC_INTERVAL_MS ごとにまとめてfsyncする（クラッシュ時は直近の間隔分を失い得る）
+    never    — fsyncしない（OSのキャッシュに任せる）
+
+ログの書き込みやfsyncに失敗した場合は、書きかけの行を切り詰めてから同じ記録を書き直す。
+always では、書き込めなかった記録を待っている更新操作が AppendOnlyLogError を送出する
+（メモリ上の変更は残り、書き直しかスナップショットでディスクに反映される）。
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from locks import AtomicCounter
+from repository import MemoryTodoRepository
+
+FSYNC_MODES = ('always', 'interval', 'never')
+# ログの書き込みに失敗した後、書き直すまでの間隔（秒）
+WRITE_RETRY_INTERVAL = 1.0
+# スナップショットの形式のバージョン（形式を変えたら上げる）
+# 読み込みでコードが実行されないよう、ログと同じくJSONで保存する（pickle は使わない）
+SNAPSHOT_FORMAT = 2
+# 追記ログの1行のエンコーダ（記録ごとに作らないよう共有する）
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+# プロセス終了時にログを書き切ってクローズするリポジトリ
+_live_repositories: "weakref.WeakSet[DurableMemoryTodoRepository]" = weakref.WeakSet()
+
+
+class AppendOnlyLogError(Exception):
+    """追記ログに記録を書き込めなかった"""
+    pass
+
+
+def close_all_repositories() -> None:
+    """生存している全てのリポジトリをクローズ（シャットダウンフック）"""
+    for repository in list(_live_repositories):
+        repository.close()
+
+
+atexit.register(close_all_repositories)
+
+
+def create_durable_memory_repository_from_env(data_dir: str) -> "DurableMemoryTodoRepository":
+    """環境変数の設定で永続化付きのメモリリポジトリを作成"""
+    return DurableMemoryTodoRepository(
+        data_dir,
+        fsync=os.getenv('MEMORY_FSYNC', 'always').lower(),
+        fsync_interval=float(os.getenv('MEMORY_FSYNC_INTERVAL_MS', '100')) / 1000,
+        snapshot_every=int(os.getenv('MEMORY_SNAPSHOT_EVERY', '100000')),
+    )
+
+
+def _numbered_files(directory: str, prefix: str, suffix: str) -> List[Tuple[int, str]]:
+    """<prefix>-<番号><suffix> のファイルを番号順に取得"""
+    files = []
+    for path in glob.glob(os.path.join(directory, f"{prefix}-*{suffix}")):
+        number = os.path.basename(path)[len(prefix) + 1:-len(suffix)]
+        if number.isdigit():
+            files.append((int(number), path))
+    return sorted(files)
+
+
+def _fsync_directory(directory: str) -> None:
+    """ディレクトリのエントリ（作成・名前の変更）を永続化（対応していないOSでは何もしない）"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_snapshot(directory: str, seq: int, data: Dict[str, Any]) -> str:
+    """スナップショットを一時ファイルに書いてから名前を変更し、途中の状態が残らないように保存"""
+    path = os.path.join(directory, f"snapshot-{seq:016d}.json")
+    temporary = f"{path}.tmp"
+    with open(temporary, 'wb') as f:
+        f.write(_encoder.encode(data).encode('utf-8'))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+    _fsync_directory(directory)
+    return path
+
+
+def read_snapshot(path: str) -> Dict[str, Any]:
+    """スナップショットを読み込む"""
+    with open(path, 'rb') as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or data.get('format') != SNAPSHOT_FORMAT:
+        raise ValueError(f"未対応のスナップショット形式です: {data.get('format')}")
+    return data
+
+
+def read_log(path: str) -> Iterator[Dict[str, Any]]:
+    """追記ログの記録を順に返す（書き込み途中で終わった末尾の行は無視する）"""
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                return
+            try:
+                yield json.loads(line)
+            except ValueError:
+                return
+
+
+class AppendOnlyLog:
+    """グループコミットする追記ログ
+
+    append() はメモリ上のバッファに積むだけで、バックグラウンドのスレッドが
+    たまった記録をまとめて書き込み・fsyncする。fsyncの間に積まれた記録は次の1回にまとめられる。
+    """
+
+    def __init__(self, directory: str, start_seq: int, fsync: str = 'always', fsync_interval: float = 0.1):
+        """
+        追記ログの初期化（start_seq から始まる新しいセグメントを作成する）
+
+        Args:
+            directory: ログを置くディレクトリ
+            start_seq: 最初の記録の通し番号
+            fsync: always / interval / never
+            fsync_interval: interval の場合にfsyncする間隔（秒）
+        """
+        if fsync not in FSYNC_MODES:
+            raise ValueError(f"fsync must be one of {', '.join(FSYNC_MODES)}")
+        self.directory = directory
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+
+        # 書き込み中のセグメントを入れ替えないためのロック（_cond より先に取得する）
+        self._io_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._buffer: List[str] = []
+        # 最後に積んだ記録と、ファイルに書き込んだ（fsync済みの）記録の通し番号
+        self._last_seq = start_seq - 1
+        self._durable_seq = start_seq - 1
+        self._closed = False
+        # 直近の書き込みのエラーと、書き込めなかった記録の最後の通し番号（書き込めたら None に戻す）
+        self._error: Optional[BaseException] = None
+        self._failed_seq = start_seq - 1
+        self._metrics: Dict[str, int] = {'records': 0, 'writes': 0, 'fsyncs': 0, 'bytes': 0, 'errors': 0}
+        self._file = self._open_segment(start_seq)
+        # セグメントの中で最後まで書き込めた位置（失敗した書き込みはここまで切り詰める）
+        self._offset = 0
+        self._thread = threading.Thread(target=self._run, name='todo-append-log', daemon=True)
+        self._thread.start()
+
+    def _open_segment(self, start_seq: int) -> Any:
+        """start_seq から始まるセグメントを作成（同じ番号の書きかけのファイルが残っていれば空にする）"""
+        # 失敗した書き込みの残りがバッファに残らないよう、バッファリングせずに開く
+        f = open(os.path.join(self.directory, f"log-{start_seq:016d}.jsonl"), 'wb', buffering=0)
+        _fsync_directory(self.directory)
+        return f
+
+    @property
+    def closed(self) -> bool:
+        """クローズ済みか"""
+        with self._cond:
+            return self._closed
+
+    @property
+    def last_seq(self) -> int:
+        """最後に積んだ記録の通し番号"""
+        with self._cond:
+            return self._last_seq
+
+    def append(self, record: Dict[str, Any]) -> int:
+        """記録をバッファに積み、その通し番号を返す"""
+        line = _encoder.encode(record) + '\n'
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("append-only log is closed")
+            # 書き込みスレッドが待っているのはバッファが空の間だけ
+            if not self._buffer:
+                self._cond.notify_all()
+            self._buffer.append(line)
+            self._last_seq += 1
+            return self._last_seq
+
+    def wait(self, seq: int) -> None:
+        """
+        通し番号 seq までの記録が書き込まれるまで待つ
+
+        Raises:
+            AppendOnlyLogError: seq までの記録の書き込みに失敗した場合
+        """
+        with self._cond:
+            while self._durable_seq < seq and self._thread.is_alive():
+                if self._error is not None and seq <= self._failed_seq:
+                    raise AppendOnlyLogError(f"追記ログに書き込めませんでした: {self._error}") from self._error
+                self._cond.wait(1.0)
+
+    def _run(self) -> None:
+        """バックグラウンドのスレッド：たまった記録をまとめて書き込む"""
+        while True:
+            with self._cond:
+                while not self._buffer and not self._closed:
+                    self._cond.wait()
+                if not self._buffer and self._closed:
+                    return
+            if self.fsync == 'interval':
+                # 間隔の間に積まれた記録を1回のfsyncにまとめる
+                time.sleep(self.fsync_interval)
+            with self._io_lock:
+                written = self._write_buffer_locked()
+            if not written:
+                # 書き込めなかった記録は少し待ってから書き直す（クローズされたら close() に任せる）
+                with self._cond:
+                    if self._closed:
+                        return
+                    self._cond.wait(WRITE_RETRY_INTERVAL)
+
+    def _write_buffer_locked(self) -> bool:
+        """
+        バッファの記録を書き込んでfsync（_io_lock 保持中に呼び出す）
+
+        失敗した場合は書きかけの行を切り詰め、記録をバッファの先頭に戻して次の書き込みで書き直す。
+
+        Returns:
+            バッファの記録を全て書き込めたか
+        """
+        with self._cond:
+            lines, seq = self._buffer, self._last_seq
+            self._buffer = []
+        if lines:
+            data = ''.join(lines).encode('utf-8')
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[self._file.write(view):]
+                if self.fsync != 'never':
+                    os.fsync(self._file.fileno())
+            except Exception as e:
+                print(f"追記ログ書き込みエラー: {e}")
+                self._discard_partial_write_locked()
+                with self._cond:
+                    self._buffer[:0] = lines
+                    self._error = e
+                    self._failed_seq = seq
+                    self._metrics['errors'] += 1
+                    self._cond.notify_all()
+                return False
+            self._offset += len(data)
+            with self._cond:
+                self._metrics['records'] += len(lines)
+                self._metrics['writes'] += 1
+                self._metrics['bytes'] += len(data)
+                if self.fsync != 'never':
+                    self._metrics['fsyncs'] += 1
+        with self._cond:
+            self._durable_seq = max(self._durable_seq, seq)
+            self._error = None
+            self._cond.notify_all()
+        return True
+
+    def _discard_partial_write_locked(self) -> None:
+        """
+        失敗した書き込みの残りを最後まで書き込めた位置で切り詰める（_io_lock 保持中に呼び出す）
+
+        書きかけの行の後ろに記録を追記すると、読み込みがその行で止まって後の記録を失うため。
+        切り詰められない場合は、書き込めた記録の次の通し番号から新しいセグメントに切り替える。
+        """
+        try:
+            self._file.truncate(self._offset)
+            self._file.seek(self._offset)
+            return
+        except Exception as e:
+            print(f"追記ログ切り詰めエラー: {e}")
+        try:
+            self._file.close()
+        except Exception:
+            pass
+        with self._cond:
+            seq = self._durable_seq
+        try:
+            self._file = self._open_segment(seq + 1)
+            self._offset = 0
+        except Exception as e:
+            # 次の書き込みも失敗し、そこで改めて切り替える
+            print(f"追記ログのセグメント作成エラー: {e}")
+
+    def rotate(self) -> int:
+        """
+        ここまでの記録を書き込んでセグメントを閉じ、次の通し番号から新しいセグメントを開始
+
+        append() と同時に呼び出さないこと（呼び出し側で更新を止めておく）。
+
+        Returns:
+            閉じたセグメントの最後の記録の通し番号
+
+        Raises:
+            AppendOnlyLogError: 書き込めなかった記録がある場合（セグメントは切り替えない）
+        """
+        with self._io_lock:
+            if not self._write_buffer_locked():
+                raise AppendOnlyLogError("書き込めなかった記録があるため、セグメントを切り替えられません")
+            with self._cond:
+                seq = self._last_seq
+            self._file.close()
+            self._file = self._open_segment(seq + 1)
+            self._offset = 0
+            return seq
+
+    def stats(self) -> Dict[str, Any]:
+        """ログのメトリクスを取得"""
+        with self._cond:
+            stats: Dict[str, Any] = {
+                'fsync': self.fsync,
+                'last_seq': self._last_seq,
+                'durable_seq': self._durable_seq,
+                'buffered': len(self._buffer),
+                'last_error': str(self._error) if self._error is not None else None,
+            }
+            stats.update(self._metrics)
+            return stats
+
+    def close(self) -> None:
+        """残りの記録を書き込んでスレッドを止め、ファイルを閉じる"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        with self._io_lock:
+            self._write_buffer_locked()
+            self._file.close()
+
+
+class DurableMemoryTodoRepository(MemoryTodoRepository):
+    """追記ログとスナップショットで永続化するメモリリポジトリ
+
+    データの持ち方・読み込みは MemoryTodoRepository と同じで、更新操作（書き込みロックの中）の
+    結果を追記ログに記録する。作業単位の中の更新は、作業単位の終了時に1行にまとめて記録する
+    （ロールバックした場合は記録しない）。
+    """
+
+    def __init__(self, data_dir: str, fsync: str = 'always', fsync_interval: float = 0.1,
+                 snapshot_every: int = 100000):
+        """
+        リポジトリの初期化（最新のスナップショットとそれ以降のログからデータを復元する）
+
+        Args:
+            data_dir: スナップショットと追記ログを置くディレクトリ
+            fsync: always / interval / never
+            fsync_interval: interval の場合にfsyncする間隔（秒）
+            snapshot_every: この件数の記録ごとにスナップショットを取る（0以下なら close() 時のみ）
+        """
+        super().__init__()
+        self.data_dir = data_dir
+        self.snapshot_every = snapshot_every
+        os.makedirs(data_dir, exist_ok=True)
+
+        # スレッドごとの最後に積んだ記録の番号と、作業単位の実行中か
+        self._local = threading.local()
+        # 作業単位の中で積んだ記録（書き込みロックを保持したスレッドだけが参照する）
+        self._pending_records: Optional[List[Dict[str, Any]]] = None
+        # 一括の状態更新・削除で変更したTodoID（1行にまとめて記録する）
+        self._changed_ids: Optional[List[int]] = None
+        self._snapshot_lock = threading.Lock()
+        self._last_snapshot: Optional[Dict[str, Any]] = None
+        self._closed = False
+
+        started = time.perf_counter()
+        next_seq, self._records_since_snapshot = self._load()
+        self._load_seconds = time.perf_counter() - started
+        self._log = AppendOnlyLog(data_dir, next_seq, fsync, fsync_interval)
+        _live_repositories.add(self)
+
+    # --- 復元 ---
+
+    def _load(self) -> Tuple[int, int]:
+        """最新のスナップショットを読み込んでログを再生し、(次の通し番号, 再生した件数) を返す"""
+        todos: Dict[int, Dict[str, Any]] = {}
+        categories: Dict[int, Dict[str, Any]] = {}
+        links: Dict[int, Dict[int, None]] = {}
+        next_ids = {'todo': 1, 'category': 1}
+        snapshot_seq = 0
+
+        for seq, path in reversed(_numbered_files(self.data_dir, 'snapshot', '.json')):
+            try:
+                data = read_snapshot(path)
+            except Exception as e:
+                print(f"スナップショット読み込みエラー: {path}: {e}")
+                continue
+            for todo_id, title, state, created_at, updated_at in data['todos']:
+                todo = {'id': todo_id, 'title': title, 'state': state, 'created_at': created_at}
+                if updated_at is not None:
+                    todo['updated_at'] = updated_at
+                todos[todo_id] = todo
+            for category_id, title, created_at in data['categories']:
+                categories[category_id] = {'id': category_id, 'title': title, 'created_at': created_at}
+            for todo_id, category_ids in data['links']:
+                links[todo_id] = dict.fromkeys(category_ids)
+            next_ids = {'todo': data['next_todo_id'], 'category': data['next_category_id']}
+            snapshot_seq = seq
+            break
+
+        next_seq = snapshot_seq + 1
+        replayed = 0
+        for start, path in _numbered_files(self.data_dir, 'log', '.jsonl'):
+            # スナップショットに含まれるセグメントは読まない
+            if start <= snapshot_seq:
+                continue
+            count = 0
+            for record in read_log(path):
+                self._replay(record, todos, categories, links, next_ids)
+                count += 1
+            next_seq = max(next_seq, start + count)
+            replayed += count
+
+        self._restore((todos, categories, links))
+        self._todo_ids = AtomicCounter(max(next_ids['todo'], max(todos, default=0) + 1))
+        self._category_ids = AtomicCounter(max(next_ids['category'], max(categories, default=0) + 1))
+        return next_seq, replayed
+
+    @staticmethod
+    def _replay(record: Dict[str, Any], todos: Dict[int, Dict[str, Any]], categories: Dict[int, Dict[str, Any]],
+                links: Dict[int, Dict[int, None]], next_ids: Dict[str, int]) -> None:
+        """記録を1件、インデックスを作る前のデータに適用"""
+        op = record['op']
+        if op == 'todo':
+            todo = record['todo']
+            todos[todo['id']] = todo
+            links[todo['id']] = dict.fromkeys(record['categories'])
+            next_ids['todo'] = max(next_ids['todo'], todo['id'] + 1)
+        elif op == 'category':
+            category = record['category']
+            categories[category['id']] = category
+            next_ids['category'] = max(next_ids['category'], category['id'] + 1)
+        elif op == 'state':
+            for todo_id in record['ids']:
+                todo = todos.get(todo_id)
+                if todo is not None:
+                    todos[todo_id] = {**todo, 'state': record['state'], 'updated_at': record['updated_at']}
+        elif op == 'delete':
+            for todo_id in record['ids']:
+                todos.pop(todo_id, None)
+                links.pop(todo_id, None)
+        elif op == 'batch':
+            for child in record['records']:
+                DurableMemoryTodoRepository._replay(child, todos, categories, links, next_ids)
+
+    # --- 更新の記録（書き込みロック保持中に呼び出される） ---
+
+    def _record(self, record: Dict[str, Any]) -> None:
+        """記録を追記ログに積む（作業単位の中では終了時までためておく）"""
+        if self._pending_records is not None:
+            self._pending_records.append(record)
+            return
+        self._local.last_seq = self._log.append(record)
+        self._records_since_snapshot += 1
+
+    def _insert_todo(self, title: str, category_ids: Optional[List[int]] = None) -> int:
+        """Todoを登録して記録する"""
+        todo_id = super()._insert_todo(title, category_ids)
+        self._record({'op': 'todo', 'todo': self._todos[todo_id],
+                      'categories': list(self._todo_to_categories[todo_id])})
+        return todo_id
+
+    def _insert_category(self, title: str) -> int:
+        """カテゴリを登録して記録する"""
+        category_id = super()._insert_category(title)
+        self._record({'op': 'category', 'category': self._categories[category_id]})
+        return category_id
+
+    def _set_state(self, todo: Dict[str, Any], new_state: str, updated_at: str) -> None:
+        """Todoの状態を更新して記録する（一括更新の中では対象IDを集めるだけ）"""
+        super()._set_state(todo, new_state, updated_at)
+        if self._changed_ids is not None:
+            self._changed_ids.append(todo['id'])
+        else:
+            self._record({'op': 'state', 'ids': [todo['id']], 'state': new_state, 'updated_at': updated_at})
+
+    def _update_states(self, todo_ids: Iterable[int], new_state: str) -> int:
+        """複数Todoの状態を更新し、変更したIDを1行にまとめて記録する"""
+        self._changed_ids = []
+        try:
+            return super()._update_states(todo_ids, new_state)
+        finally:
+            changed, self._changed_ids = self._changed_ids, None
+            if changed:
+                self._record({'op': 'state', 'ids': changed, 'state': new_state,
+                              'updated_at': self._todos[changed[0]]['updated_at']})
+
+    def _remove_todo(self, todo_id: int) -> Optional[Dict[str, Any]]:
+        """Todoを削除して記録する（一括削除の中では対象IDを集めるだけ）"""
+        todo = super()._remove_todo(todo_id)
+        if todo is not None:
+            if self._changed_ids is not None:
+                self._changed_ids.append(todo_id)
+            else:
+                self._record({'op': 'delete', 'ids': [todo_id]})
+        return todo
+
+    def _remove_todos(self, todo_ids: Iterable[int]) -> int:
+        """複数Todoを削除し、削除したIDを1行にまとめて記録する"""
+        self._changed_ids = []
+        try:
+            return super()._remove_todos(todo_ids)
+        finally:
+            changed, self._changed_ids = self._changed_ids, None
+            if changed:
+                self._record({'op': 'delete', 'ids': changed})
+
+    @contextmanager
+    def unit_of_work(self) -> Iterator[None]:
+        """
+        作業単位（終了時に中の更新を1行にまとめて記録し、ロールバックした場合は記録しない）
+
+        クラッシュ時に復元されるのは作業単位の全体か、何も無いかのどちらかになる。
+        """
+        if getattr(self._local, 'in_unit_of_work', False):
+            yield
+            return
+        with super().unit_of_work():
+            self._local.in_unit_of_work = True
+            self._pending_records = []
+            try:
+                yield
+                records = self._pending_records
+            finally:
+                self._pending_records = None
+                self._local.in_unit_of_work = False
+            if records:
+                # 作業単位の書き込みロックを保持したまま積み、他の更新と順序が入れ替わらないようにする
+                self._record({'op': 'batch', 'records': records})
+        self._after_write()
+
+    def _after_write(self) -> None:
+        """
+        更新操作の後処理（fsyncを待つ・スナップショットの間隔に達したら作成を始める）
+
+        Raises:
+            AppendOnlyLogError: always で、この更新の記録をログに書き込めなかった場合
+        """
+        if getattr(self._local, 'in_unit_of_work', False):
+            return
+        if self._log.fsync == 'always':
+            self._log.wait(getattr(self._local, 'last_seq', 0))
+        if 0 < self.snapshot_every <= self._records_since_snapshot:
+            self._start_snapshot()
+
+    # --- 更新操作 ---
+
+    def add_todo(self, title: str, category_ids: Optional[List[int]] = None) -> bool:
+        """新しいTodoを追加"""
+        result = super().add_todo(title, category_ids)
+        self._after_write()
+        return result
+
+    def add_category(self, title: str) -> bool:
+        """新しいカテゴリを追加"""
+        result = super().add_category(title)
+        self._after_write()
+        return result
+
+    def bulk_add_todos(self, todos: Iterable[Dict[str, Any]], batch_size: int = 1000) -> List[int]:
+        """Todoを一括追加"""
+        result = super().bulk_add_todos(todos, batch_size)
+        self._after_write()
+        return result
+
+    def bulk_add_categories(self, titles: Iterable[str], batch_size: int = 1000) -> List[int]:
+        """カテゴリを一括追加"""
+        result = super().bulk_add_categories(titles, batch_size)
+        self._after_write()
+        return result
+
+    def update_todo_state(self, todo_id: int, new_state: str) -> bool:
+        """Todoの状態を更新"""
+        result = super().update_todo_state(todo_id, new_state)
+        self._after_write()
+        return result
+
+    def delete_todo(self, todo_id: int) -> bool:
+        """Todoを削除"""
+        result = super().delete_todo(todo_id)
+        self._after_write()
+        return result
+
+    def bulk_update_state(self, todo_ids: Iterable[int], new_state: str) -> int:
+        """複数Todoの状態を更新"""
+        result = super().bulk_update_state(todo_ids, new_state)
+        self._after_write()
+        return result
+
+    def bulk_delete(self, todo_ids: Iterable[int]) -> int:
+        """複数Todoを削除"""
+        result = super().bulk_delete(todo_ids)
+        self._after_write()
+        return result
+
+    def update_state_where(self, new_state: str, filter_state: str = "all",
+                           filter_category: Optional[int] = None) -> int:
+        """フィルター条件に合う全てのTodoの状態を更新"""
+        result = super().update_state_where(new_state, filter_state, filter_category)
+        self._after_write()
+        return result
+
+    def delete_where(self, filter_state: str = "all", filter_category: Optional[int] = None) -> int:
+        """フィルター条件に合う全てのTodoを削除"""
+        result = super().delete_where(filter_state, filter_category)
+        self._after_write()
+        return result
+
+    # --- スナップショット ---
+
+    def snapshot(self) -> Optional[str]:
+        """スナップショットを作成し、そのパスを返す（失敗時はNone）"""
+        with self._snapshot_lock:
+            return self._write_snapshot()
+
+    def _start_snapshot(self) -> None:
+        """バックグラウンドでスナップショットの作成を始める（作成中なら何もしない）"""
+        if not self._snapshot_lock.acquire(blocking=False):
+            return
+
+        def run() -> None:
+            try:
+                self._write_snapshot()
+            finally:
+                self._snapshot_lock.release()
+
+        threading.Thread(target=run, name='todo-snapshot', daemon=True).start()
+
+    def _write_snapshot(self) -> Optional[str]:
+        """スナップショットを作成（_snapshot_lock 保持中に呼び出す）"""
+        try:
+            # 複製とログの切り替えだけを読み込みロックの中で行い、書き出しはロックの外で行う
+            with self._lock.read():
+                todos = dict(self._todos)
+                categories = dict(self._categories)
+                # 関連付けの辞書はTodoの登録時にだけ作られ、その後は書き換えないため外側だけを複製する
+                links = dict(self._todo_to_categories)
+                next_todo_id, next_category_id = self.next_todo_id, self.next_category_id
+                seq = self._log.rotate()
+                self._records_since_snapshot = 0
+
+            started = time.perf_counter()
+            path = write_snapshot(self.data_dir, seq, {
+                'format': SNAPSHOT_FORMAT,
+                'seq': seq,
+                'next_todo_id': next_todo_id,
+                'next_category_id': next_category_id,
+                # 辞書のまま保存するより小さく、読み込みも速い列の並びで保存する
+                'todos': [(todo['id'], todo['title'], todo['state'], todo['created_at'], todo.get('updated_at'))
+                          for todo in todos.values()],
+                'categories': [(category['id'], category['title'], category['created_at'])
+                               for category in categories.values()],
+                'links': [(todo_id, list(category_ids)) for todo_id, category_ids in links.items() if category_ids],
+            })
+            # スナップショットに含まれるログと、古いスナップショットを削除
+            for start, old_path in _numbered_files(self.data_dir, 'log', '.jsonl'):
+                if start <= seq:
+                    os.remove(old_path)
+            for old_seq, old_path in _numbered_files(self.data_dir, 'snapshot', '.json'):
+                if old_seq < seq:
+                    os.remove(old_path)
+            self._last_snapshot = {
+                'seq': seq,
+                'todos': len(todos),
+                'bytes': os.path.getsize(path),
+                'seconds': round(time.perf_counter() - started, 3),
+            }
+            return path
+        except Exception as e:
+            print(f"スナップショット作成エラー: {e}")
+            return None
+
+    def get_persistence_stats(self) -> Dict[str, Any]:
+        """永続化のメトリクスを取得"""
+        stats = self._log.stats()
+        stats.update({
+            'data_dir': self.data_dir,
+            'snapshot_every': self.snapshot_every,
+            'records_since_snapshot': self._records_since_snapshot,
+            'load_seconds': round(self._load_seconds, 3),
+            'last_snapshot': self._last_snapshot,
+        })
+        return stats
+
+    def close(self) -> None:
+        """スナップショットを作成してログを閉じる（何度呼び出してもよい）"""
+        if self._closed:
+            return
+        self._closed = True
+        _live_repositories.discard(self)
+        # 作成中のスナップショットがあれば終わるのを待つ
+        with self._snapshot_lock:
+            if self._records_since_snapshot and not self._log.closed:
+                self._write_snapshot()
+        self._log.close()
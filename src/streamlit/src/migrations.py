@@ -0,0 +1,341 @@
+"""Neon PostgreSQL のスキーマ移行
+
+スキーマはバージョン付きの移行（MIGRATIONS）として管理し、適用済みのバージョンを
+schema_migrations 表に記録する。複数プロセスが同時に起動しても二重に適用されないよう、
+アドバイザリロックを取った1トランザクションの中で未適用の移行だけを順に実行する。
+
+コマンドラインからも実行できる:
+
+    python src/migrations.py          # 未適用の移行を適用
+    python src/migrations.py --status # 適用状況を表示
+"""
+import sys
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Set, Tuple
+
+# 同時実行を防ぐアドバイザリロックのキー（任意の固定値）
+MIGRATION_LOCK_ID = 7_420_011
+
+SCHEMA_MIGRATIONS_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
+CREATE_TABLES_SQL = """
+    CREATE TABLE IF NOT EXISTS categories (
+        id SERIAL PRIMARY KEY,
+        title VARCHAR(255) NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS todos (
+        id SERIAL PRIMARY KEY,
+        title VARCHAR(255) NOT NULL,
+        state VARCHAR(50) DEFAULT 'todo',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS todo_categories (
+        todo_id INTEGER REFERENCES todos(id) ON DELETE CASCADE,
+        category_id INTEGER REFERENCES categories(id) ON DELETE CASCADE,
+        PRIMARY KEY (todo_id, category_id)
+    );
+"""
+
+# 一覧クエリの形に合わせたインデックス
+# - 全件の新しい順 / キーセットページング: ORDER BY created_at DESC, id DESC
+# - 状態フィルター付き: WHERE state = %s ORDER BY created_at DESC, id DESC
+# - カテゴリフィルター・カテゴリ別統計: todo_categories を category_id から引く
+#   （主キー (todo_id, category_id) は category_id 起点の検索に使えない）
+QUERY_INDEXES_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_todos_created_at_id
+        ON todos (created_at DESC, id DESC);
+
+    CREATE INDEX IF NOT EXISTS idx_todos_state_created_at_id
+        ON todos (state, created_at DESC, id DESC);
+
+    CREATE INDEX IF NOT EXISTS idx_todo_categories_category_id_todo_id
+        ON todo_categories (category_id, todo_id);
+"""
+
+# 状態別件数のカウンタ表。件数を更新するトリガーは NEON_STATS_MODE=counter の場合だけ
+# STATE_COUNT_TRIGGERS_SQL で設置する（全ての書き込みが1行のカウンタを更新するため、
+# 使わない構成では同時書き込みを直列化するだけになる）。
+STATE_COUNTS_SQL = """
+    CREATE TABLE IF NOT EXISTS todo_state_counts (
+        state VARCHAR(50) PRIMARY KEY,
+        count BIGINT NOT NULL DEFAULT 0
+    );
+
+    CREATE OR REPLACE FUNCTION todo_state_counts_apply() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE todo_state_counts s SET count = s.count - o.n
+            FROM (SELECT state, COUNT(*) AS n FROM old_rows GROUP BY state) o
+            WHERE s.state = o.state;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO todo_state_counts (state, count)
+            SELECT state, COUNT(*) FROM new_rows GROUP BY state
+            ON CONFLICT (state) DO UPDATE SET count = todo_state_counts.count + EXCLUDED.count;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+# 設置済みかを調べる条件（3つのトリガーが全て揃っていれば設置済み）
+_STATE_COUNT_TRIGGERS_EXIST = """
+    (SELECT COUNT(*) FROM pg_trigger
+     WHERE tgrelid = 'todos'::regclass
+       AND tgname IN ('todos_state_counts_insert', 'todos_state_counts_update', 'todos_state_counts_delete'))
+"""
+
+# カウンタのトリガーを設置（counter モード）。トリガーの無い間の件数は信用できないため、
+# 設置時にカウンタを数え直す。数え直しから設置までの間に書き込まれた行を取りこぼさないよう、
+# todos への書き込みを止めるロック（読み込みは止めない）を取る。設置済みなら何もしない。
+STATE_COUNT_TRIGGERS_SQL = f"""
+    DO $$
+    BEGIN
+        IF {_STATE_COUNT_TRIGGERS_EXIST} < 3 THEN
+            LOCK TABLE todos IN SHARE ROW EXCLUSIVE MODE;
+
+            DELETE FROM todo_state_counts;
+            INSERT INTO todo_state_counts (state, count)
+            SELECT state, COUNT(*) FROM todos GROUP BY state;
+
+            DROP TRIGGER IF EXISTS todos_state_counts_insert ON todos;
+            CREATE TRIGGER todos_state_counts_insert AFTER INSERT ON todos
+                REFERENCING NEW TABLE AS new_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION todo_state_counts_apply();
+
+            DROP TRIGGER IF EXISTS todos_state_counts_update ON todos;
+            CREATE TRIGGER todos_state_counts_update AFTER UPDATE ON todos
+                REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION todo_state_counts_apply();
+
+            DROP TRIGGER IF EXISTS todos_state_counts_delete ON todos;
+            CREATE TRIGGER todos_state_counts_delete AFTER DELETE ON todos
+                REFERENCING OLD TABLE AS old_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION todo_state_counts_apply();
+        END IF;
+    END $$;
+"""
+
+# カウンタのトリガーを削除（aggregate モード）。無ければテーブルのロックも取らない。
+DROP_STATE_COUNT_TRIGGERS_SQL = f"""
+    DO $$
+    BEGIN
+        IF {_STATE_COUNT_TRIGGERS_EXIST} > 0 THEN
+            DROP TRIGGER IF EXISTS todos_state_counts_insert ON todos;
+            DROP TRIGGER IF EXISTS todos_state_counts_update ON todos;
+            DROP TRIGGER IF EXISTS todos_state_counts_delete ON todos;
+        END IF;
+    END $$;
+"""
+
+# タイトル検索（ILIKE '%語%'）用のトライグラムインデックス
+TITLE_SEARCH_SQL = """
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+    CREATE INDEX IF NOT EXISTS idx_todos_title_trgm
+        ON todos USING GIN (title gin_trgm_ops);
+"""
+
+# (バージョン, 名前, SQL) — 適用済みの移行は書き換えず、変更は新しいバージョンで追加する
+MIGRATIONS: List[Tuple[int, str, str]] = [
+    (1, 'create_tables', CREATE_TABLES_SQL),
+    (2, 'add_query_indexes', QUERY_INDEXES_SQL),
+    (3, 'add_todo_state_counts', STATE_COUNTS_SQL),
+    (4, 'add_title_search_index', TITLE_SEARCH_SQL),
+]
+
+
+def pending_migrations(applied_versions: List[int]) -> List[Tuple[int, str, str]]:
+    """未適用の移行をバージョン順に取得"""
+    applied = set(applied_versions)
+    return [migration for migration in sorted(MIGRATIONS) if migration[0] not in applied]
+
+
+def apply_migrations(conn) -> List[int]:
+    """
+    未適用の移行を1トランザクションで適用（psycopg2 の接続）
+
+    Args:
+        conn: psycopg2 の接続
+
+    Returns:
+        今回適用した移行のバージョン一覧
+    """
+    try:
+        with conn.cursor() as cursor:
+            # トランザクション終了まで保持されるロックで同時実行を直列化
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+            cursor.execute(SCHEMA_MIGRATIONS_SQL)
+            cursor.execute("SELECT version FROM schema_migrations")
+            applied_versions = [row[0] for row in cursor.fetchall()]
+
+            versions = []
+            for version, name, sql in pending_migrations(applied_versions):
+                cursor.execute(sql)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                    (version, name)
+                )
+                versions.append(version)
+        conn.commit()
+        return versions
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def state_count_triggers_sql(counter_mode: bool) -> str:
+    """統計の取得方法に合わせてカウンタのトリガーを設置・削除するSQL"""
+    return STATE_COUNT_TRIGGERS_SQL if counter_mode else DROP_STATE_COUNT_TRIGGERS_SQL
+
+
+def apply_state_count_triggers(conn, counter_mode: bool) -> None:
+    """
+    カウンタのトリガーを counter モードの場合だけ設置し、それ以外では削除（psycopg2 の接続）
+
+    Args:
+        conn: psycopg2 の接続
+        counter_mode: NEON_STATS_MODE=counter か
+    """
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+            cursor.execute(state_count_triggers_sql(counter_mode))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+async def apply_state_count_triggers_async(conn, counter_mode: bool) -> None:
+    """apply_state_count_triggers の asyncpg 版"""
+    async with conn.transaction():
+        await conn.execute("SELECT pg_advisory_xact_lock($1)", MIGRATION_LOCK_ID)
+        await conn.execute(state_count_triggers_sql(counter_mode))
+
+
+async def apply_migrations_async(conn) -> List[int]:
+    """
+    未適用の移行を1トランザクションで適用（asyncpg の接続）
+
+    Args:
+        conn: asyncpg の接続
+
+    Returns:
+        今回適用した移行のバージョン一覧
+    """
+    async with conn.transaction():
+        await conn.execute("SELECT pg_advisory_xact_lock($1)", MIGRATION_LOCK_ID)
+        await conn.execute(SCHEMA_MIGRATIONS_SQL)
+        applied_versions = [row['version'] for row in await conn.fetch("SELECT version FROM schema_migrations")]
+
+        versions = []
+        for version, name, sql in pending_migrations(applied_versions):
+            await conn.execute(sql)
+            await conn.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)", version, name
+            )
+            versions.append(version)
+        return versions
+
+
+# 移行を適用済みの接続先（プロセス内で共有し、セッションごとのDDLを避ける）
+_initialized_schemas: Set[str] = set()
+_schema_lock = threading.Lock()
+
+
+def ensure_schema(key: str, apply: Callable[[], List[int]]) -> List[int]:
+    """
+    接続先ごとにプロセス内で1回だけ移行を適用
+
+    同じ接続先に対する2回目以降の呼び出しはDBにアクセスしない。
+    失敗した場合は例外を送出し、次の呼び出しで再試行する。
+
+    Args:
+        key: 接続先を識別するキー（接続文字列）
+        apply: 移行を適用して適用したバージョンを返す関数
+
+    Returns:
+        今回適用した移行のバージョン一覧
+    """
+    if key in _initialized_schemas:
+        return []
+    with _schema_lock:
+        if key in _initialized_schemas:
+            return []
+        try:
+            versions = apply()
+        except Exception as e:
+            print(f"スキーマ移行エラー: {e}")
+            raise
+        _initialized_schemas.add(key)
+        return versions
+
+
+async def ensure_schema_async(key: str, apply: Callable[[], Awaitable[List[int]]]) -> List[int]:
+    """ensure_schema の非同期版（同時実行時の重複適用はアドバイザリロックで無害化される）"""
+    if key in _initialized_schemas:
+        return []
+    try:
+        versions = await apply()
+    except Exception as e:
+        print(f"スキーマ移行エラー: {e}")
+        raise
+    with _schema_lock:
+        _initialized_schemas.add(key)
+    return versions
+
+
+def get_migration_status(conn) -> List[Dict[str, Any]]:
+    """各移行の適用状況を取得"""
+    with conn.cursor() as cursor:
+        cursor.execute(SCHEMA_MIGRATIONS_SQL)
+        cursor.execute("SELECT version, applied_at FROM schema_migrations")
+        applied = dict(cursor.fetchall())
+    conn.commit()
+    return [
+        {'version': version, 'name': name, 'applied_at': applied.get(version)}
+        for version, name, _ in sorted(MIGRATIONS)
+    ]
+
+
+def main(argv: List[str]) -> int:
+    """コマンドラインから移行を実行"""
+    import psycopg2
+    from dotenv import load_dotenv
+    from repository import get_neon_connection_string
+
+    load_dotenv('env.local')
+    conn = psycopg2.connect(get_neon_connection_string())
+    try:
+        if '--status' in argv:
+            for migration in get_migration_status(conn):
+                applied_at = migration['applied_at'] or '未適用'
+                print(f"{migration['version']:>4}  {migration['name']:<30} {applied_at}")
+            return 0
+
+        versions = apply_migrations(conn)
+        if versions:
+            print(f"✅ 移行を適用しました: {', '.join(str(version) for version in versions)}")
+        else:
+            print("✅ スキーマは最新です")
+        return 0
+    except Exception as e:
+        print(f"移行エラー: {e}")
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,266 @@
+import atexit
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Tuple
+
+
+class PoolError(Exception):
+    """接続プールの基底例外"""
+
+
+class PoolTimeoutError(PoolError):
+    """接続の取得がタイムアウトした場合の例外"""
+
+
+class PoolClosedError(PoolError):
+    """クローズ済みのプールを使用した場合の例外"""
+
+
+# プロセス終了時にクローズするプール
+_live_pools: "weakref.WeakSet[ConnectionPool]" = weakref.WeakSet()
+
+
+def close_all_pools() -> None:
+    """生存している全てのプールをクローズ（シャットダウンフック）"""
+    for pool in list(_live_pools):
+        pool.close()
+
+
+atexit.register(close_all_pools)
+
+
+class ConnectionPool:
+    """スレッドセーフなDB接続プール
+
+    - 最小/最大接続数を指定可能
+    - 取得時にヘルスチェックを行い、壊れた接続は作り直す
+    - 一定時間使われていない接続は最小接続数を超える分だけ破棄する
+    """
+
+    def __init__(self, connect: Callable[[], Any], min_size: int = 1, max_size: int = 10,
+                 max_idle_seconds: float = 300.0, timeout: float = 30.0,
+                 health_check_interval: float = 30.0):
+        """
+        プールの初期化（接続は初回取得時に作成する）
+
+        Args:
+            connect: 新しい接続を作成する関数
+            min_size: 維持する最小接続数
+            max_size: 同時に開く最大接続数
+            max_idle_seconds: 未使用の接続を破棄するまでの秒数
+            timeout: 接続が空くのを待つ最大秒数
+            health_check_interval: この秒数以上未使用だった接続は取得時に疎通確認する
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be >= 1")
+        if min_size < 0 or min_size > max_size:
+            raise ValueError("min_size must be between 0 and max_size")
+
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle_seconds = max_idle_seconds
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._cond = threading.Condition()
+        # (接続, 最終利用時刻) 。末尾が直近に返却された接続
+        self._idle: Deque[Tuple[Any, float]] = deque()
+        self._in_use = 0
+        self._closed = False
+        self._warmed_up = False
+        self._metrics: Dict[str, float] = {
+            'created': 0,
+            'closed': 0,
+            'checkouts': 0,
+            'evicted': 0,
+            'health_check_failures': 0,
+            'timeouts': 0,
+            'waits': 0,
+            'wait_seconds': 0.0,
+        }
+        _live_pools.add(self)
+
+    @property
+    def size(self) -> int:
+        """現在開いている接続数"""
+        with self._cond:
+            return len(self._idle) + self._in_use
+
+    def getconn(self) -> Any:
+        """プールから接続を取得"""
+        stale = []
+        conn = None
+        last_used = 0.0
+        with self._cond:
+            if self._closed:
+                raise PoolClosedError("connection pool is closed")
+            stale = self._evict_idle_locked()
+
+            deadline = time.monotonic() + self.timeout
+            waited = False
+            wait_started = time.monotonic()
+            while True:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._in_use < self.max_size:
+                    # 枠だけ確保し、接続はロックの外で作成する
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._metrics['timeouts'] += 1
+                    raise PoolTimeoutError(
+                        f"could not get a connection within {self.timeout} seconds"
+                    )
+                waited = True
+                self._cond.wait(remaining)
+                if self._closed:
+                    raise PoolClosedError("connection pool is closed")
+
+            self._in_use += 1
+            self._metrics['checkouts'] += 1
+            if waited:
+                self._metrics['waits'] += 1
+                self._metrics['wait_seconds'] += time.monotonic() - wait_started
+            warm_up = not self._warmed_up
+            self._warmed_up = True
+
+        self._close_all(stale)
+
+        try:
+            if conn is None:
+                conn = self._create()
+            elif not self._is_healthy(conn, last_used):
+                with self._cond:
+                    self._metrics['health_check_failures'] += 1
+                self._close_all([conn])
+                conn = self._create()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        if warm_up:
+            self._fill_to_min_size()
+        return conn
+
+    def putconn(self, conn: Any, discard: bool = False) -> None:
+        """接続をプールへ返却"""
+        with self._cond:
+            self._in_use -= 1
+            keep = not discard and not self._closed and not _is_closed(conn)
+            if keep:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if not keep:
+            self._close_all([conn])
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """接続を借りて、ブロック終了時に返却するコンテキストマネージャ"""
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def close(self) -> None:
+        """プールをクローズし、未使用の接続を全て閉じる（使用中の接続は返却時に閉じる）"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._cond.notify_all()
+        self._close_all(idle)
+
+    def stats(self) -> Dict[str, Any]:
+        """プールのメトリクスを取得"""
+        with self._cond:
+            stats: Dict[str, Any] = {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'size': len(self._idle) + self._in_use,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'closed_pool': self._closed,
+            }
+            stats.update({
+                key: (round(value, 6) if isinstance(value, float) else int(value))
+                for key, value in self._metrics.items()
+            })
+            return stats
+
+    def _create(self) -> Any:
+        """新しい接続を作成"""
+        conn = self._connect()
+        with self._cond:
+            self._metrics['created'] += 1
+        return conn
+
+    def _fill_to_min_size(self) -> None:
+        """最小接続数まで接続を作成してプールに追加"""
+        while True:
+            with self._cond:
+                if self._closed or len(self._idle) + self._in_use >= self.min_size:
+                    return
+                # 作成中の接続分の枠を確保
+                self._in_use += 1
+            try:
+                conn = self._create()
+            except Exception as e:
+                with self._cond:
+                    self._in_use -= 1
+                print(f"接続プール初期化エラー: {e}")
+                return
+            self.putconn(conn)
+
+    def _is_healthy(self, conn: Any, last_used: float) -> bool:
+        """接続が利用可能かを確認"""
+        if _is_closed(conn):
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _evict_idle_locked(self) -> list:
+        """最小接続数を超える古い未使用接続を取り除く（ロック保持中に呼び出す）"""
+        if self.max_idle_seconds <= 0:
+            return []
+        threshold = time.monotonic() - self.max_idle_seconds
+        evicted = []
+        # 先頭ほど長く使われていない
+        while (self._idle and self._idle[0][1] < threshold
+               and len(self._idle) + self._in_use > self.min_size):
+            conn, _ = self._idle.popleft()
+            evicted.append(conn)
+        self._metrics['evicted'] += len(evicted)
+        return evicted
+
+    def _close_all(self, conns: list) -> None:
+        """接続をまとめて閉じる"""
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+            with self._cond:
+                self._metrics['closed'] += 1
+
+
+def _is_closed(conn: Any) -> bool:
+    """接続が閉じられているか（psycopg2では closed が0以外）"""
+    closed = getattr(conn, 'closed', 0)
+    return isinstance(closed, (bool, int)) and bool(closed)
@@ -0,0 +1,124 @@
+"""Streamlitの再実行ごとのプロファイラ
+
+TODO_PROFILE を有効にすると、1回の再実行について描画フェーズごとの所要時間と
+リポジトリ呼び出し（instrumentation.RequestStats の記録）を同じ時間軸で集計する。
+TODO_PROFILE_DUMP_DIR を指定すると、再実行ごとの cProfile の結果を .prof ファイルとして保存する。
+"""
+import cProfile
+import io
+import os
+import pstats
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from instrumentation import RequestStats
+
+PROFILE_ENV = 'TODO_PROFILE'
+PROFILE_DUMP_DIR_ENV = 'TODO_PROFILE_DUMP_DIR'
+
+
+def is_profiling_enabled() -> bool:
+    """環境変数でプロファイルが有効になっているか"""
+    return os.getenv(PROFILE_ENV, '').lower() in ('1', 'true', 'yes', 'on')
+
+
+class RerunProfiler:
+    """1回の再実行の描画フェーズとリポジトリ呼び出しを計測する
+
+    フェーズは start_phase() で区切る（次のフェーズの開始、または finish() で前のフェーズが終わる）。
+    無効の場合、全てのメソッドは何もしない。
+    """
+
+    def __init__(self, request_stats: Optional[RequestStats] = None, enabled: Optional[bool] = None,
+                 dump_dir: Optional[str] = None):
+        """
+        プロファイラの初期化
+
+        Args:
+            request_stats: 同じ再実行のリポジトリ呼び出しの記録（時間軸の起点も共有する）
+            enabled: 有効にするか（Noneの場合は環境変数 TODO_PROFILE）
+            dump_dir: cProfile の結果を保存するディレクトリ（Noneの場合は環境変数 TODO_PROFILE_DUMP_DIR）
+        """
+        self.enabled = is_profiling_enabled() if enabled is None else enabled
+        self.request_stats = request_stats
+        self.dump_dir = dump_dir if dump_dir is not None else os.getenv(PROFILE_DUMP_DIR_ENV) or None
+        self.started = request_stats.started if request_stats is not None else time.perf_counter()
+        self.phases: List[Dict[str, Any]] = []
+        self.total_ms = 0.0
+        self.dump_path: Optional[str] = None
+        self._current: Optional[Dict[str, Any]] = None
+        self._cprofile: Optional[cProfile.Profile] = None
+
+    def _now_ms(self) -> float:
+        """時間軸の起点からの経過ミリ秒"""
+        return (time.perf_counter() - self.started) * 1000
+
+    def start(self) -> None:
+        """計測を開始（cProfile の保存先があれば cProfile も開始）"""
+        if not self.enabled:
+            return
+        if self.dump_dir:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def start_phase(self, name: str) -> None:
+        """前のフェーズを終えて、新しいフェーズを開始"""
+        if not self.enabled:
+            return
+        self._end_phase()
+        self._current = {'name': name, 'offset_ms': self._now_ms()}
+
+    def _end_phase(self) -> None:
+        """実行中のフェーズを終える"""
+        if self._current is None:
+            return
+        self._current['ms'] = self._now_ms() - self._current['offset_ms']
+        self.phases.append(self._current)
+        self._current = None
+
+    def finish(self) -> None:
+        """計測を終了（st.rerun() などで途中終了した場合も呼び出す）"""
+        if not self.enabled:
+            return
+        self._end_phase()
+        self.total_ms = self._now_ms()
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self.dump_path = self._dump_stats()
+
+    def _dump_stats(self) -> Optional[str]:
+        """cProfile の結果を保存し、そのパスを返す"""
+        try:
+            os.makedirs(self.dump_dir, exist_ok=True)
+            path = os.path.join(self.dump_dir, f"rerun-{datetime.now():%Y%m%d-%H%M%S-%f}.prof")
+            self._cprofile.dump_stats(path)
+            return path
+        except Exception as e:
+            print(f"プロファイル保存エラー: {e}")
+            return None
+
+    def top_functions(self, limit: int = 20) -> str:
+        """cProfile の結果のうち累積時間の長い関数（cProfile を使っていない場合は空文字）"""
+        if self._cprofile is None:
+            return ""
+        output = io.StringIO()
+        pstats.Stats(self._cprofile, stream=output).sort_stats('cumulative').print_stats(limit)
+        return output.getvalue()
+
+    def timeline(self) -> List[Dict[str, Any]]:
+        """フェーズとリポジトリ呼び出しを開始順に並べたウォーターフォール用の行"""
+        rows = [
+            {'kind': 'phase', 'name': phase['name'], 'start_ms': round(phase['offset_ms'], 3),
+             'end_ms': round(phase['offset_ms'] + phase['ms'], 3), 'ms': round(phase['ms'], 3)}
+            for phase in self.phases
+        ]
+        if self.request_stats is not None:
+            rows.extend(
+                {'kind': 'repository', 'name': call['method'], 'start_ms': call['offset_ms'],
+                 'end_ms': round(call['offset_ms'] + call['ms'], 3), 'ms': call['ms']}
+                for call in self.request_stats.calls
+            )
+        # 同時刻に始まる場合はフェーズを先に並べる
+        rows.sort(key=lambda row: (row['start_ms'], row['kind'] != 'phase'))
+        return rows
@@ -1,10 +1,175 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Iterable, Iterator, Optional, Set, Tuple
+from contextlib import contextmanager
+import functools
 import os
+import threading
+import time
 import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg2.extensions
+from psycopg2.extras import RealDictCursor, execute_values
 import json
 from datetime import datetime
+import base64
+import bisect
+import uuid
+from pool import ConnectionPool
+from locks import AtomicCounter, ReadWriteLock
+from migrations import apply_migrations, apply_state_count_triggers, ensure_schema
+
+
+def encode_page_cursor(created_at: Any, todo_id: int) -> str:
+    """ページングカーソル (created_at, id) を不透明な文字列に変換"""
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    raw = f"{created_at}|{todo_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_page_cursor(cursor: str) -> Tuple[str, int]:
+    """ページングカーソルを (created_at, id) に変換"""
+    try:
+        created_at, todo_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').rsplit('|', 1)
+        return created_at, int(todo_id)
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"不正なページングカーソルです: {cursor}") from e
+
+
+# DATABASE_TYPE に指定できる値（Streamlitアプリと FastAPI で共通）
+DATABASE_TYPES = ('MEMORY', 'SQLITE', 'NEON')
+
+
+def get_database_type() -> str:
+    """環境変数 DATABASE_TYPE を取得（未指定なら MEMORY、未対応の値ならエラー）"""
+    database_type = os.getenv('DATABASE_TYPE', 'MEMORY').upper()
+    if database_type not in DATABASE_TYPES:
+        raise ValueError(
+            f"未対応のDATABASE_TYPEです: {database_type}（{' / '.join(DATABASE_TYPES)} のいずれかを指定してください）"
+        )
+    return database_type
+
+
+def get_neon_connection_string() -> str:
+    """環境変数からNeonデータベースの接続文字列を取得"""
+    # 環境変数から接続情報を取得
+    database_url = os.getenv('NEON_DATABASE_URL')
+    if database_url:
+        return database_url
+    
+    # 個別の環境変数から構築
+    host = os.getenv('NEON_DATABASE_HOST', 'localhost')
+    port = os.getenv('NEON_DATABASE_PORT', '5432')
+    database = os.getenv('NEON_DATABASE_NAME', 'todo_app')
+    user = os.getenv('NEON_DATABASE_USER', 'postgres')
+    password = os.getenv('NEON_DATABASE_PASSWORD', '')
+    
+    return f"postgresql://{user}:{password}@{host}:{port}/{database}"
+
+
+def batched(items: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+    """イテラブルを batch_size 件ずつのリストに分割"""
+    if batch_size < 1:
+        raise ValueError("batch_size must be >= 1")
+    batch: List[Any] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# SQLの実行を通知するリスナー（SQL, 所要秒数, 失敗したか）
+QueryListener = Callable[[Any, float, bool], None]
+
+
+@functools.lru_cache(maxsize=None)
+def _timed_cursor_class(base: type) -> type:
+    """
+    DBとの往復の所要時間を接続のリスナーへ通知するカーソルクラスを作成
+
+    execute に加えて、名前付き（サーバーサイド）カーソルの fetch* と反復も FETCH の往復として通知する
+    （名前の無いカーソルの fetch* はクライアント側で結果を返すだけなので通知しない）。
+    """
+    class TimedCursor(base):
+        def _timed(self, query, call, *args):
+            started = time.perf_counter()
+            error = False
+            try:
+                return call(*args)
+            except Exception:
+                error = True
+                raise
+            finally:
+                for listener in self.connection.query_listeners:
+                    listener(query, time.perf_counter() - started, error)
+
+        def _fetch_query(self, count):
+            return f"FETCH FORWARD {count} FROM {self.name}"
+
+        def execute(self, query, vars=None):
+            return self._timed(query, super().execute, query, vars)
+
+        def fetchone(self):
+            if not getattr(self, 'name', None):
+                return super().fetchone()
+            return self._timed(self._fetch_query(1), super().fetchone)
+
+        def fetchmany(self, size=None):
+            size = self.arraysize if size is None else size
+            if not getattr(self, 'name', None):
+                return super().fetchmany(size)
+            return self._timed(self._fetch_query(size), super().fetchmany, size)
+
+        def fetchall(self):
+            if not getattr(self, 'name', None):
+                return super().fetchall()
+            return self._timed(f"FETCH FORWARD ALL FROM {self.name}", super().fetchall)
+
+        def __iter__(self):
+            if not getattr(self, 'name', None):
+                return super().__iter__()
+            return self._iter_batches()
+
+        def _iter_batches(self):
+            # 名前付きカーソルの反復と同じく itersize 件ずつ取得し、1回の取得を1往復として通知する
+            while True:
+                rows = self.fetchmany(self.itersize)
+                if not rows:
+                    return
+                yield from rows
+
+    TimedCursor.__name__ = f"Timed{base.__name__}"
+    return TimedCursor
+
+
+class QueryTimingConnection(psycopg2.extensions.connection):
+    """実行したSQLと所要時間を query_listeners へ通知する接続"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.query_listeners: List[QueryListener] = []
+
+    def cursor(self, *args, **kwargs):
+        """指定されたカーソルクラスを計測付きにして作成"""
+        base = kwargs.pop('cursor_factory', None) or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs['cursor_factory'] = _timed_cursor_class(base)
+        return super().cursor(*args, **kwargs)
+
+
+def split_search_terms(query: str) -> List[str]:
+    """検索文字列を空白で区切った語のリストに変換（重複は除く）"""
+    return list(dict.fromkeys(query.split()))
+
+
+def escape_like(term: str) -> str:
+    """LIKE/ILIKE のパターン内で特別な意味を持つ文字をエスケープ"""
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class UnitOfWorkError(Exception):
+    """作業単位の中の操作が失敗し、作業単位全体をロールバックした場合の例外"""
 
 
 class TodoRepository(ABC):
@@ -20,17 +185,84 @@ class TodoRepository(ABC):
         """新しいカテゴリを追加"""
         pass
     
+    @abstractmethod
+    def bulk_add_todos(self, todos: Iterable[Dict[str, Any]], batch_size: int = 1000) -> List[int]:
+        """
+        Todoを一括追加（batch_size件ごとにコミット）
+
+        Args:
+            todos: {'title': str, 'category_ids': Optional[List[int]]} のイテラブル（空タイトルはスキップ）
+            batch_size: 1回のコミットで追加する件数
+
+        Returns:
+            List[int]: 追加したTodoのID（入力順）
+        """
+        pass
+    
+    @abstractmethod
+    def bulk_add_categories(self, titles: Iterable[str], batch_size: int = 1000) -> List[int]:
+        """カテゴリを一括追加し、追加したカテゴリのIDを入力順に返す（空タイトルはスキップ）"""
+        pass
+    
     @abstractmethod
     def get_todo_categories(self, todo_id: int) -> List[Dict[str, Any]]:
         """指定されたTodoのカテゴリを取得"""
         pass
     
+    @abstractmethod
+    def get_categories_for_todos(self, todo_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        """複数TodoのカテゴリをTodoIDごとにまとめて取得"""
+        pass
+    
     @abstractmethod
     def get_filtered_todos(self, filter_state: str = "all", 
                           filter_category: Optional[int] = None) -> List[Dict[str, Any]]:
         """フィルター条件に基づいてTodoを取得"""
         pass
     
+    @abstractmethod
+    def get_filtered_todos_with_categories(self, filter_state: str = "all",
+                                           filter_category: Optional[int] = None) -> List[Dict[str, Any]]:
+        """フィルター条件に基づいてTodoを取得し、各Todoに 'categories' を付与"""
+        pass
+    
+    @abstractmethod
+    def get_todos_page(self, filter_state: str = "all", filter_category: Optional[int] = None,
+                       limit: int = 50, cursor: Optional[str] = None,
+                       with_categories: bool = False) -> Dict[str, Any]:
+        """
+        (created_at, id) の降順でTodoを1ページ分取得
+
+        Returns:
+            Dict[str, Any]: 'items'（Todoのリスト）と 'next_cursor'（次ページが無ければNone）
+        """
+        pass
+    
+    @abstractmethod
+    def iter_todos(self, filter_state: str = "all", filter_category: Optional[int] = None,
+                   batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        (created_at, id) の降順でTodoを少しずつ読み込みながら返すジェネレータ
+        
+        途中で読み込みに失敗した場合は例外を送出する（打ち切られたストリームを完了と区別できるように）。
+        """
+        pass
+    
+    @abstractmethod
+    def search_todos(self, query: str, filter_state: str = "all", filter_category: Optional[int] = None,
+                     limit: int = 50, with_categories: bool = False) -> List[Dict[str, Any]]:
+        """
+        タイトルに検索語を含むTodoを (created_at, id) の降順で取得
+        
+        Args:
+            query: 検索文字列（空白区切りの語を全て含むTodoが対象、大文字小文字は区別しない）
+            filter_state: 状態フィルター
+            filter_category: カテゴリフィルター
+            limit: 取得する最大件数
+            with_categories: 各Todoに 'categories' を付与するか
+        """
+        pass
+    
     @abstractmethod
     def update_todo_state(self, todo_id: int, new_state: str) -> bool:
         """Todoの状態を更新"""
@@ -41,11 +273,57 @@ class TodoRepository(ABC):
         """Todoを削除"""
         pass
     
+    @abstractmethod
+    def bulk_update_state(self, todo_ids: Iterable[int], new_state: str) -> int:
+        """
+        複数Todoの状態を1回の操作で更新
+        
+        Returns:
+            状態が変わったTodoの件数（存在しないIDや既に new_state のTodoは数えない）
+        """
+        pass
+    
+    @abstractmethod
+    def bulk_delete(self, todo_ids: Iterable[int]) -> int:
+        """
+        複数Todoを1回の操作で削除
+        
+        Returns:
+            削除したTodoの件数
+        """
+        pass
+    
+    @abstractmethod
+    def update_state_where(self, new_state: str, filter_state: str = "all",
+                           filter_category: Optional[int] = None) -> int:
+        """
+        フィルター条件に合う全てのTodoの状態を1回の操作で更新（例: カテゴリXを全て完了にする）
+        
+        Returns:
+            状態が変わったTodoの件数
+        """
+        pass
+    
+    @abstractmethod
+    def delete_where(self, filter_state: str = "all", filter_category: Optional[int] = None) -> int:
+        """
+        フィルター条件に合う全てのTodoを1回の操作で削除（例: カテゴリXの完了済みを削除）
+        
+        Returns:
+            削除したTodoの件数
+        """
+        pass
+    
     @abstractmethod
     def get_statistics(self) -> Dict[str, int]:
         """統計情報を取得"""
         pass
     
+    @abstractmethod
+    def get_category_statistics(self) -> List[Dict[str, Any]]:
+        """カテゴリ別の統計情報（id, title, total, todo, done）を取得"""
+        pass
+    
     @abstractmethod
     def get_all_todos(self) -> List[Dict[str, Any]]:
         """全てのTodoを取得"""
@@ -56,127 +334,534 @@ class TodoRepository(ABC):
         """全てのカテゴリを取得"""
         pass
 
+    def initialize_schema(self) -> List[int]:
+        """スキーマを初期化し、適用した移行のバージョンを返す（スキーマを持たない実装では何もしない）"""
+        return []
+    
+    @contextmanager
+    def unit_of_work(self) -> Iterator[None]:
+        """ブロック内の操作をまとめて確定する作業単位（対応しない実装では各操作が個別に確定する）"""
+        yield
+
 
 class MemoryTodoRepository(TodoRepository):
-    """メモリ内データを使用するTodoリポジトリ"""
+    """メモリ内データを使用するTodoリポジトリ
+
+    データはIDをキーにした辞書で保持し、状態別インデックスと
+    Todo⇔カテゴリの双方向隣接マップを併せて管理する。
+    これにより参照・状態変更・削除は O(1) または O(関連カテゴリ数) で完了する。
+
+    複数セッション（スレッド）から共有されるため、参照は読み込みロック、
+    更新は書き込みロックの中で行い、各操作は一貫した状態を参照する。
+    Todoの辞書は更新時に置き換える（その場で書き換えない）ため、
+    返した値が後から別スレッドの更新で変わることはない。
+    """
     
     def __init__(self):
         """メモリリポジトリの初期化"""
-        self.todos: List[Dict[str, Any]] = []
-        self.categories: List[Dict[str, Any]] = []
-        self.todo_categories: List[Dict[str, int]] = []
-        self.next_todo_id: int = 1
-        self.next_category_id: int = 1
+        self._todos: Dict[int, Dict[str, Any]] = {}
+        self._categories: Dict[int, Dict[str, Any]] = {}
+        # 状態 -> TodoIDの集合
+        self._state_index: Dict[str, Set[int]] = {}
+        # TodoID -> カテゴリID（挿入順を保持するため辞書をセットとして使用）
+        self._todo_to_categories: Dict[int, Dict[int, None]] = {}
+        # カテゴリID -> TodoID
+        self._category_to_todos: Dict[int, Dict[int, None]] = {}
+        # カテゴリID -> 完了済みTodo数（カテゴリ別統計用）
+        self._category_done_counts: Dict[int, int] = {}
+        # (created_at, id) の昇順に並べたキー（ページング用）
+        self._order: List[Tuple[str, int]] = []
+        # 検索用の転置インデックス（タイトルの文字・文字bigram -> TodoID）
+        self._search_index: Dict[str, Set[int]] = {}
+        self._todo_ids = AtomicCounter()
+        self._category_ids = AtomicCounter()
+        self._lock = ReadWriteLock()
+        # 作業単位の実行中か（書き込みロックを保持したスレッドだけが参照する）
+        self._in_unit_of_work = False
+    
+    @property
+    def next_todo_id(self) -> int:
+        """次に採番されるTodoID"""
+        return self._todo_ids.value
+    
+    @property
+    def next_category_id(self) -> int:
+        """次に採番されるカテゴリID"""
+        return self._category_ids.value
+    
+    @property
+    def todos(self) -> List[Dict[str, Any]]:
+        """全Todoのリスト（ID順）"""
+        with self._lock.read():
+            return list(self._todos.values())
+    
+    @property
+    def categories(self) -> List[Dict[str, Any]]:
+        """全カテゴリのリスト（ID順）"""
+        with self._lock.read():
+            return list(self._categories.values())
+    
+    @property
+    def todo_categories(self) -> List[Dict[str, int]]:
+        """Todoとカテゴリの関連付けのリスト"""
+        with self._lock.read():
+            return [
+                {'todo_id': todo_id, 'category_id': category_id}
+                for todo_id, category_ids in self._todo_to_categories.items()
+                for category_id in category_ids
+            ]
+    
+    def _index_state(self, todo_id: int, state: str) -> None:
+        """状態インデックスにTodoを登録"""
+        self._state_index.setdefault(state, set()).add(todo_id)
+    
+    def _unindex_state(self, todo_id: int, state: str) -> None:
+        """状態インデックスからTodoを除外"""
+        todo_ids = self._state_index.get(state)
+        if todo_ids is not None:
+            todo_ids.discard(todo_id)
+            if not todo_ids:
+                del self._state_index[state]
+    
+    @staticmethod
+    def _search_tokens(text: str) -> Set[str]:
+        """転置インデックスのトークン（小文字化した1文字と連続する2文字）"""
+        text = text.lower()
+        return set(text) | {text[i:i + 2] for i in range(len(text) - 1)}
+    
+    def _index_title(self, todo_id: int, title: str) -> None:
+        """タイトルを転置インデックスに登録"""
+        for token in self._search_tokens(title):
+            self._search_index.setdefault(token, set()).add(todo_id)
+    
+    def _unindex_title(self, todo_id: int, title: str) -> None:
+        """タイトルを転置インデックスから除外"""
+        for token in self._search_tokens(title):
+            todo_ids = self._search_index.get(token)
+            if todo_ids is not None:
+                todo_ids.discard(todo_id)
+                if not todo_ids:
+                    del self._search_index[token]
+    
+    @contextmanager
+    def unit_of_work(self) -> Iterator[None]:
+        """
+        ブロック内の操作を1つの作業単位として実行（例外時は開始時点の状態に戻す）
+        
+        ブロックの間は書き込みロックを保持するため、他スレッドの読み書きは待たされる。
+        入れ子で呼び出した場合は外側の作業単位に合流する。採番済みのIDは戻さない。
+        """
+        with self._lock.write():
+            if self._in_unit_of_work:
+                yield
+                return
+            snapshot = self._snapshot()
+            self._in_unit_of_work = True
+            try:
+                yield
+            except BaseException:
+                self._restore(snapshot)
+                raise
+            finally:
+                self._in_unit_of_work = False
+    
+    def _snapshot(self) -> Tuple[Dict[int, Dict[str, Any]], Dict[int, Dict[str, Any]], Dict[int, Dict[int, None]]]:
+        """Todo・カテゴリ・関連付けの複製（辞書は更新時に置き換えるため要素の複製は不要）"""
+        return (
+            dict(self._todos),
+            dict(self._categories),
+            {todo_id: dict(category_ids) for todo_id, category_ids in self._todo_to_categories.items()},
+        )
+    
+    def _restore(self, snapshot: Tuple[Dict[int, Dict[str, Any]], Dict[int, Dict[str, Any]],
+                                       Dict[int, Dict[int, None]]]) -> None:
+        """複製から状態を戻し、インデックスを作り直す（書き込みロック保持中に呼び出す）"""
+        self._todos, self._categories, self._todo_to_categories = snapshot
+        self._state_index = {}
+        self._category_to_todos = {}
+        self._category_done_counts = {}
+        self._search_index = {}
+        for todo_id, todo in self._todos.items():
+            self._index_state(todo_id, todo['state'])
+            self._index_title(todo_id, todo['title'])
+            for category_id in self._todo_to_categories.get(todo_id, {}):
+                self._category_to_todos.setdefault(category_id, {})[todo_id] = None
+                if todo['state'] == 'done':
+                    self._category_done_counts[category_id] = self._category_done_counts.get(category_id, 0) + 1
+        self._order = sorted((todo['created_at'], todo_id) for todo_id, todo in self._todos.items())
     
     def add_todo(self, title: str, category_ids: Optional[List[int]] = None) -> bool:
         """新しいTodoを追加"""
         if not title.strip():
             return False
-            
+        
+        with self._lock.write():
+            self._insert_todo(title, category_ids)
+        return True
+    
+    def _insert_todo(self, title: str, category_ids: Optional[List[int]] = None) -> int:
+        """Todoを登録してインデックスを更新し、採番したIDを返す"""
+        todo_id = self._todo_ids.next()
         new_todo = {
-            'id': self.next_todo_id,
+            'id': todo_id,
             'title': title.strip(),
             'state': 'todo',
             'created_at': datetime.now().isoformat()
         }
-        self.todos.append(new_todo)
+        self._todos[todo_id] = new_todo
+        self._index_state(todo_id, new_todo['state'])
+        self._index_title(todo_id, new_todo['title'])
+        bisect.insort(self._order, (new_todo['created_at'], todo_id))
         
+        linked = self._todo_to_categories.setdefault(todo_id, {})
         if category_ids:
             for category_id in category_ids:
-                self.todo_categories.append({
-                    'todo_id': self.next_todo_id,
-                    'category_id': category_id
-                })
-        
-        self.next_todo_id += 1
-        return True
+                linked[category_id] = None
+                self._category_to_todos.setdefault(category_id, {})[todo_id] = None
+        return todo_id
     
     def add_category(self, title: str) -> bool:
         """新しいカテゴリを追加"""
         if not title.strip():
             return False
-            
+        
+        with self._lock.write():
+            self._insert_category(title)
+        return True
+    
+    def _insert_category(self, title: str) -> int:
+        """カテゴリを登録し、採番したIDを返す"""
+        category_id = self._category_ids.next()
         new_category = {
-            'id': self.next_category_id,
+            'id': category_id,
             'title': title.strip(),
             'created_at': datetime.now().isoformat()
         }
-        self.categories.append(new_category)
-        self.next_category_id += 1
-        return True
+        self._categories[category_id] = new_category
+        return category_id
+    
+    def bulk_add_todos(self, todos: Iterable[Dict[str, Any]], batch_size: int = 1000) -> List[int]:
+        """Todoを一括追加（メモリ内のためバッチ単位の区切りは不要）"""
+        # 入力の読み込みは書き込みロックの外で済ませる
+        todos = [todo for todo in todos if todo['title'].strip()]
+        with self._lock.write():
+            return [self._insert_todo(todo['title'], todo.get('category_ids')) for todo in todos]
+    
+    def bulk_add_categories(self, titles: Iterable[str], batch_size: int = 1000) -> List[int]:
+        """カテゴリを一括追加"""
+        titles = [title for title in titles if title.strip()]
+        with self._lock.write():
+            return [self._insert_category(title) for title in titles]
     
     def get_todo_categories(self, todo_id: int) -> List[Dict[str, Any]]:
         """指定されたTodoのカテゴリを取得"""
-        todo_category_ids = [
-            tc['category_id'] for tc in self.todo_categories 
-            if tc['todo_id'] == todo_id
-        ]
+        with self._lock.read():
+            return self._categories_of(todo_id)
+    
+    def _categories_of(self, todo_id: int) -> List[Dict[str, Any]]:
+        """Todoのカテゴリを取得（ロック保持中に呼び出す）"""
+        category_ids = self._todo_to_categories.get(todo_id, {})
         return [
-            cat for cat in self.categories 
-            if cat['id'] in todo_category_ids
+            self._categories[category_id] for category_id in sorted(category_ids)
+            if category_id in self._categories
         ]
     
-    def get_filtered_todos(self, filter_state: str = "all", 
-                          filter_category: Optional[int] = None) -> List[Dict[str, Any]]:
-        """フィルター条件に基づいてTodoを取得"""
-        todos = self.todos.copy()
+    def get_categories_for_todos(self, todo_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        """複数TodoのカテゴリをTodoIDごとにまとめて取得"""
+        with self._lock.read():
+            return {todo_id: self._categories_of(todo_id) for todo_id in todo_ids}
+    
+    def _candidate_ids(self, filter_state: str = "all",
+                       filter_category: Optional[int] = None) -> Optional[Set[int]]:
+        """フィルター条件に合うTodoIDの集合（条件が無い場合はNone）"""
+        if filter_state == "all" and filter_category is None:
+            return None
         
-        # 状態でフィルター
+        # 候補の小さいインデックスから走査し、もう一方の条件で絞り込む
+        candidates: Optional[Set[int]] = None
         if filter_state != "all":
-            todos = [todo for todo in todos if todo['state'] == filter_state]
-        
-        # カテゴリでフィルター
+            candidates = self._state_index.get(filter_state, set())
         if filter_category is not None:
-            category_todo_ids = [
-                tc['todo_id'] for tc in self.todo_categories 
-                if tc['category_id'] == filter_category
+            category_todo_ids = self._category_to_todos.get(filter_category, {})
+            if candidates is None:
+                candidates = set(category_todo_ids)
+            elif len(category_todo_ids) < len(candidates):
+                candidates = {
+                    todo_id for todo_id in category_todo_ids
+                    if todo_id in candidates
+                }
+            else:
+                candidates = {
+                    todo_id for todo_id in candidates
+                    if todo_id in category_todo_ids
+                }
+        return candidates
+    
+    def get_filtered_todos(self, filter_state: str = "all", 
+                          filter_category: Optional[int] = None) -> List[Dict[str, Any]]:
+        """フィルター条件に基づいてTodoを取得"""
+        with self._lock.read():
+            return self._filtered_todos(filter_state, filter_category)
+    
+    def _filtered_todos(self, filter_state: str = "all",
+                        filter_category: Optional[int] = None) -> List[Dict[str, Any]]:
+        """フィルター条件に合うTodoをID順に取得（ロック保持中に呼び出す）"""
+        candidates = self._candidate_ids(filter_state, filter_category)
+        if candidates is None:
+            return list(self._todos.values())
+        return [self._todos[todo_id] for todo_id in sorted(candidates)]
+    
+    def get_filtered_todos_with_categories(self, filter_state: str = "all",
+                                           filter_category: Optional[int] = None) -> List[Dict[str, Any]]:
+        """フィルター条件に基づいてTodoを取得し、各Todoに 'categories' を付与"""
+        with self._lock.read():
+            return [
+                {**todo, 'categories': self._categories_of(todo['id'])}
+                for todo in self._filtered_todos(filter_state, filter_category)
             ]
-            todos = [todo for todo in todos if todo['id'] in category_todo_ids]
+    
+    def get_todos_page(self, filter_state: str = "all", filter_category: Optional[int] = None,
+                       limit: int = 50, cursor: Optional[str] = None,
+                       with_categories: bool = False) -> Dict[str, Any]:
+        """(created_at, id) の降順でTodoを1ページ分取得"""
+        key = decode_page_cursor(cursor) if cursor is not None else None
+        with self._lock.read():
+            candidates = self._candidate_ids(filter_state, filter_category)
+            
+            items: List[Dict[str, Any]] = []
+            has_more = False
+            if candidates is not None and len(candidates) * 4 < len(self._order):
+                # 絞り込み結果が少ない場合は該当Todoだけを並べ替えてから切り出す
+                keys = sorted((self._todos[todo_id]['created_at'], todo_id) for todo_id in candidates)
+                end = bisect.bisect_left(keys, key) if key is not None else len(keys)
+                start = max(end - limit, 0)
+                items = [self._todos[todo_id] for _, todo_id in reversed(keys[start:end])]
+                has_more = start > 0
+            else:
+                # 全体の並び順インデックスをカーソル位置から後ろへ走査する
+                position = bisect.bisect_left(self._order, key) if key is not None else len(self._order)
+                while position > 0:
+                    position -= 1
+                    todo_id = self._order[position][1]
+                    if candidates is not None and todo_id not in candidates:
+                        continue
+                    if len(items) == limit:
+                        has_more = True
+                        break
+                    items.append(self._todos[todo_id])
+            
+            if with_categories:
+                items = [{**todo, 'categories': self._categories_of(todo['id'])} for todo in items]
+            next_cursor = None
+            if has_more and items:
+                next_cursor = encode_page_cursor(items[-1]['created_at'], items[-1]['id'])
+            return {'items': items, 'next_cursor': next_cursor}
+    
+    def iter_todos(self, filter_state: str = "all", filter_category: Optional[int] = None,
+                   batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """(created_at, id) の降順でTodoを少しずつ読み込みながら返すジェネレータ"""
+        cursor = None
+        while True:
+            page = self.get_todos_page(filter_state, filter_category, batch_size, cursor)
+            yield from page['items']
+            cursor = page['next_cursor']
+            if cursor is None:
+                return
+    
+    def search_todos(self, query: str, filter_state: str = "all", filter_category: Optional[int] = None,
+                     limit: int = 50, with_categories: bool = False) -> List[Dict[str, Any]]:
+        """タイトルに検索語を含むTodoを (created_at, id) の降順で取得（転置インデックスで候補を絞り込む）"""
+        terms = [term.lower() for term in split_search_terms(query)]
+        if not terms:
+            return []
         
-        return todos
+        with self._lock.read():
+            # 各語のトークンの出現集合を小さい順に積集合し、候補を絞り込む
+            postings = []
+            for term in terms:
+                tokens = {term[i:i + 2] for i in range(len(term) - 1)} or {term}
+                postings.extend(self._search_index.get(token, set()) for token in tokens)
+            postings.sort(key=len)
+            matched = set(postings[0]).intersection(*postings[1:])
+            
+            filtered = self._candidate_ids(filter_state, filter_category)
+            if filtered is not None:
+                matched &= filtered
+            
+            # bigramが全て含まれていても連続しているとは限らないため、部分一致で確認する
+            todos = [
+                self._todos[todo_id] for todo_id in matched
+                if all(term in self._todos[todo_id]['title'].lower() for term in terms)
+            ]
+            todos.sort(key=lambda todo: (todo['created_at'], todo['id']), reverse=True)
+            todos = todos[:limit]
+            if with_categories:
+                todos = [{**todo, 'categories': self._categories_of(todo['id'])} for todo in todos]
+            return todos
     
     def update_todo_state(self, todo_id: int, new_state: str) -> bool:
         """Todoの状態を更新"""
-        for todo in self.todos:
-            if todo['id'] == todo_id:
-                todo['state'] = new_state
-                todo['updated_at'] = datetime.now().isoformat()
-                return True
-        return False
+        with self._lock.write():
+            todo = self._todos.get(todo_id)
+            if todo is None:
+                return False
+            
+            self._set_state(todo, new_state, datetime.now().isoformat())
+            return True
+    
+    def _set_state(self, todo: Dict[str, Any], new_state: str, updated_at: str) -> None:
+        """Todoの状態とインデックスを更新（書き込みロック保持中に呼び出す）"""
+        todo_id = todo['id']
+        self._unindex_state(todo_id, todo['state'])
+        was_done = todo['state'] == 'done'
+        # 返却済みの辞書を書き換えないよう、新しい辞書に置き換える
+        self._todos[todo_id] = {**todo, 'state': new_state, 'updated_at': updated_at}
+        self._index_state(todo_id, new_state)
+        if was_done != (new_state == 'done'):
+            self._adjust_category_done_counts(todo_id, 1 if new_state == 'done' else -1)
+    
+    def bulk_update_state(self, todo_ids: Iterable[int], new_state: str) -> int:
+        """複数Todoの状態を更新（IDを1回走査し、状態が変わるTodoだけを書き換える）"""
+        todo_ids = list(todo_ids)
+        with self._lock.write():
+            return self._update_states(todo_ids, new_state)
+    
+    def _update_states(self, todo_ids: Iterable[int], new_state: str) -> int:
+        """指定IDのうち状態が異なるTodoを new_state に更新（書き込みロック保持中に呼び出す）"""
+        updated_at = datetime.now().isoformat()
+        updated = 0
+        for todo_id in todo_ids:
+            todo = self._todos.get(todo_id)
+            if todo is None or todo['state'] == new_state:
+                continue
+            self._set_state(todo, new_state, updated_at)
+            updated += 1
+        return updated
+    
+    def update_state_where(self, new_state: str, filter_state: str = "all",
+                           filter_category: Optional[int] = None) -> int:
+        """フィルター条件に合う全てのTodoの状態を更新"""
+        with self._lock.write():
+            candidates = self._candidate_ids(filter_state, filter_category)
+            # 更新中にインデックスが変わるため、対象IDを先に確定する
+            todo_ids = list(self._todos if candidates is None else candidates)
+            return self._update_states(todo_ids, new_state)
+    
+    def _adjust_category_done_counts(self, todo_id: int, delta: int) -> None:
+        """Todoが属するカテゴリの完了済み件数を増減"""
+        for category_id in self._todo_to_categories.get(todo_id, {}):
+            count = self._category_done_counts.get(category_id, 0) + delta
+            if count:
+                self._category_done_counts[category_id] = count
+            else:
+                self._category_done_counts.pop(category_id, None)
     
     def delete_todo(self, todo_id: int) -> bool:
         """Todoを削除"""
-        # Todoを削除
-        original_count = len(self.todos)
-        self.todos = [todo for todo in self.todos if todo['id'] != todo_id]
+        with self._lock.write():
+            todo = self._remove_todo(todo_id)
+            if todo is None:
+                return False
+            
+            key = (todo['created_at'], todo_id)
+            position = bisect.bisect_left(self._order, key)
+            if position < len(self._order) and self._order[position] == key:
+                del self._order[position]
+            return True
+    
+    def _remove_todo(self, todo_id: int) -> Optional[Dict[str, Any]]:
+        """Todoと、_order 以外のインデックス・関連付けを削除（書き込みロック保持中に呼び出す）"""
+        todo = self._todos.pop(todo_id, None)
+        if todo is None:
+            return None
         
-        # 関連するカテゴリの関連付けも削除
-        self.todo_categories = [
-            tc for tc in self.todo_categories 
-            if tc['todo_id'] != todo_id
-        ]
+        self._unindex_state(todo_id, todo['state'])
+        self._unindex_title(todo_id, todo['title'])
+        if todo['state'] == 'done':
+            self._adjust_category_done_counts(todo_id, -1)
         
-        return len(self.todos) < original_count
+        # 関連するカテゴリの関連付けも削除
+        for category_id in self._todo_to_categories.pop(todo_id, {}):
+            todo_ids = self._category_to_todos.get(category_id)
+            if todo_ids is not None:
+                todo_ids.pop(todo_id, None)
+                if not todo_ids:
+                    del self._category_to_todos[category_id]
+        return todo
+    
+    def bulk_delete(self, todo_ids: Iterable[int]) -> int:
+        """複数Todoを削除（ページング用の並びは最後に1回だけ作り直す）"""
+        todo_ids = list(todo_ids)
+        with self._lock.write():
+            return self._remove_todos(todo_ids)
+    
+    def _remove_todos(self, todo_ids: Iterable[int]) -> int:
+        """指定IDのTodoを削除（書き込みロック保持中に呼び出す）"""
+        positions = []
+        for todo_id in todo_ids:
+            todo = self._remove_todo(todo_id)
+            if todo is None:
+                continue
+            key = (todo['created_at'], todo_id)
+            position = bisect.bisect_left(self._order, key)
+            if position < len(self._order) and self._order[position] == key:
+                positions.append(position)
+        if positions:
+            # 削除位置の間の区間をつなげて、並びを1回で作り直す
+            order: List[Tuple[str, int]] = []
+            start = 0
+            for position in sorted(positions):
+                order.extend(self._order[start:position])
+                start = position + 1
+            order.extend(self._order[start:])
+            self._order = order
+        return len(positions)
+    
+    def delete_where(self, filter_state: str = "all", filter_category: Optional[int] = None) -> int:
+        """フィルター条件に合う全てのTodoを削除"""
+        with self._lock.write():
+            candidates = self._candidate_ids(filter_state, filter_category)
+            todo_ids = list(self._todos if candidates is None else candidates)
+            return self._remove_todos(todo_ids)
     
     def get_statistics(self) -> Dict[str, int]:
         """統計情報を取得"""
-        total_todos = len(self.todos)
-        done_todos = len([t for t in self.todos if t['state'] == 'done'])
-        todo_todos = total_todos - done_todos
-        
-        return {
-            'total': total_todos,
-            'todo': todo_todos,
-            'done': done_todos
-        }
+        with self._lock.read():
+            total_todos = len(self._todos)
+            done_todos = len(self._state_index.get('done', ()))
+            todo_todos = total_todos - done_todos
+            
+            return {
+                'total': total_todos,
+                'todo': todo_todos,
+                'done': done_todos
+            }
+    
+    def get_category_statistics(self) -> List[Dict[str, Any]]:
+        """カテゴリ別の統計情報を取得（件数は追加・更新・削除時に更新済み）"""
+        with self._lock.read():
+            statistics = []
+            for category_id, category in self._categories.items():
+                total = len(self._category_to_todos.get(category_id, ()))
+                done = self._category_done_counts.get(category_id, 0)
+                statistics.append({
+                    'id': category_id,
+                    'title': category['title'],
+                    'total': total,
+                    'todo': total - done,
+                    'done': done
+                })
+            return statistics
     
     def get_all_todos(self) -> List[Dict[str, Any]]:
         """全てのTodoを取得"""
-        return self.todos.copy()
+        with self._lock.read():
+            return list(self._todos.values())
     
     def get_all_categories(self) -> List[Dict[str, Any]]:
         """全てのカテゴリを取得"""
-        return self.categories.copy()
+        with self._lock.read():
+            return list(self._categories.values())
 
 
 class NeonTodoRepository(TodoRepository):
@@ -185,70 +870,133 @@ class NeonTodoRepository(TodoRepository):
     def __init__(self):
         """Neonリポジトリの初期化"""
         self.connection_string = self._get_connection_string()
-        # テーブル作成は初回アクセス時に実行
-        self._tables_created = False
+        # 接続はプール経由で再利用する（実際の接続は初回取得時に作成）
+        self.pool = ConnectionPool(self._get_connection, **self._get_pool_options())
+        # 統計の取得方法（aggregate: 集計クエリ / counter: トリガーで更新するカウンタ表）
+        self.stats_mode = os.getenv('NEON_STATS_MODE', 'aggregate').lower()
+        # プールの全ての接続で共有する、SQL実行のリスナー
+        self._query_listeners: List[QueryListener] = []
+        # スレッドごとの作業単位（固定した接続と、途中で失敗したか）
+        self._unit_of_work = threading.local()
     
     def _get_connection_string(self) -> str:
         """データベース接続文字列を取得"""
-        # 環境変数から接続情報を取得
-        database_url = os.getenv('NEON_DATABASE_URL')
-        if database_url:
-            return database_url
-        
-        # 個別の環境変数から構築
-        host = os.getenv('NEON_DATABASE_HOST', 'localhost')
-        port = os.getenv('NEON_DATABASE_PORT', '5432')
-        database = os.getenv('NEON_DATABASE_NAME', 'todo_app')
-        user = os.getenv('NEON_DATABASE_USER', 'postgres')
-        password = os.getenv('NEON_DATABASE_PASSWORD', '')
-        
-        return f"postgresql://{user}:{password}@{host}:{port}/{database}"
+        return get_neon_connection_string()
+    
+    @staticmethod
+    def _get_pool_options() -> Dict[str, Any]:
+        """環境変数から接続プールの設定を取得"""
+        return {
+            'min_size': int(os.getenv('NEON_POOL_MIN_SIZE', '1')),
+            'max_size': int(os.getenv('NEON_POOL_MAX_SIZE', '10')),
+            'max_idle_seconds': float(os.getenv('NEON_POOL_MAX_IDLE_SECONDS', '300')),
+            'timeout': float(os.getenv('NEON_POOL_TIMEOUT_SECONDS', '30')),
+            'health_check_interval': float(os.getenv('NEON_POOL_HEALTH_CHECK_INTERVAL_SECONDS', '30')),
+        }
     
     def _get_connection(self):
-        """データベース接続を取得"""
-        return psycopg2.connect(self.connection_string)
+        """新しいデータベース接続を作成（プールから呼び出される）"""
+        conn = psycopg2.connect(self.connection_string, connection_factory=QueryTimingConnection)
+        conn.query_listeners = self._query_listeners
+        return conn
     
-    def _ensure_tables_exist(self):
-        """テーブルが存在することを確認し、必要に応じて作成"""
-        if self._tables_created:
+    def add_query_listener(self, listener: QueryListener) -> None:
+        """
+        SQLを実行するたびに呼び出すリスナーを登録（作成済みの接続にも適用される）
+        
+        Args:
+            listener: (SQL, 所要秒数, 失敗したか) を受け取る関数
+        """
+        self._query_listeners.append(listener)
+    
+    @contextmanager
+    def _connection(self) -> Iterator[Any]:
+        """プールから接続を借りてトランザクションを実行
+
+        ブロックが正常終了すればコミット、例外時はロールバックされ、
+        接続はプールへ返却される。
+        作業単位の中では作業単位の接続をそのまま使い、コミットは作業単位の終了時に行う。
+        初回はスキーマ移行を適用する（2回目以降はDBにアクセスしない）。
+        """
+        pinned = getattr(self._unit_of_work, 'conn', None)
+        if pinned is not None:
+            try:
+                yield pinned
+            except Exception:
+                # トランザクションは中断状態になるため、作業単位の終了時にロールバックする
+                self._unit_of_work.failed = True
+                raise
             return
-            
-        try:
-            self._create_tables()
-            self._tables_created = True
-        except Exception as e:
-            print(f"テーブル作成エラー: {e}")
-            # テーブル作成に失敗しても続行（既に存在する可能性）
-            self._tables_created = True
-    
-    def _create_tables(self):
-        """テーブルを作成"""
-        create_tables_sql = """
-        CREATE TABLE IF NOT EXISTS categories (
-            id SERIAL PRIMARY KEY,
-            title VARCHAR(255) NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-        
-        CREATE TABLE IF NOT EXISTS todos (
-            id SERIAL PRIMARY KEY,
-            title VARCHAR(255) NOT NULL,
-            state VARCHAR(50) DEFAULT 'todo',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-        
-        CREATE TABLE IF NOT EXISTS todo_categories (
-            todo_id INTEGER REFERENCES todos(id) ON DELETE CASCADE,
-            category_id INTEGER REFERENCES categories(id) ON DELETE CASCADE,
-            PRIMARY KEY (todo_id, category_id)
-        );
+        
+        self.initialize_schema()
+        with self.pool.connection() as conn:
+            with conn as transaction_conn:
+                yield transaction_conn
+    
+    def _commit(self, conn: Any) -> None:
+        """コミット（作業単位の中では作業単位の終了時までコミットしない）"""
+        if getattr(self._unit_of_work, 'conn', None) is None:
+            conn.commit()
+    
+    @contextmanager
+    def unit_of_work(self) -> Iterator[None]:
         """
+        ブロック内の操作を1つの接続・1つのトランザクションで実行し、終了時にまとめてコミット
+        
+        接続はスレッドごとに固定される。ブロック内の操作が1つでも失敗した場合、
+        または例外が発生した場合は全体をロールバックする。入れ子の呼び出しは外側に合流する。
         
-        with self._get_connection() as conn:
-            with conn.cursor() as cursor:
-                cursor.execute(create_tables_sql)
+        Raises:
+            UnitOfWorkError: ブロック内の操作が失敗した場合
+        """
+        if getattr(self._unit_of_work, 'conn', None) is not None:
+            yield
+            return
+        
+        self.initialize_schema()
+        with self.pool.connection() as conn:
+            self._unit_of_work.conn = conn
+            self._unit_of_work.failed = False
+            try:
+                yield
+                if self._unit_of_work.failed:
+                    raise UnitOfWorkError("作業単位の中の操作が失敗したため、ロールバックしました")
                 conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                self._unit_of_work.conn = None
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """接続プールのメトリクスを取得"""
+        return self.pool.stats()
+    
+    def close(self) -> None:
+        """接続プールをクローズ"""
+        self.pool.close()
+    
+    def initialize_schema(self) -> List[int]:
+        """
+        未適用のスキーマ移行を適用（同じ接続先にはプロセス内で1回だけ実行）
+        
+        最初の操作の前にも自動で呼び出されるため、呼び出し忘れてもスキーマは作成される
+        （起動時に呼び出すと、移行の失敗を最初のリクエストより前に検出できる）。
+        
+        Returns:
+            今回適用した移行のバージョン一覧
+        
+        Raises:
+            Exception: 移行に失敗した場合
+        """
+        return ensure_schema(self.connection_string, self._apply_migrations)
+    
+    def _apply_migrations(self) -> List[int]:
+        """プールの接続で移行を適用し、統計の取得方法に合わせてカウンタのトリガーを設置・削除"""
+        with self.pool.connection() as conn:
+            versions = apply_migrations(conn)
+            apply_state_count_triggers(conn, self.stats_mode == 'counter')
+            return versions
     
     def add_todo(self, title: str, category_ids: Optional[List[int]] = None) -> bool:
         """新しいTodoを追加"""
@@ -256,8 +1004,7 @@ class NeonTodoRepository(TodoRepository):
             return False
         
         try:
-            self._ensure_tables_exist()
-            with self._get_connection() as conn:
+            with self._connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                     # Todoを追加
                     cursor.execute(
@@ -274,7 +1021,7 @@ class NeonTodoRepository(TodoRepository):
                                 (todo_id, category_id)
                             )
                     
-                    conn.commit()
+                    self._commit(conn)
                     return True
         except Exception as e:
             print(f"Todo追加エラー: {e}")
@@ -286,24 +1033,81 @@ class NeonTodoRepository(TodoRepository):
             return False
         
         try:
-            self._ensure_tables_exist()
-            with self._get_connection() as conn:
+            with self._connection() as conn:
                 with conn.cursor() as cursor:
                     cursor.execute(
                         "INSERT INTO categories (title) VALUES (%s)",
                         (title.strip(),)
                     )
-                    conn.commit()
+                    self._commit(conn)
                     return True
         except Exception as e:
             print(f"カテゴリ追加エラー: {e}")
             return False
     
+    def bulk_add_todos(self, todos: Iterable[Dict[str, Any]], batch_size: int = 1000) -> List[int]:
+        """
+        Todoを一括追加（execute_values で batch_size 件ずつINSERTしてコミット）
+
+        途中のバッチで失敗した場合は、それまでにコミットしたTodoのIDを返す。
+        """
+        todo_ids: List[int] = []
+        try:
+            for batch in batched((todo for todo in todos if todo['title'].strip()), batch_size):
+                with self._connection() as conn:
+                    with conn.cursor() as cursor:
+                        rows = execute_values(
+                            cursor,
+                            "INSERT INTO todos (title) VALUES %s RETURNING id",
+                            [(todo['title'].strip(),) for todo in batch],
+                            page_size=len(batch),
+                            fetch=True
+                        )
+                        batch_ids = [row[0] for row in rows]
+                        
+                        links = [
+                            (todo_id, category_id)
+                            for todo_id, todo in zip(batch_ids, batch)
+                            for category_id in (todo.get('category_ids') or [])
+                        ]
+                        if links:
+                            execute_values(
+                                cursor,
+                                "INSERT INTO todo_categories (todo_id, category_id) VALUES %s "
+                                "ON CONFLICT DO NOTHING",
+                                links,
+                                page_size=len(links)
+                            )
+                        self._commit(conn)
+                todo_ids.extend(batch_ids)
+        except Exception as e:
+            print(f"Todo一括追加エラー: {e}")
+        return todo_ids
+    
+    def bulk_add_categories(self, titles: Iterable[str], batch_size: int = 1000) -> List[int]:
+        """カテゴリを一括追加（execute_values で batch_size 件ずつINSERTしてコミット）"""
+        category_ids: List[int] = []
+        try:
+            for batch in batched((title.strip() for title in titles if title.strip()), batch_size):
+                with self._connection() as conn:
+                    with conn.cursor() as cursor:
+                        rows = execute_values(
+                            cursor,
+                            "INSERT INTO categories (title) VALUES %s RETURNING id",
+                            [(title,) for title in batch],
+                            page_size=len(batch),
+                            fetch=True
+                        )
+                        self._commit(conn)
+                category_ids.extend(row[0] for row in rows)
+        except Exception as e:
+            print(f"カテゴリ一括追加エラー: {e}")
+        return category_ids
+    
     def get_todo_categories(self, todo_id: int) -> List[Dict[str, Any]]:
         """指定されたTodoのカテゴリを取得"""
         try:
-            self._ensure_tables_exist()
-            with self._get_connection() as conn:
+            with self._connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                     cursor.execute("""
                         SELECT c.id, c.title, c.created_at
@@ -316,12 +1120,36 @@ class NeonTodoRepository(TodoRepository):
             print(f"カテゴリ取得エラー: {e}")
             return []
     
+    def get_categories_for_todos(self, todo_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        """複数TodoのカテゴリをTodoIDごとにまとめて取得（1クエリ）"""
+        result: Dict[int, List[Dict[str, Any]]] = {todo_id: [] for todo_id in todo_ids}
+        if not todo_ids:
+            return result
+        
+        try:
+            with self._connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    cursor.execute("""
+                        SELECT tc.todo_id, c.id, c.title, c.created_at
+                        FROM todo_categories tc
+                        JOIN categories c ON c.id = tc.category_id
+                        WHERE tc.todo_id = ANY(%s)
+                        ORDER BY tc.todo_id, c.id
+                    """, (list(todo_ids),))
+                    for row in cursor.fetchall():
+                        category = dict(row)
+                        todo_id = category.pop('todo_id')
+                        result.setdefault(todo_id, []).append(category)
+                    return result
+        except Exception as e:
+            print(f"カテゴリ一括取得エラー: {e}")
+            return result
+    
     def get_filtered_todos(self, filter_state: str = "all", 
                           filter_category: Optional[int] = None) -> List[Dict[str, Any]]:
         """フィルター条件に基づいてTodoを取得"""
         try:
-            self._ensure_tables_exist()
-            with self._get_connection() as conn:
+            with self._connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                     query = "SELECT id, title, state, created_at, updated_at FROM todos"
                     params = []
@@ -347,17 +1175,157 @@ class NeonTodoRepository(TodoRepository):
             print(f"Todo取得エラー: {e}")
             return []
     
+    @staticmethod
+    def _filter_conditions(filter_state: str = "all",
+                           filter_category: Optional[int] = None) -> Tuple[List[str], List[Any]]:
+        """状態・カテゴリのフィルターをエイリアス t のtodosに対するWHERE条件とパラメータにする"""
+        conditions: List[str] = []
+        params: List[Any] = []
+        if filter_state != "all":
+            conditions.append("t.state = %s")
+            params.append(filter_state)
+        
+        if filter_category is not None:
+            conditions.append(
+                "EXISTS (SELECT 1 FROM todo_categories f "
+                "WHERE f.todo_id = t.id AND f.category_id = %s)"
+            )
+            params.append(filter_category)
+        return conditions, params
+    
+    @staticmethod
+    def _build_todo_query(filter_state: str = "all", filter_category: Optional[int] = None,
+                          with_categories: bool = False,
+                          after: Optional[Tuple[str, int]] = None,
+                          limit: Optional[int] = None,
+                          search_terms: Optional[List[str]] = None) -> Tuple[str, List[Any]]:
+        """Todo一覧を (created_at, id) の降順で取得するクエリを組み立てる"""
+        if with_categories:
+            query = """
+                SELECT t.id, t.title, t.state, t.created_at, t.updated_at,
+                       COALESCE(
+                           json_agg(
+                               json_build_object('id', c.id, 'title', c.title, 'created_at', c.created_at)
+                               ORDER BY c.id
+                           ) FILTER (WHERE c.id IS NOT NULL),
+                           '[]'
+                       ) AS categories
+                FROM todos t
+                LEFT JOIN todo_categories tc ON tc.todo_id = t.id
+                LEFT JOIN categories c ON c.id = tc.category_id
+            """
+        else:
+            query = "SELECT t.id, t.title, t.state, t.created_at, t.updated_at FROM todos t"
+        conditions, params = NeonTodoRepository._filter_conditions(filter_state, filter_category)
+        
+        # タイトルの部分一致（pg_trgm のGINインデックスで絞り込まれる）
+        for term in search_terms or []:
+            conditions.append("t.title ILIKE %s")
+            params.append(f"%{escape_like(term)}%")
+        
+        if after is not None:
+            conditions.append("(t.created_at, t.id) < (%s::timestamp, %s)")
+            params.extend(after)
+        
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        
+        if with_categories:
+            query += " GROUP BY t.id"
+        query += " ORDER BY t.created_at DESC, t.id DESC"
+        
+        if limit is not None:
+            query += " LIMIT %s"
+            params.append(limit)
+        
+        return query, params
+    
+    def get_filtered_todos_with_categories(self, filter_state: str = "all",
+                                           filter_category: Optional[int] = None) -> List[Dict[str, Any]]:
+        """フィルター条件に基づいてTodoを取得し、各Todoに 'categories' を付与（1クエリ）"""
+        try:
+            with self._connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    query, params = self._build_todo_query(
+                        filter_state, filter_category, with_categories=True
+                    )
+                    cursor.execute(query, params)
+                    return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            print(f"カテゴリ付きTodo取得エラー: {e}")
+            return []
+    
+    def get_todos_page(self, filter_state: str = "all", filter_category: Optional[int] = None,
+                       limit: int = 50, cursor: Optional[str] = None,
+                       with_categories: bool = False) -> Dict[str, Any]:
+        """(created_at, id) の降順でTodoを1ページ分取得（キーセットページング）"""
+        after = decode_page_cursor(cursor) if cursor is not None else None
+        try:
+            with self._connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as db_cursor:
+                    # 次ページの有無を判定するため1件多く取得する
+                    query, params = self._build_todo_query(
+                        filter_state, filter_category, with_categories, after, limit + 1
+                    )
+                    db_cursor.execute(query, params)
+                    rows = [dict(row) for row in db_cursor.fetchall()]
+        except Exception as e:
+            print(f"Todoページ取得エラー: {e}")
+            return {'items': [], 'next_cursor': None}
+        
+        items = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit and items:
+            next_cursor = encode_page_cursor(items[-1]['created_at'], items[-1]['id'])
+        return {'items': items, 'next_cursor': next_cursor}
+    
+    def iter_todos(self, filter_state: str = "all", filter_category: Optional[int] = None,
+                   batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """サーバーサイドカーソルで batch_size 件ずつ読み込みながらTodoを返す"""
+        try:
+            with self._connection() as conn:
+                name = f"todo_stream_{uuid.uuid4().hex}"
+                with conn.cursor(name=name, cursor_factory=RealDictCursor) as cursor:
+                    cursor.itersize = batch_size
+                    query, params = self._build_todo_query(filter_state, filter_category)
+                    cursor.execute(query, params)
+                    for row in cursor:
+                        yield dict(row)
+        except Exception as e:
+            # 途中で終わったストリームを完了と誤認させないよう、ログに出力して呼び出し元へ伝える
+            print(f"Todoストリーム取得エラー: {e}")
+            raise
+    
+    def search_todos(self, query: str, filter_state: str = "all", filter_category: Optional[int] = None,
+                     limit: int = 50, with_categories: bool = False) -> List[Dict[str, Any]]:
+        """タイトルに検索語を含むTodoを (created_at, id) の降順で取得"""
+        search_terms = split_search_terms(query)
+        if not search_terms:
+            return []
+        
+        try:
+            with self._connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    sql, params = self._build_todo_query(
+                        filter_state, filter_category, with_categories,
+                        limit=limit, search_terms=search_terms
+                    )
+                    cursor.execute(sql, params)
+                    return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            print(f"Todo検索エラー: {e}")
+            return []
+    
     def update_todo_state(self, todo_id: int, new_state: str) -> bool:
         """Todoの状態を更新"""
         try:
-            self._ensure_tables_exist()
-            with self._get_connection() as conn:
+            with self._connection() as conn:
                 with conn.cursor() as cursor:
                     cursor.execute(
                         "UPDATE todos SET state = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
                         (new_state, todo_id)
                     )
-                    conn.commit()
+                    self._commit(conn)
                     return cursor.rowcount > 0
         except Exception as e:
             print(f"Todo更新エラー: {e}")
@@ -366,27 +1334,104 @@ class NeonTodoRepository(TodoRepository):
     def delete_todo(self, todo_id: int) -> bool:
         """Todoを削除"""
         try:
-            self._ensure_tables_exist()
-            with self._get_connection() as conn:
+            with self._connection() as conn:
                 with conn.cursor() as cursor:
                     cursor.execute("DELETE FROM todos WHERE id = %s", (todo_id,))
-                    conn.commit()
+                    self._commit(conn)
                     return cursor.rowcount > 0
         except Exception as e:
             print(f"Todo削除エラー: {e}")
             return False
     
+    def bulk_update_state(self, todo_ids: Iterable[int], new_state: str) -> int:
+        """複数Todoの状態を1つのUPDATE文で更新"""
+        todo_ids = list(todo_ids)
+        if not todo_ids:
+            return 0
+        try:
+            with self._connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        "UPDATE todos SET state = %s, updated_at = CURRENT_TIMESTAMP "
+                        "WHERE id = ANY(%s) AND state <> %s",
+                        (new_state, todo_ids, new_state)
+                    )
+                    self._commit(conn)
+                    return cursor.rowcount
+        except Exception as e:
+            print(f"Todo一括更新エラー: {e}")
+            return 0
+    
+    def bulk_delete(self, todo_ids: Iterable[int]) -> int:
+        """複数Todoを1つのDELETE文で削除（関連付けは外部キーのCASCADEで削除される）"""
+        todo_ids = list(todo_ids)
+        if not todo_ids:
+            return 0
+        try:
+            with self._connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("DELETE FROM todos WHERE id = ANY(%s)", (todo_ids,))
+                    self._commit(conn)
+                    return cursor.rowcount
+        except Exception as e:
+            print(f"Todo一括削除エラー: {e}")
+            return 0
+    
+    def update_state_where(self, new_state: str, filter_state: str = "all",
+                           filter_category: Optional[int] = None) -> int:
+        """フィルター条件に合う全てのTodoの状態を1つのUPDATE文で更新"""
+        conditions, params = self._filter_conditions(filter_state, filter_category)
+        conditions.append("t.state <> %s")
+        query = (
+            "UPDATE todos t SET state = %s, updated_at = CURRENT_TIMESTAMP WHERE "
+            + " AND ".join(conditions)
+        )
+        try:
+            with self._connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(query, [new_state] + params + [new_state])
+                    self._commit(conn)
+                    return cursor.rowcount
+        except Exception as e:
+            print(f"Todo一括更新エラー: {e}")
+            return 0
+    
+    def delete_where(self, filter_state: str = "all", filter_category: Optional[int] = None) -> int:
+        """フィルター条件に合う全てのTodoを1つのDELETE文で削除"""
+        conditions, params = self._filter_conditions(filter_state, filter_category)
+        query = "DELETE FROM todos t"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        try:
+            with self._connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(query, params)
+                    self._commit(conn)
+                    return cursor.rowcount
+        except Exception as e:
+            print(f"Todo一括削除エラー: {e}")
+            return 0
+    
     def get_statistics(self) -> Dict[str, int]:
-        """統計情報を取得"""
+        """統計情報を取得（1クエリ）"""
+        if self.stats_mode == 'counter':
+            query = """
+                SELECT COALESCE(SUM(count), 0) AS total,
+                       COALESCE(SUM(count) FILTER (WHERE state = 'done'), 0) AS done
+                FROM todo_state_counts
+            """
+        else:
+            query = """
+                SELECT COUNT(*) AS total,
+                       COUNT(*) FILTER (WHERE state = 'done') AS done
+                FROM todos
+            """
         try:
-            self._ensure_tables_exist()
-            with self._get_connection() as conn:
+            with self._connection() as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute("SELECT COUNT(*) as total FROM todos")
-                    total = cursor.fetchone()[0]
-                    
-                    cursor.execute("SELECT COUNT(*) as done FROM todos WHERE state = 'done'")
-                    done = cursor.fetchone()[0]
+                    cursor.execute(query)
+                    total, done = cursor.fetchone()
+                    total, done = int(total), int(done)
                     
                     return {
                         'total': total,
@@ -397,11 +1442,40 @@ class NeonTodoRepository(TodoRepository):
             print(f"統計取得エラー: {e}")
             return {'total': 0, 'todo': 0, 'done': 0}
     
+    def get_category_statistics(self) -> List[Dict[str, Any]]:
+        """
+        カテゴリ別の統計情報を取得（1クエリ）
+
+        NEON_STATS_MODE=counter でもカウンタ表は使わず、毎回集計する（O(1)ではない）。
+        カテゴリごとのカウンタは状態更新・削除のたびにTodoの全カテゴリの行を更新することになるため持たない。
+        """
+        try:
+            with self._connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    cursor.execute("""
+                        SELECT c.id, c.title,
+                               COUNT(t.id) AS total,
+                               COUNT(t.id) FILTER (WHERE t.state = 'done') AS done
+                        FROM categories c
+                        LEFT JOIN todo_categories tc ON tc.category_id = c.id
+                        LEFT JOIN todos t ON t.id = tc.todo_id
+                        GROUP BY c.id, c.title
+                        ORDER BY c.id
+                    """)
+                    statistics = []
+                    for row in cursor.fetchall():
+                        row = dict(row)
+                        row['todo'] = row['total'] - row['done']
+                        statistics.append(row)
+                    return statistics
+        except Exception as e:
+            print(f"カテゴリ別統計取得エラー: {e}")
+            return []
+    
     def get_all_todos(self) -> List[Dict[str, Any]]:
         """全てのTodoを取得"""
         try:
-            self._ensure_tables_exist()
-            with self._get_connection() as conn:
+            with self._connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                     cursor.execute("SELECT id, title, state, created_at, updated_at FROM todos ORDER BY created_at DESC")
                     return [dict(row) for row in cursor.fetchall()]
@@ -412,8 +1486,7 @@ class NeonTodoRepository(TodoRepository):
     def get_all_categories(self) -> List[Dict[str, Any]]:
         """全てのカテゴリを取得"""
         try:
-            self._ensure_tables_exist()
-            with self._get_connection() as conn:
+            with self._connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                     cursor.execute("SELECT id, title, created_at FROM categories ORDER BY created_at")
                     return [dict(row) for row in cursor.fetchall()]
@@ -427,10 +1500,29 @@ class TodoRepositoryFactory:
     
     @staticmethod
     def create_repository() -> TodoRepository:
-        """環境変数に基づいて適切なリポジトリを作成"""
-        database_type = os.getenv('DATABASE_TYPE', 'MEMORY').upper()
+        """
+        環境変数に基づいて適切なリポジトリを作成
+
+        Raises:
+            ValueError: DATABASE_TYPE が未対応の値の場合
+        """
+        database_type = get_database_type()
         
         if database_type == 'NEON':
-            return NeonTodoRepository()
+            from write_behind import create_write_behind_from_env, is_write_behind_enabled
+            repository = NeonTodoRepository()
+            # 書き込みを遅延してまとめて反映する（任意）。未反映の書き込みは読み込み結果に重ねて返す
+            if is_write_behind_enabled():
+                return create_write_behind_from_env(repository)
+            return repository
+        elif database_type == 'SQLITE':
+            # 使う場合だけ読み込む（sqlite_repository は repository を参照する）
+            from sqlite_repository import SqliteTodoRepository
+            return SqliteTodoRepository()
         else:
+            # MEMORY（MEMORY_DATA_DIR を指定した場合はスナップショットと追記ログで永続化する）
+            data_dir = os.getenv('MEMORY_DATA_DIR')
+            if data_dir:
+                from memory_persistence import create_durable_memory_repository_from_env
+                return create_durable_memory_repository_from_env(data_dir)
             return MemoryTodoRepository()
@@ -1,18 +1,73 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Callable, Iterable, Iterator, Optional
+from contextlib import contextmanager
+import threading
 from repository import TodoRepository, TodoRepositoryFactory
+from cache import create_cache_from_env
+
+# キャッシュの依存タグ（更新系の操作は影響するタグだけを無効化する）
+TAG_TODOS = 'todos'                      # Todoの追加・削除
+TAG_TODO_STATE = 'todo_state'            # Todoの状態
+TAG_TODO_CATEGORIES = 'todo_categories'  # Todoとカテゴリの関連付け
+TAG_CATEGORIES = 'categories'            # カテゴリの追加
 
 
 class TodoService:
     """Todoアプリケーションのビジネスロジックを管理するサービスクラス"""
     
-    def __init__(self, repository: Optional[TodoRepository] = None):
+    def __init__(self, repository: Optional[TodoRepository] = None, cache: Optional[Any] = None):
         """
         サービスの初期化
         
         Args:
             repository: データアクセス用のリポジトリ（Noneの場合はファクトリから自動生成）
+            cache: 読み込み結果のキャッシュ（Noneの場合は環境変数から作成）
         """
         self.repository = repository or TodoRepositoryFactory.create_repository()
+        self.cache = cache if cache is not None else create_cache_from_env()
+        # スレッドごとの作業単位の実行状態
+        self._unit_of_work = threading.local()
+    
+    def _cached(self, method: str, args: tuple, tags: Iterable[str], loader: Callable[[], Any]) -> Any:
+        """メソッド名と引数をキーにキャッシュから取得（作業単位の中では未確定の値を共有しないよう直接読み込む）"""
+        if getattr(self._unit_of_work, 'active', False):
+            return loader()
+        return self.cache.get_or_load((method, args), tags, loader)
+    
+    @contextmanager
+    def unit_of_work(self) -> Iterator['TodoService']:
+        """
+        ブロック内のサービス呼び出しを1つのトランザクションとしてまとめて確定する
+        
+        例: カテゴリを追加し、そのカテゴリを付けたTodoを追加する処理を1回のコミットで行う。
+        例外が発生した場合（Neonではブロック内の操作が失敗した場合も）全体がロールバックされる。
+        終了時にはキャッシュを全て破棄する。
+        
+        Yields:
+            TodoService: このサービス自身
+        """
+        if getattr(self._unit_of_work, 'active', False):
+            yield self
+            return
+        
+        self._unit_of_work.active = True
+        try:
+            with self.repository.unit_of_work():
+                yield self
+        finally:
+            self._unit_of_work.active = False
+            self.cache.clear()
+    
+    def _invalidate(self, succeeded: bool, *tags: str) -> None:
+        """更新に成功した場合、影響するキャッシュを無効化"""
+        if succeeded:
+            self.cache.invalidate(tags)
+    
+    @staticmethod
+    def _filter_tags(filter_category: Optional[int] = None, with_categories: bool = False) -> tuple:
+        """Todo一覧の取得結果が依存するタグ"""
+        if filter_category is not None or with_categories:
+            return (TAG_TODOS, TAG_TODO_STATE, TAG_TODO_CATEGORIES)
+        return (TAG_TODOS, TAG_TODO_STATE)
     
     def add_todo(self, title: str, category_ids: Optional[List[int]] = None) -> bool:
         """
@@ -25,7 +80,9 @@ class TodoService:
         Returns:
             bool: 追加に成功した場合True
         """
-        return self.repository.add_todo(title, category_ids)
+        result = self.repository.add_todo(title, category_ids)
+        self._invalidate(result, TAG_TODOS, TAG_TODO_CATEGORIES)
+        return result
     
     def add_category(self, title: str) -> bool:
         """
@@ -37,7 +94,39 @@ class TodoService:
         Returns:
             bool: 追加に成功した場合True
         """
-        return self.repository.add_category(title)
+        result = self.repository.add_category(title)
+        self._invalidate(result, TAG_CATEGORIES)
+        return result
+    
+    def bulk_add_todos(self, todos: Iterable[Dict[str, Any]], batch_size: int = 1000) -> List[int]:
+        """
+        Todoを一括追加
+        
+        Args:
+            todos: {'title': str, 'category_ids': Optional[List[int]]} のイテラブル
+            batch_size: 1回のコミットで追加する件数
+            
+        Returns:
+            List[int]: 追加したTodoのID（空タイトルはスキップ）
+        """
+        todo_ids = self.repository.bulk_add_todos(todos, batch_size)
+        self._invalidate(bool(todo_ids), TAG_TODOS, TAG_TODO_CATEGORIES)
+        return todo_ids
+    
+    def bulk_add_categories(self, titles: Iterable[str], batch_size: int = 1000) -> List[int]:
+        """
+        カテゴリを一括追加
+        
+        Args:
+            titles: カテゴリのタイトルのイテラブル
+            batch_size: 1回のコミットで追加する件数
+            
+        Returns:
+            List[int]: 追加したカテゴリのID（空タイトルはスキップ）
+        """
+        category_ids = self.repository.bulk_add_categories(titles, batch_size)
+        self._invalidate(bool(category_ids), TAG_CATEGORIES)
+        return category_ids
     
     def get_todo_categories(self, todo_id: int) -> List[Dict[str, Any]]:
         """
@@ -49,7 +138,25 @@ class TodoService:
         Returns:
             List[Dict[str, Any]]: カテゴリのリスト
         """
-        return self.repository.get_todo_categories(todo_id)
+        return self._cached(
+            'get_todo_categories', (todo_id,), (TAG_TODO_CATEGORIES,),
+            lambda: self.repository.get_todo_categories(todo_id)
+        )
+    
+    def get_categories_for_todos(self, todo_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        複数Todoのカテゴリをまとめて取得
+        
+        Args:
+            todo_ids: TodoのIDのリスト
+            
+        Returns:
+            Dict[int, List[Dict[str, Any]]]: TodoIDごとのカテゴリのリスト
+        """
+        return self._cached(
+            'get_categories_for_todos', tuple(todo_ids), (TAG_TODO_CATEGORIES,),
+            lambda: self.repository.get_categories_for_todos(todo_ids)
+        )
     
     def get_filtered_todos(self, filter_state: str = "all", 
                           filter_category: Optional[int] = None) -> List[Dict[str, Any]]:
@@ -63,7 +170,91 @@ class TodoService:
         Returns:
             List[Dict[str, Any]]: フィルターされたTodoのリスト
         """
-        return self.repository.get_filtered_todos(filter_state, filter_category)
+        return self._cached(
+            'get_filtered_todos', (filter_state, filter_category),
+            self._filter_tags(filter_category),
+            lambda: self.repository.get_filtered_todos(filter_state, filter_category)
+        )
+    
+    def get_filtered_todos_with_categories(self, filter_state: str = "all",
+                                           filter_category: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        フィルター条件に基づいてTodoをカテゴリ付きで取得
+        
+        Args:
+            filter_state: 状態フィルター ("all", "todo", "done")
+            filter_category: カテゴリフィルター (None の場合は全カテゴリ)
+            
+        Returns:
+            List[Dict[str, Any]]: 各Todoに 'categories' を付与したリスト
+        """
+        return self._cached(
+            'get_filtered_todos_with_categories', (filter_state, filter_category),
+            self._filter_tags(filter_category, with_categories=True),
+            lambda: self.repository.get_filtered_todos_with_categories(filter_state, filter_category)
+        )
+    
+    def get_todos_page(self, filter_state: str = "all", filter_category: Optional[int] = None,
+                       limit: int = 50, cursor: Optional[str] = None,
+                       with_categories: bool = False) -> Dict[str, Any]:
+        """
+        Todoを新しい順に1ページ分取得
+        
+        Args:
+            filter_state: 状態フィルター ("all", "todo", "done")
+            filter_category: カテゴリフィルター (None の場合は全カテゴリ)
+            limit: 1ページの件数
+            cursor: 前のページの 'next_cursor'（Noneの場合は先頭ページ）
+            with_categories: 各Todoに 'categories' を付与する場合True
+            
+        Returns:
+            Dict[str, Any]: 'items' と 'next_cursor'（最終ページではNone）
+        """
+        return self._cached(
+            'get_todos_page', (filter_state, filter_category, limit, cursor, with_categories),
+            self._filter_tags(filter_category, with_categories),
+            lambda: self.repository.get_todos_page(
+                filter_state, filter_category, limit, cursor, with_categories
+            )
+        )
+    
+    def iter_todos(self, filter_state: str = "all", filter_category: Optional[int] = None,
+                   batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        Todoを新しい順に少しずつ読み込みながら返す
+        
+        Args:
+            filter_state: 状態フィルター ("all", "todo", "done")
+            filter_category: カテゴリフィルター (None の場合は全カテゴリ)
+            batch_size: 1回に読み込む件数
+            
+        Returns:
+            Iterator[Dict[str, Any]]: Todoのイテレータ
+        """
+        return self.repository.iter_todos(filter_state, filter_category, batch_size)
+    
+    def search_todos(self, query: str, filter_state: str = "all", filter_category: Optional[int] = None,
+                     limit: int = 50, with_categories: bool = False) -> List[Dict[str, Any]]:
+        """
+        タイトルに検索語を含むTodoを新しい順に取得
+        
+        Args:
+            query: 検索文字列（空白区切りの語を全て含むTodoが対象）
+            filter_state: 状態フィルター ("all", "todo", "done")
+            filter_category: カテゴリフィルター (None の場合は全カテゴリ)
+            limit: 取得する最大件数
+            with_categories: 各Todoに 'categories' を付与する場合True
+            
+        Returns:
+            List[Dict[str, Any]]: 検索結果のTodoリスト
+        """
+        return self._cached(
+            'search_todos', (query, filter_state, filter_category, limit, with_categories),
+            self._filter_tags(filter_category, with_categories),
+            lambda: self.repository.search_todos(
+                query, filter_state, filter_category, limit, with_categories
+            )
+        )
     
     def update_todo_state(self, todo_id: int, new_state: str) -> bool:
         """
@@ -76,7 +267,9 @@ class TodoService:
         Returns:
             bool: 更新に成功した場合True
         """
-        return self.repository.update_todo_state(todo_id, new_state)
+        result = self.repository.update_todo_state(todo_id, new_state)
+        self._invalidate(result, TAG_TODO_STATE)
+        return result
     
     def delete_todo(self, todo_id: int) -> bool:
         """
@@ -88,7 +281,70 @@ class TodoService:
         Returns:
             bool: 削除に成功した場合True
         """
-        return self.repository.delete_todo(todo_id)
+        result = self.repository.delete_todo(todo_id)
+        self._invalidate(result, TAG_TODOS, TAG_TODO_CATEGORIES)
+        return result
+    
+    def bulk_update_state(self, todo_ids: Iterable[int], new_state: str) -> int:
+        """
+        複数Todoの状態をまとめて更新
+        
+        Args:
+            todo_ids: TodoのIDのリスト
+            new_state: 新しい状態 ("todo", "done")
+            
+        Returns:
+            int: 状態が変わったTodoの件数
+        """
+        updated = self.repository.bulk_update_state(todo_ids, new_state)
+        self._invalidate(updated > 0, TAG_TODO_STATE)
+        return updated
+    
+    def bulk_delete(self, todo_ids: Iterable[int]) -> int:
+        """
+        複数Todoをまとめて削除
+        
+        Args:
+            todo_ids: TodoのIDのリスト
+            
+        Returns:
+            int: 削除したTodoの件数
+        """
+        deleted = self.repository.bulk_delete(todo_ids)
+        self._invalidate(deleted > 0, TAG_TODOS, TAG_TODO_CATEGORIES)
+        return deleted
+    
+    def update_state_where(self, new_state: str, filter_state: str = "all",
+                           filter_category: Optional[int] = None) -> int:
+        """
+        フィルター条件に合う全てのTodoの状態を更新（例: カテゴリの未完了を全て完了にする）
+        
+        Args:
+            new_state: 新しい状態 ("todo", "done")
+            filter_state: 状態フィルター ("all", "todo", "done")
+            filter_category: カテゴリフィルター (None の場合は全カテゴリ)
+            
+        Returns:
+            int: 状態が変わったTodoの件数
+        """
+        updated = self.repository.update_state_where(new_state, filter_state, filter_category)
+        self._invalidate(updated > 0, TAG_TODO_STATE)
+        return updated
+    
+    def delete_where(self, filter_state: str = "all", filter_category: Optional[int] = None) -> int:
+        """
+        フィルター条件に合う全てのTodoを削除（例: 完了済みを全て削除する）
+        
+        Args:
+            filter_state: 状態フィルター ("all", "todo", "done")
+            filter_category: カテゴリフィルター (None の場合は全カテゴリ)
+            
+        Returns:
+            int: 削除したTodoの件数
+        """
+        deleted = self.repository.delete_where(filter_state, filter_category)
+        self._invalidate(deleted > 0, TAG_TODOS, TAG_TODO_CATEGORIES)
+        return deleted
     
     def get_statistics(self) -> Dict[str, int]:
         """
@@ -97,7 +353,23 @@ class TodoService:
         Returns:
             Dict[str, int]: 統計情報 (total, todo, done)
         """
-        return self.repository.get_statistics()
+        return self._cached(
+            'get_statistics', (), (TAG_TODOS, TAG_TODO_STATE),
+            self.repository.get_statistics
+        )
+    
+    def get_category_statistics(self) -> List[Dict[str, Any]]:
+        """
+        カテゴリ別の統計情報を取得
+        
+        Returns:
+            List[Dict[str, Any]]: カテゴリごとの統計情報 (id, title, total, todo, done)
+        """
+        return self._cached(
+            'get_category_statistics', (),
+            (TAG_TODOS, TAG_TODO_STATE, TAG_TODO_CATEGORIES, TAG_CATEGORIES),
+            self.repository.get_category_statistics
+        )
     
     def get_all_todos(self) -> List[Dict[str, Any]]:
         """
@@ -106,7 +378,10 @@ class TodoService:
         Returns:
             List[Dict[str, Any]]: Todoのリスト
         """
-        return self.repository.get_all_todos()
+        return self._cached(
+            'get_all_todos', (), (TAG_TODOS, TAG_TODO_STATE),
+            self.repository.get_all_todos
+        )
     
     def get_all_categories(self) -> List[Dict[str, Any]]:
         """
@@ -115,26 +390,43 @@ class TodoService:
         Returns:
             List[Dict[str, Any]]: カテゴリのリスト
         """
-        return self.repository.get_all_categories()
+        return self._cached(
+            'get_all_categories', (), (TAG_CATEGORIES,),
+            self.repository.get_all_categories
+        )
     
-    def get_debug_info(self) -> Dict[str, Any]:
+    def get_debug_info(self, sample_size: int = 10) -> Dict[str, Any]:
         """
-        デバッグ情報を取得
+        デバッグ情報を取得（件数と先頭の一部のみ。全件は読み込まない）
+        
+        Args:
+            sample_size: 'todos' / 'categories' に含める最大件数
         
         Returns:
             Dict[str, Any]: デバッグ情報
         """
-        todos = self.get_all_todos()
+        statistics = self.get_statistics()
         categories = self.get_all_categories()
         
         return {
-            "total_todos": len(todos),
+            "total_todos": statistics['total'],
             "total_categories": len(categories),
             "repository_type": type(self.repository).__name__,
-            "todos": todos,
-            "categories": categories
+            "cache": self.cache.stats(),
+            "sample_size": sample_size,
+            "todos": self.get_todos_page(limit=sample_size, with_categories=True)['items'],
+            "categories": categories[:sample_size]
         }
     
+    def initialize_schema(self) -> List[int]:
+        """
+        スキーマ移行を適用（アプリ起動時に1回呼び出す）
+        
+        Returns:
+            今回適用した移行のバージョン一覧
+        """
+        return self.repository.initialize_schema()
+    
     def get_database_info(self) -> Dict[str, Any]:
         """
         データベース情報を取得
@@ -147,14 +439,32 @@ class TodoService:
         
         info = {
             "database_type": database_type,
-            "repository_class": type(self.repository).__name__
+            # 計測用のラッパーに包まれている場合は中身のクラス名を表示する
+            "repository_class": type(getattr(self.repository, 'wrapped', self.repository)).__name__
         }
         
         if database_type == 'NEON':
             info.update({
                 "neon_host": os.getenv('NEON_DATABASE_HOST', 'Not set'),
                 "neon_database": os.getenv('NEON_DATABASE_NAME', 'Not set'),
-                "neon_user": os.getenv('NEON_DATABASE_USER', 'Not set')
+                "neon_user": os.getenv('NEON_DATABASE_USER', 'Not set'),
+                "neon_stats_mode": os.getenv('NEON_STATS_MODE', 'aggregate')
             })
+        elif database_type == 'SQLITE':
+            from sqlite_repository import get_sqlite_database_path
+            info["sqlite_path"] = get_sqlite_database_path()
+        
+        # 接続プールを持つリポジトリの場合はメトリクスを追加
+        if hasattr(self.repository, 'get_pool_stats'):
+            info["pool"] = self.repository.get_pool_stats()
+        
+        # 永続化付きのメモリリポジトリの場合はログとスナップショットのメトリクスを追加
+        if hasattr(self.repository, 'get_persistence_stats'):
+            info["persistence"] = self.repository.get_persistence_stats()
+        
+        # ライトビハインドで包まれている場合はキューのメトリクスを追加
+        if hasattr(self.repository, 'get_write_behind_stats'):
+            info["write_behind"] = self.repository.get_write_behind_stats()
+            info["write_behind_dead_letters"] = self.repository.get_dead_letters()
         
         return info
\ No newline at end of file
@@ -0,0 +1,699 @@
+"""SQLite（WALモード）を使用するTodoリポジトリ
+
+DATABASE_TYPE=SQLITE で使用する。単一ノードの構成向けに、ネットワークを介さずにローカルのファイルへ永続化する。
+
+- 接続はスレッドごとに1つ作成して再利用する（WALモードでは読み込みと書き込みが互いを待たない）
+- 書き込みは BEGIN IMMEDIATE のトランザクションで行い、ロック待ちは busy_timeout で吸収する
+- SQL文は固定の文字列にし、ID一覧は json_each(?) で渡すため、接続ごとの準備済み文のキャッシュが効く
+- スキーマは SQLITE_MIGRATIONS で管理し、適用済みのバージョンを PRAGMA user_version に記録する
+- タイトル検索は trigram のFTS5表（Postgresの pg_trgm インデックスに相当）で候補を絞り込む
+"""
+import json
+import os
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from migrations import ensure_schema
+from repository import (
+    TodoRepository, UnitOfWorkError, batched, decode_page_cursor, encode_page_cursor, escape_like,
+    split_search_terms
+)
+
+# 接続ごとに保持する準備済み文の数（sqlite3 の既定は128）
+STATEMENT_CACHE_SIZE = 256
+
+# Postgresのスキーマ（migrations.py）と同じ表・インデックス
+CREATE_TABLES_SQL = """
+    CREATE TABLE IF NOT EXISTS categories (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS todos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        state TEXT NOT NULL DEFAULT 'todo',
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS todo_categories (
+        todo_id INTEGER NOT NULL REFERENCES todos(id) ON DELETE CASCADE,
+        category_id INTEGER NOT NULL REFERENCES categories(id) ON DELETE CASCADE,
+        PRIMARY KEY (todo_id, category_id)
+    ) WITHOUT ROWID;
+"""
+
+QUERY_INDEXES_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_todos_created_at_id
+        ON todos (created_at DESC, id DESC);
+
+    CREATE INDEX IF NOT EXISTS idx_todos_state_created_at_id
+        ON todos (state, created_at DESC, id DESC);
+
+    CREATE INDEX IF NOT EXISTS idx_todo_categories_category_id_todo_id
+        ON todo_categories (category_id, todo_id);
+"""
+
+# Postgresの pg_trgm によるタイトル検索のインデックス（移行4）に相当する、trigramトークナイザのFTS5表
+# （外部コンテンツ表として todos のタイトルを参照し、トリガーで同期する。SQLite 3.34 以降が必要）
+TITLE_SEARCH_INDEX_SQL = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS todos_title_fts
+        USING fts5(title, content='todos', content_rowid='id', tokenize='trigram');
+
+    INSERT INTO todos_title_fts (todos_title_fts) VALUES ('rebuild');
+
+    CREATE TRIGGER IF NOT EXISTS todos_title_fts_insert AFTER INSERT ON todos BEGIN
+        INSERT INTO todos_title_fts (rowid, title) VALUES (new.id, new.title);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS todos_title_fts_delete AFTER DELETE ON todos BEGIN
+        INSERT INTO todos_title_fts (todos_title_fts, rowid, title) VALUES ('delete', old.id, old.title);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS todos_title_fts_update AFTER UPDATE OF title ON todos BEGIN
+        INSERT INTO todos_title_fts (todos_title_fts, rowid, title) VALUES ('delete', old.id, old.title);
+        INSERT INTO todos_title_fts (rowid, title) VALUES (new.id, new.title);
+    END;
+"""
+
+# (バージョン, 名前, SQL) — 適用済みの移行は書き換えず、変更は新しいバージョンで追加する
+SQLITE_MIGRATIONS: List[Tuple[int, str, str]] = [
+    (1, 'create_tables', CREATE_TABLES_SQL),
+    (2, 'add_query_indexes', QUERY_INDEXES_SQL),
+    (3, 'add_title_search_index', TITLE_SEARCH_INDEX_SQL),
+]
+
+# trigramのインデックスで絞り込める検索語の最小の文字数（これより短い語は LIKE だけで照合する）
+TRIGRAM_MIN_LENGTH = 3
+
+TODO_COLUMNS = "t.id, t.title, t.state, t.created_at, t.updated_at"
+
+
+def get_sqlite_database_path() -> str:
+    """環境変数からSQLiteのデータベースファイルのパスを取得"""
+    return os.getenv('SQLITE_DATABASE_PATH', os.path.join('data', 'todo.sqlite3'))
+
+
+def _now() -> str:
+    """作成・更新日時（文字列の大小が時刻の前後と一致するよう、マイクロ秒まで固定長で出力）"""
+    return datetime.now().isoformat(timespec='microseconds')
+
+
+def split_statements(sql: str) -> List[str]:
+    """複数のSQL文を1文ずつに分割（トリガー本体の中の ; では分割しない）"""
+    statements: List[str] = []
+    current = ""
+    for piece in sql.split(';'):
+        current += piece + ';'
+        if sqlite3.complete_statement(current):
+            if current.strip(' \n;'):
+                statements.append(current)
+            current = ""
+    return statements
+
+
+def _fts_phrase(term: str) -> str:
+    """検索語をFTS5の1つのフレーズ（trigramでは部分一致）として引用する"""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _id_list(todo_ids: Iterable[int]) -> str:
+    """ID一覧を json_each(?) に渡すJSON配列にする（件数によってSQL文が変わらない）"""
+    return json.dumps([int(todo_id) for todo_id in todo_ids])
+
+
+class SqliteTodoRepository(TodoRepository):
+    """SQLite（WALモード）を使用するTodoリポジトリ"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        SQLiteリポジトリの初期化（接続は各スレッドの初回使用時に作成）
+
+        Args:
+            path: データベースファイルのパス（Noneの場合は環境変数 SQLITE_DATABASE_PATH）
+        """
+        self.path = path or get_sqlite_database_path()
+        self.busy_timeout = float(os.getenv('SQLITE_BUSY_TIMEOUT_SECONDS', '5'))
+        self.synchronous = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL').upper()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        # スレッドごとの接続と作業単位の状態
+        self._local = threading.local()
+        # クローズ用に全スレッドの接続を保持する（スレッドID -> (スレッドの弱参照, 接続)）
+        self._connections: Dict[int, Tuple[Any, sqlite3.Connection]] = {}
+        self._connections_lock = threading.Lock()
+        self._closed = False
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """このスレッドの接続を取得（初回はスキーマ移行を適用する。2回目以降はファイルにアクセスしない）"""
+        self.initialize_schema()
+        return self._thread_connection()
+
+    def _thread_connection(self) -> sqlite3.Connection:
+        """このスレッドの接続を取得（無ければ作成）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+        if self._closed:
+            raise sqlite3.ProgrammingError("repository is closed")
+
+        # トランザクションは BEGIN / COMMIT で明示的に制御する
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                               check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        # ON DELETE CASCADE のために接続ごとに有効にする
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        self._local.conn = conn
+
+        thread = threading.current_thread()
+        with self._connections_lock:
+            # 終了したスレッドの接続（スレッドIDが再利用された場合の古い接続を含む）を取り除く
+            stale = [
+                ident for ident, (thread_ref, _) in self._connections.items()
+                if ident == thread.ident or thread_ref() is None or not thread_ref().is_alive()
+            ]
+            stale_connections = [self._connections.pop(ident)[1] for ident in stale]
+            self._connections[thread.ident] = (weakref.ref(thread), conn)
+        for stale_connection in stale_connections:
+            stale_connection.close()
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """書き込みのトランザクションを実行（作業単位の中では作業単位のトランザクションに合流する）"""
+        conn = self._get_connection()
+        if getattr(self._local, 'in_unit_of_work', False):
+            try:
+                yield conn
+            except Exception:
+                self._local.failed = True
+                raise
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @contextmanager
+    def _read_transaction(self) -> Iterator[sqlite3.Connection]:
+        """複数の読み込みを1つの読み込みトランザクション（同じスナップショット）で実行"""
+        conn = self._get_connection()
+        if getattr(self._local, 'in_unit_of_work', False) or conn.in_transaction:
+            yield conn
+            return
+
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT")
+
+    @contextmanager
+    def unit_of_work(self) -> Iterator[None]:
+        """
+        ブロック内の操作をこのスレッドの接続の1つのトランザクションで実行し、終了時にまとめてコミット
+
+        ブロック内の操作が1つでも失敗した場合、または例外が発生した場合は全体をロールバックする。
+        入れ子の呼び出しは外側に合流する。
+
+        Raises:
+            UnitOfWorkError: ブロック内の操作が失敗した場合
+        """
+        if getattr(self._local, 'in_unit_of_work', False):
+            yield
+            return
+
+        conn = self._get_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.in_unit_of_work = True
+        self._local.failed = False
+        try:
+            yield
+            if self._local.failed:
+                raise UnitOfWorkError("作業単位の中の操作が失敗したため、ロールバックしました")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            self._local.in_unit_of_work = False
+
+    def close(self) -> None:
+        """全スレッドの接続を閉じる"""
+        with self._connections_lock:
+            self._closed = True
+            connections = [conn for _, conn in self._connections.values()]
+            self._connections.clear()
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._local = threading.local()
+
+    def initialize_schema(self) -> List[int]:
+        """
+        未適用のスキーマ移行を適用（同じファイルにはプロセス内で1回だけ実行）
+
+        最初の操作の前にも自動で呼び出されるため、呼び出し忘れてもスキーマは作成される。
+
+        Returns:
+            今回適用した移行のバージョン一覧
+
+        Raises:
+            Exception: 移行に失敗した場合
+        """
+        return ensure_schema(f"sqlite:{os.path.abspath(self.path)}", self._apply_migrations)
+
+    def _apply_migrations(self) -> List[int]:
+        """未適用の移行を1トランザクションで適用し、PRAGMA user_version を更新"""
+        conn = self._thread_connection()
+        # 書き込みロックを取ってから確認し、同時に起動したプロセスとの二重適用を防ぐ
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            applied = conn.execute("PRAGMA user_version").fetchone()[0]
+            versions = []
+            for version, _, sql in sorted(SQLITE_MIGRATIONS):
+                if version <= applied:
+                    continue
+                for statement in split_statements(sql):
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {int(version)}")
+                versions.append(version)
+            conn.execute("COMMIT")
+            return versions
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def add_todo(self, title: str, category_ids: Optional[List[int]] = None) -> bool:
+        """新しいTodoを追加"""
+        if not title.strip():
+            return False
+
+        try:
+            with self._transaction() as conn:
+                self._insert_todo(conn, title.strip(), category_ids)
+                return True
+        except Exception as e:
+            print(f"Todo追加エラー: {e}")
+            return False
+
+    @staticmethod
+    def _insert_todo(conn: sqlite3.Connection, title: str, category_ids: Optional[List[int]]) -> int:
+        """Todoとカテゴリの関連付けを登録し、採番したIDを返す（トランザクション内で呼び出す）"""
+        now = _now()
+        todo_id = conn.execute(
+            "INSERT INTO todos (title, state, created_at, updated_at) VALUES (?, 'todo', ?, ?)",
+            (title, now, now)
+        ).lastrowid
+        if category_ids:
+            conn.executemany(
+                "INSERT OR IGNORE INTO todo_categories (todo_id, category_id) VALUES (?, ?)",
+                [(todo_id, category_id) for category_id in category_ids]
+            )
+        return todo_id
+
+    def add_category(self, title: str) -> bool:
+        """新しいカテゴリを追加"""
+        if not title.strip():
+            return False
+
+        try:
+            with self._transaction() as conn:
+                conn.execute("INSERT INTO categories (title, created_at) VALUES (?, ?)", (title.strip(), _now()))
+                return True
+        except Exception as e:
+            print(f"カテゴリ追加エラー: {e}")
+            return False
+
+    def bulk_add_todos(self, todos: Iterable[Dict[str, Any]], batch_size: int = 1000) -> List[int]:
+        """
+        Todoを一括追加（batch_size 件ずつ1トランザクションでINSERTしてコミット）
+
+        途中のバッチで失敗した場合は、それまでにコミットしたTodoのIDを返す。
+        """
+        todo_ids: List[int] = []
+        try:
+            for batch in batched((todo for todo in todos if todo['title'].strip()), batch_size):
+                with self._transaction() as conn:
+                    # 同じ準備済み文を繰り返し実行する（ネットワークの往復は無い）
+                    batch_ids = [
+                        self._insert_todo(conn, todo['title'].strip(), todo.get('category_ids'))
+                        for todo in batch
+                    ]
+                todo_ids.extend(batch_ids)
+        except Exception as e:
+            print(f"Todo一括追加エラー: {e}")
+        return todo_ids
+
+    def bulk_add_categories(self, titles: Iterable[str], batch_size: int = 1000) -> List[int]:
+        """カテゴリを一括追加（batch_size 件ずつ1トランザクションでINSERTしてコミット）"""
+        category_ids: List[int] = []
+        try:
+            for batch in batched((title.strip() for title in titles if title.strip()), batch_size):
+                with self._transaction() as conn:
+                    batch_ids = [
+                        conn.execute(
+                            "INSERT INTO categories (title, created_at) VALUES (?, ?)", (title, _now())
+                        ).lastrowid
+                        for title in batch
+                    ]
+                category_ids.extend(batch_ids)
+        except Exception as e:
+            print(f"カテゴリ一括追加エラー: {e}")
+        return category_ids
+
+    def get_todo_categories(self, todo_id: int) -> List[Dict[str, Any]]:
+        """指定されたTodoのカテゴリを取得"""
+        try:
+            rows = self._get_connection().execute("""
+                SELECT c.id, c.title, c.created_at
+                FROM categories c
+                JOIN todo_categories tc ON c.id = tc.category_id
+                WHERE tc.todo_id = ?
+                ORDER BY c.id
+            """, (todo_id,))
+            return [dict(row) for row in rows]
+        except Exception as e:
+            print(f"カテゴリ取得エラー: {e}")
+            return []
+
+    def get_categories_for_todos(self, todo_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        """複数TodoのカテゴリをTodoIDごとにまとめて取得（1クエリ）"""
+        result: Dict[int, List[Dict[str, Any]]] = {todo_id: [] for todo_id in todo_ids}
+        if not todo_ids:
+            return result
+
+        try:
+            rows = self._get_connection().execute("""
+                SELECT tc.todo_id, c.id, c.title, c.created_at
+                FROM todo_categories tc
+                JOIN categories c ON c.id = tc.category_id
+                WHERE tc.todo_id IN (SELECT value FROM json_each(?))
+                ORDER BY tc.todo_id, c.id
+            """, (_id_list(todo_ids),))
+            for row in rows:
+                category = dict(row)
+                todo_id = category.pop('todo_id')
+                result.setdefault(todo_id, []).append(category)
+            return result
+        except Exception as e:
+            print(f"カテゴリ一括取得エラー: {e}")
+            return result
+
+    @staticmethod
+    def _filter_conditions(filter_state: str = "all",
+                           filter_category: Optional[int] = None) -> Tuple[List[str], List[Any]]:
+        """状態・カテゴリのフィルターをエイリアス t のtodosに対するWHERE条件とパラメータにする"""
+        conditions: List[str] = []
+        params: List[Any] = []
+        if filter_state != "all":
+            conditions.append("t.state = ?")
+            params.append(filter_state)
+
+        if filter_category is not None:
+            conditions.append(
+                "EXISTS (SELECT 1 FROM todo_categories f "
+                "WHERE f.todo_id = t.id AND f.category_id = ?)"
+            )
+            params.append(filter_category)
+        return conditions, params
+
+    @staticmethod
+    def _build_todo_query(filter_state: str = "all", filter_category: Optional[int] = None,
+                          after: Optional[Tuple[str, int]] = None,
+                          limit: Optional[int] = None,
+                          search_terms: Optional[List[str]] = None) -> Tuple[str, List[Any]]:
+        """Todo一覧を (created_at, id) の降順で取得するクエリを組み立てる"""
+        query = f"SELECT {TODO_COLUMNS} FROM todos t"
+        conditions, params = SqliteTodoRepository._filter_conditions(filter_state, filter_category)
+
+        # 3文字以上の語はタイトルのFTS5インデックスで候補を絞り込む
+        indexed_terms = [term for term in search_terms or [] if len(term) >= TRIGRAM_MIN_LENGTH]
+        if indexed_terms:
+            conditions.append("t.id IN (SELECT rowid FROM todos_title_fts WHERE todos_title_fts MATCH ?)")
+            params.append(" AND ".join(_fts_phrase(term) for term in indexed_terms))
+
+        # タイトルの部分一致（LIKE はASCIIの大文字小文字を区別しない）
+        for term in search_terms or []:
+            conditions.append("t.title LIKE ? ESCAPE '\\'")
+            params.append(f"%{escape_like(term)}%")
+
+        if after is not None:
+            conditions.append("(t.created_at, t.id) < (?, ?)")
+            params.extend(after)
+
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY t.created_at DESC, t.id DESC"
+
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        return query, params
+
+    def _fetch_todos(self, query: str, params: List[Any], with_categories: bool = False) -> List[Dict[str, Any]]:
+        """Todoを取得し、必要なら各Todoに 'categories' を付与（カテゴリは1クエリでまとめて取得）"""
+        todos = [dict(row) for row in self._get_connection().execute(query, params)]
+        if with_categories and todos:
+            categories = self.get_categories_for_todos([todo['id'] for todo in todos])
+            for todo in todos:
+                todo['categories'] = categories.get(todo['id'], [])
+        return todos
+
+    def get_filtered_todos(self, filter_state: str = "all",
+                           filter_category: Optional[int] = None) -> List[Dict[str, Any]]:
+        """フィルター条件に基づいてTodoを取得"""
+        try:
+            query, params = self._build_todo_query(filter_state, filter_category)
+            return self._fetch_todos(query, params)
+        except Exception as e:
+            print(f"Todo取得エラー: {e}")
+            return []
+
+    def get_filtered_todos_with_categories(self, filter_state: str = "all",
+                                           filter_category: Optional[int] = None) -> List[Dict[str, Any]]:
+        """フィルター条件に基づいてTodoを取得し、各Todoに 'categories' を付与"""
+        try:
+            query, params = self._build_todo_query(filter_state, filter_category)
+            return self._fetch_todos(query, params, with_categories=True)
+        except Exception as e:
+            print(f"カテゴリ付きTodo取得エラー: {e}")
+            return []
+
+    def get_todos_page(self, filter_state: str = "all", filter_category: Optional[int] = None,
+                       limit: int = 50, cursor: Optional[str] = None,
+                       with_categories: bool = False) -> Dict[str, Any]:
+        """(created_at, id) の降順でTodoを1ページ分取得（キーセットページング）"""
+        after = decode_page_cursor(cursor) if cursor is not None else None
+        try:
+            # Todoとカテゴリを同じスナップショットから読み、同時の書き込みでページとカテゴリがずれないようにする
+            with self._read_transaction():
+                # 次ページの有無を判定するため1件多く取得する
+                query, params = self._build_todo_query(filter_state, filter_category, after, limit + 1)
+                rows = self._fetch_todos(query, params)
+                items = rows[:limit]
+                if with_categories and items:
+                    categories = self.get_categories_for_todos([todo['id'] for todo in items])
+                    for todo in items:
+                        todo['categories'] = categories.get(todo['id'], [])
+        except Exception as e:
+            print(f"Todoページ取得エラー: {e}")
+            return {'items': [], 'next_cursor': None}
+
+        next_cursor = None
+        if len(rows) > limit and items:
+            next_cursor = encode_page_cursor(items[-1]['created_at'], items[-1]['id'])
+        return {'items': items, 'next_cursor': next_cursor}
+
+    def iter_todos(self, filter_state: str = "all", filter_category: Optional[int] = None,
+                   batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """batch_size 件ずつ読み込みながらTodoを返す（SQLiteのカーソルは読んだ分だけ実行が進む）"""
+        try:
+            query, params = self._build_todo_query(filter_state, filter_category)
+            cursor = self._get_connection().execute(query, params)
+            try:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield dict(row)
+            finally:
+                cursor.close()
+        except Exception as e:
+            print(f"Todoストリーム取得エラー: {e}")
+            raise
+
+    def search_todos(self, query: str, filter_state: str = "all", filter_category: Optional[int] = None,
+                     limit: int = 50, with_categories: bool = False) -> List[Dict[str, Any]]:
+        """タイトルに検索語を含むTodoを (created_at, id) の降順で取得"""
+        search_terms = split_search_terms(query)
+        if not search_terms:
+            return []
+
+        try:
+            sql, params = self._build_todo_query(
+                filter_state, filter_category, limit=limit, search_terms=search_terms
+            )
+            return self._fetch_todos(sql, params, with_categories)
+        except Exception as e:
+            print(f"Todo検索エラー: {e}")
+            return []
+
+    def update_todo_state(self, todo_id: int, new_state: str) -> bool:
+        """Todoの状態を更新"""
+        try:
+            with self._transaction() as conn:
+                cursor = conn.execute(
+                    "UPDATE todos SET state = ?, updated_at = ? WHERE id = ?",
+                    (new_state, _now(), todo_id)
+                )
+                return cursor.rowcount > 0
+        except Exception as e:
+            print(f"Todo更新エラー: {e}")
+            return False
+
+    def delete_todo(self, todo_id: int) -> bool:
+        """Todoを削除（関連付けは外部キーのCASCADEで削除される）"""
+        try:
+            with self._transaction() as conn:
+                cursor = conn.execute("DELETE FROM todos WHERE id = ?", (todo_id,))
+                return cursor.rowcount > 0
+        except Exception as e:
+            print(f"Todo削除エラー: {e}")
+            return False
+
+    def bulk_update_state(self, todo_ids: Iterable[int], new_state: str) -> int:
+        """複数Todoの状態を1つのUPDATE文で更新"""
+        todo_ids = list(todo_ids)
+        if not todo_ids:
+            return 0
+        try:
+            with self._transaction() as conn:
+                cursor = conn.execute(
+                    "UPDATE todos SET state = ?, updated_at = ? "
+                    "WHERE id IN (SELECT value FROM json_each(?)) AND state <> ?",
+                    (new_state, _now(), _id_list(todo_ids), new_state)
+                )
+                return cursor.rowcount
+        except Exception as e:
+            print(f"Todo一括更新エラー: {e}")
+            return 0
+
+    def bulk_delete(self, todo_ids: Iterable[int]) -> int:
+        """複数Todoを1つのDELETE文で削除"""
+        todo_ids = list(todo_ids)
+        if not todo_ids:
+            return 0
+        try:
+            with self._transaction() as conn:
+                cursor = conn.execute(
+                    "DELETE FROM todos WHERE id IN (SELECT value FROM json_each(?))", (_id_list(todo_ids),)
+                )
+                return cursor.rowcount
+        except Exception as e:
+            print(f"Todo一括削除エラー: {e}")
+            return 0
+
+    def update_state_where(self, new_state: str, filter_state: str = "all",
+                           filter_category: Optional[int] = None) -> int:
+        """フィルター条件に合う全てのTodoの状態を1つのUPDATE文で更新"""
+        conditions, params = self._filter_conditions(filter_state, filter_category)
+        conditions.append("t.state <> ?")
+        query = "UPDATE todos AS t SET state = ?, updated_at = ? WHERE " + " AND ".join(conditions)
+        try:
+            with self._transaction() as conn:
+                cursor = conn.execute(query, [new_state, _now()] + params + [new_state])
+                return cursor.rowcount
+        except Exception as e:
+            print(f"Todo一括更新エラー: {e}")
+            return 0
+
+    def delete_where(self, filter_state: str = "all", filter_category: Optional[int] = None) -> int:
+        """フィルター条件に合う全てのTodoを1つのDELETE文で削除"""
+        conditions, params = self._filter_conditions(filter_state, filter_category)
+        query = "DELETE FROM todos AS t"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        try:
+            with self._transaction() as conn:
+                cursor = conn.execute(query, params)
+                return cursor.rowcount
+        except Exception as e:
+            print(f"Todo一括削除エラー: {e}")
+            return 0
+
+    def get_statistics(self) -> Dict[str, int]:
+        """統計情報を取得（1クエリ、状態のインデックスだけで数える）"""
+        try:
+            total, done = self._get_connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(state = 'done'), 0) FROM todos"
+            ).fetchone()
+            return {
+                'total': total,
+                'todo': total - done,
+                'done': done
+            }
+        except Exception as e:
+            print(f"統計取得エラー: {e}")
+            return {'total': 0, 'todo': 0, 'done': 0}
+
+    def get_category_statistics(self) -> List[Dict[str, Any]]:
+        """カテゴリ別の統計情報を取得（1クエリ）"""
+        try:
+            rows = self._get_connection().execute("""
+                SELECT c.id, c.title,
+                       COUNT(t.id) AS total,
+                       COALESCE(SUM(t.state = 'done'), 0) AS done
+                FROM categories c
+                LEFT JOIN todo_categories tc ON tc.category_id = c.id
+                LEFT JOIN todos t ON t.id = tc.todo_id
+                GROUP BY c.id, c.title
+                ORDER BY c.id
+            """)
+            statistics = []
+            for row in rows:
+                row = dict(row)
+                row['todo'] = row['total'] - row['done']
+                statistics.append(row)
+            return statistics
+        except Exception as e:
+            print(f"カテゴリ別統計取得エラー: {e}")
+            return []
+
+    def get_all_todos(self) -> List[Dict[str, Any]]:
+        """全てのTodoを取得"""
+        try:
+            query, params = self._build_todo_query()
+            return self._fetch_todos(query, params)
+        except Exception as e:
+            print(f"全Todo取得エラー: {e}")
+            return []
+
+    def get_all_categories(self) -> List[Dict[str, Any]]:
+        """全てのカテゴリを取得"""
+        try:
+            rows = self._get_connection().execute(
+                "SELECT id, title, created_at FROM categories ORDER BY created_at, id"
+            )
+            return [dict(row) for row in rows]
+        except Exception as e:
+            print(f"全カテゴリ取得エラー: {e}")
+            return []
@@ -0,0 +1,832 @@
+"""書き込みを遅延してまとめて反映するリポジトリ（ライトビハインド）
+
+TODO_WRITE_BEHIND を有効にすると、NeonTodoRepository を WriteBehindTodoRepository で包む。
+add_todo / add_category / update_todo_state / delete_todo はメモリ上のキューに積んで即座に返し、
+バックグラウンドのスレッドが件数または経過時間のしきい値で一括操作にまとめて反映する。
+読み込み系のメソッドは未反映の書き込みを読み込み結果に重ねて返すため、反映（コミット）を待たずに
+同じプロセス内で書いた内容がすぐに読める。キューの中のTodoには仮ID（負の数）を振り、反映後は実際のIDに読み替える。
+重ねても正しい結果にならない読み込み（例: 未反映の状態変更がある中での状態フィルター）だけは、先に反映してから読む。
+
+update_todo_state / delete_todo は、このプロセスで読み込んだ（または追加した）Todoだけをキューに積む。
+それ以外のIDは反映してから直接書き込むため、存在しないIDには False を返す。
+反映に失敗し、再試行しても失敗した書き込みはデッドレターとして保持し、件数を dropped で数える。
+"""
+import atexit
+import itertools
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from locks import ReadWriteLock
+from repository import TodoRepository, encode_page_cursor, split_search_terms
+
+# キューに積む操作（メソッド名, 引数, 積んだ時刻, 追加するTodoの仮ID）
+Operation = Tuple[str, Tuple[Any, ...], float, Optional[int]]
+
+# プロセス終了時に反映してクローズするバッファ
+_live_buffers: "weakref.WeakSet[WriteBehindTodoRepository]" = weakref.WeakSet()
+
+
+def close_all_buffers() -> None:
+    """生存している全てのバッファを反映してクローズ（シャットダウンフック）"""
+    for repository in list(_live_buffers):
+        repository.close()
+
+
+atexit.register(close_all_buffers)
+
+
+def is_write_behind_enabled() -> bool:
+    """環境変数でライトビハインドが有効になっているか"""
+    return os.getenv('TODO_WRITE_BEHIND', '').lower() in ('1', 'true', 'yes', 'on')
+
+
+def write_behind_prometheus() -> str:
+    """生存している全てのバッファのメトリクス（Prometheusのテキスト形式）"""
+    totals = {'enqueued': 0, 'flushed': 0, 'retries': 0, 'missing': 0, 'dropped': 0}
+    dead_letters = 0
+    for repository in list(_live_buffers):
+        stats = repository.get_write_behind_stats()
+        for key in totals:
+            totals[key] += stats[key]
+        dead_letters += stats['dead_letters']
+
+    lines = [
+        "# HELP todo_write_behind_operations_total Write-behind queue operations by outcome.",
+        "# TYPE todo_write_behind_operations_total counter",
+    ]
+    lines.extend(f'todo_write_behind_operations_total{{outcome="{key}"}} {value}' for key, value in totals.items())
+    lines.extend([
+        "# HELP todo_write_behind_dead_letters Writes that failed after retries and are kept for inspection.",
+        "# TYPE todo_write_behind_dead_letters gauge",
+        f"todo_write_behind_dead_letters {dead_letters}",
+    ])
+    return "\n".join(lines) + "\n"
+
+
+def create_write_behind_from_env(repository: TodoRepository) -> "WriteBehindTodoRepository":
+    """環境変数の設定でリポジトリをライトビハインドで包む"""
+    return WriteBehindTodoRepository(
+        repository,
+        batch_size=int(os.getenv('TODO_WRITE_BEHIND_BATCH_SIZE', '500')),
+        flush_interval=float(os.getenv('TODO_WRITE_BEHIND_INTERVAL_MS', '200')) / 1000,
+        max_pending=int(os.getenv('TODO_WRITE_BEHIND_MAX_PENDING', '10000')),
+        timeout=float(os.getenv('TODO_WRITE_BEHIND_TIMEOUT_SECONDS', '30')),
+        max_retries=int(os.getenv('TODO_WRITE_BEHIND_MAX_RETRIES', '3')),
+        retry_backoff=float(os.getenv('TODO_WRITE_BEHIND_RETRY_BACKOFF_MS', '100')) / 1000,
+    )
+
+
+class PendingWrites:
+    """キューの中の未反映の書き込みを、読み込み結果に重ねられる形にまとめたもの"""
+
+    def __init__(self, operations: Iterable[Operation], resolved: Optional[Dict[int, int]] = None):
+        """
+        Args:
+            operations: 未反映の操作（積んだ順）
+            resolved: 反映済みの仮ID → 反映後のID（追加の反映中に積まれた仮IDへの書き込みを読み替える）
+        """
+        resolved = resolved or {}
+        # 仮ID → 追加するTodo（積んだ順）
+        self.added: Dict[int, Dict[str, Any]] = {}
+        # 仮IDのTodo → カテゴリID
+        self.added_categories: Dict[int, List[int]] = {}
+        # 既存のTodoID → (状態, 更新時刻)
+        self.states: Dict[int, Tuple[str, datetime]] = {}
+        self.deleted: Set[int] = set()
+        self.categories = False
+
+        now_monotonic, now = time.monotonic(), datetime.now()
+        for method, args, enqueued_at, ref in operations:
+            at = now - timedelta(seconds=now_monotonic - enqueued_at)
+            if method == 'add_todo':
+                title, category_ids = args
+                self.added[ref] = {'id': ref, 'title': title.strip(), 'state': 'todo',
+                                   'created_at': at, 'updated_at': at}
+                self.added_categories[ref] = category_ids
+            elif method == 'add_category':
+                self.categories = True
+            elif method == 'update_todo_state':
+                todo_id, new_state = args
+                todo_id = resolved.get(todo_id, todo_id)
+                if todo_id in self.added:
+                    self.added[todo_id] = {**self.added[todo_id], 'state': new_state, 'updated_at': at}
+                else:
+                    self.states[todo_id] = (new_state, at)
+            elif method == 'delete_todo':
+                todo_id = resolved.get(args[0], args[0])
+                if todo_id in self.added:
+                    del self.added[todo_id]
+                else:
+                    self.states.pop(todo_id, None)
+                    self.deleted.add(todo_id)
+
+    def changes_existing(self) -> bool:
+        """既存のTodoを変更する書き込みがあるか"""
+        return bool(self.states or self.deleted)
+
+    def can_filter(self, filter_state: str) -> bool:
+        """状態フィルターの結果に重ねられるか（状態が変わって新たに条件に合うTodoは読み込み結果に無い）"""
+        return filter_state == "all" or not self.states
+
+    def apply(self, todos: Iterable[Dict[str, Any]], filter_state: str = "all") -> List[Dict[str, Any]]:
+        """既存のTodoに未反映の状態変更・削除を重ねる"""
+        result = []
+        for todo in todos:
+            if todo['id'] in self.deleted:
+                continue
+            if todo['id'] in self.states:
+                new_state, at = self.states[todo['id']]
+                todo = {**todo, 'state': new_state, 'updated_at': at}
+                if filter_state != "all" and new_state != filter_state:
+                    continue
+            result.append(todo)
+        return result
+
+    def added_todos(self, filter_state: str = "all", filter_category: Optional[int] = None,
+                    query: Optional[str] = None) -> List[Dict[str, Any]]:
+        """条件に合う未反映のTodoを新しい順に取得"""
+        terms = [term.lower() for term in split_search_terms(query)] if query is not None else []
+        return [
+            todo for todo in reversed(list(self.added.values()))
+            if (filter_state == "all" or todo['state'] == filter_state)
+            and (filter_category is None or filter_category in self.added_categories[todo['id']])
+            and all(term in todo['title'].lower() for term in terms)
+        ]
+
+    def with_categories(self, todos: List[Dict[str, Any]],
+                        load_categories: Callable[[], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """未反映のTodoに 'categories' を付与（カテゴリが必要な場合だけ load_categories で読み込む）"""
+        if not any(self.added_categories[todo['id']] for todo in todos):
+            return [{**todo, 'categories': []} for todo in todos]
+        categories = {category['id']: category for category in load_categories()}
+        return [
+            {**todo, 'categories': [categories[category_id]
+                                    for category_id in sorted(set(self.added_categories[todo['id']]))
+                                    if category_id in categories]}
+            for todo in todos
+        ]
+
+
+class WriteBehindTodoRepository(TodoRepository):
+    """書き込みをキューに積み、バックグラウンドで一括操作として反映するリポジトリ
+
+    - キューが max_pending 件に達すると、空きができるまで書き込み側を待たせる（最大 timeout 秒）
+    - batch_size 件たまるか、最も古い書き込みから flush_interval 秒経つと反映する
+    - 1回の反映は1つの作業単位（トランザクション）で行い、失敗した場合は1件ずつ反映し直す
+    - 1件ずつの反映に失敗した書き込みはバックオフを挟んで max_retries 回まで再試行し、
+      それでも失敗したものはデッドレター（get_dead_letters()）に残して dropped で数える
+    - 読み込みは未反映の書き込みを結果に重ねて返し、重ねられない場合だけ反映してから読む
+    - 戻り値が必要な書き込み・作業単位の前には、未反映の書き込みを反映する
+    - close()（またはプロセス終了時）に残りを反映する
+
+    キューに積んだ書き込みは反映前に受け付けたものとして True を返す。
+    update_todo_state / delete_todo をキューに積むのは、読み込み結果に含まれていたか
+    このインスタンスで追加したTodoだけで、それ以外は反映してから直接書き込み、結果をそのまま返す。
+    別のプロセスが削除したTodoへの書き込みは、反映時に missing で数える。
+    """
+
+    def __init__(self, repository: TodoRepository, batch_size: int = 500, flush_interval: float = 0.2,
+                 max_pending: int = 10000, timeout: float = 30.0, max_retries: int = 3,
+                 retry_backoff: float = 0.1, max_dead_letters: int = 1000):
+        """
+        ライトビハインドの初期化（バックグラウンドのスレッドを開始する）
+
+        Args:
+            repository: 書き込みを反映するリポジトリ
+            batch_size: この件数たまったら反映する（1回に反映する最大件数）
+            flush_interval: 最も古い書き込みからこの秒数経ったら反映する
+            max_pending: キューに積める最大件数
+            timeout: キューが空くのを待つ最大秒数
+            max_retries: 1件ずつの反映に失敗した場合の再試行回数
+            retry_backoff: 最初の再試行までの秒数（再試行ごとに2倍にする）
+            max_dead_letters: 保持するデッドレターの最大件数（超えたら古いものから捨てる）
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be >= 1")
+        if max_pending < batch_size:
+            raise ValueError("max_pending must be >= batch_size")
+
+        self.wrapped = repository
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self._cond = threading.Condition()
+        self._pending: Deque[Operation] = deque()
+        # 反映中は読み込みを待たせ、読み込みが未反映の書き込みと反映済みの行を二重に数えないようにする
+        self._gate = ReadWriteLock()
+        # 存在を確認できたTodoのID（読み込み結果に含まれていたID・キューの中の仮ID）
+        self._known_ids: Set[int] = set()
+        # 仮ID → 反映後のID（反映前に読み込んだ仮IDへの書き込みを読み替える、max_pending 件まで保持）
+        self._provisional_ids = itertools.count(-1, -1)
+        self._resolved: "OrderedDict[int, int]" = OrderedDict()
+        # 積んだ操作・取り出した操作・反映が終わった操作の通し番号
+        self._enqueued = 0
+        self._taken = 0
+        self._flushed = 0
+        # この番号までの操作は待たずに反映する（flush() の要求）
+        self._flush_upto = 0
+        self._closed = False
+        # 作業単位の中では、キューを通さずに直接書き込む
+        self._local = threading.local()
+        # 再試行しても反映できなかった書き込み
+        self._dead_letters: Deque[Dict[str, Any]] = deque(maxlen=max_dead_letters)
+        self._metrics: Dict[str, float] = {
+            'enqueued': 0,
+            'flushes': 0,
+            'flushed': 0,
+            'fallbacks': 0,
+            'retries': 0,
+            'missing': 0,
+            'dropped': 0,
+            'waits': 0,
+            'wait_seconds': 0.0,
+            'timeouts': 0,
+            'merged_reads': 0,
+            'flushing_reads': 0,
+        }
+        self._thread = threading.Thread(target=self._run, name='todo-write-behind', daemon=True)
+        self._thread.start()
+        _live_buffers.add(self)
+
+    def __getattr__(self, name: str) -> Any:
+        # get_pool_stats や add_query_listener などは包んだリポジトリに委譲する
+        if name == 'wrapped':
+            raise AttributeError(name)
+        return getattr(self.wrapped, name)
+
+    # --- キュー ---
+
+    def _write(self, method: str, *args: Any) -> bool:
+        """追加の書き込みをキューに積む（作業単位の中やクローズ後は直接書き込む）"""
+        if not getattr(self._local, 'direct', False):
+            with self._cond:
+                ref = next(self._provisional_ids) if method == 'add_todo' else None
+                queued = self._enqueue_locked(method, args, ref)
+                if queued and ref is not None:
+                    self._known_ids.add(ref)
+            if queued is not None:
+                return queued
+            self.flush()
+        return getattr(self.wrapped, method)(*args)
+
+    def _write_existing(self, method: str, todo_id: int, *args: Any) -> bool:
+        """
+        既存のTodoへの書き込みをキューに積む
+
+        存在を確認できたTodo（読み込み結果に含まれていたID・キューの中の仮ID）だけを積み、
+        それ以外は未反映の書き込みを反映してから直接書き込む（存在しないIDには False を返す）。
+        """
+        with self._cond:
+            todo_id = self._resolved.get(todo_id, todo_id)
+            if not getattr(self._local, 'direct', False) and todo_id in self._known_ids:
+                queued = self._enqueue_locked(method, (todo_id,) + args, None)
+                if queued and method == 'delete_todo':
+                    self._known_ids.discard(todo_id)
+                if queued is not None:
+                    return queued
+        if todo_id < 0:
+            # 削除済み・反映に失敗した仮ID
+            return False
+        if not getattr(self._local, 'direct', False):
+            self.flush()
+        result = getattr(self.wrapped, method)(todo_id, *args)
+        with self._cond:
+            if result and method == 'update_todo_state':
+                self._known_ids.add(todo_id)
+            else:
+                self._known_ids.discard(todo_id)
+        return result
+
+    def _enqueue_locked(self, method: str, args: Tuple[Any, ...], ref: Optional[int]) -> Optional[bool]:
+        """
+        キューに空きができるまで待って積む（ロック保持中に呼び出す）
+
+        Returns:
+            積んだ場合 True、待ちがタイムアウトした場合 False、クローズ済みの場合 None
+        """
+        if len(self._pending) >= self.max_pending and not self._closed:
+            deadline = time.monotonic() + self.timeout
+            wait_started = time.monotonic()
+            self._metrics['waits'] += 1
+            while len(self._pending) >= self.max_pending and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._metrics['timeouts'] += 1
+                    print(f"書き込みキュー待機エラー: {self.timeout}秒以内に空きができませんでした")
+                    return False
+                self._cond.wait(remaining)
+            self._metrics['wait_seconds'] += time.monotonic() - wait_started
+        if self._closed:
+            return None
+
+        self._pending.append((method, args, time.monotonic(), ref))
+        self._enqueued += 1
+        self._metrics['enqueued'] += 1
+        self._cond.notify_all()
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        ここまでに積んだ書き込みの反映を待つ
+
+        Args:
+            timeout: 待つ最大秒数（Noneの場合は反映が終わるまで待つ）
+
+        Returns:
+            bool: 全て反映された場合 True
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            target = self._enqueued
+            if self._flushed >= target:
+                return True
+            self._flush_upto = max(self._flush_upto, target)
+            self._cond.notify_all()
+            while self._flushed < target:
+                if not self._thread.is_alive():
+                    return False
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                # スレッドの異常終了に備えて一定間隔で確認する
+                self._cond.wait(1.0 if remaining is None else min(remaining, 1.0))
+            return True
+
+    def _run(self) -> None:
+        """バックグラウンドのスレッド：しきい値に達したらキューを反映する"""
+        while True:
+            with self._cond:
+                while not self._should_flush_locked():
+                    if self._closed and not self._pending:
+                        return
+                    if self._pending:
+                        age = time.monotonic() - self._pending[0][2]
+                        self._cond.wait(max(self.flush_interval - age, 0.001))
+                    else:
+                        self._cond.wait()
+
+            # 取り出してから反映が終わるまでは、キューにも反映済みの行にも無い状態になるため読み込みを待たせる
+            with self._gate.write():
+                with self._cond:
+                    operations = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                    self._taken += len(operations)
+                    # キューに空きができたので、待っている書き込み側を起こす
+                    self._cond.notify_all()
+
+                self._apply(operations)
+
+                with self._cond:
+                    self._flushed += len(operations)
+                    self._metrics['flushes'] += 1
+                    self._metrics['flushed'] += len(operations)
+                    self._cond.notify_all()
+
+    def _should_flush_locked(self) -> bool:
+        """キューを反映するか（ロック保持中に呼び出す）"""
+        if not self._pending:
+            return False
+        return (self._closed
+                or self._taken < self._flush_upto
+                or len(self._pending) >= self.batch_size
+                or time.monotonic() - self._pending[0][2] >= self.flush_interval)
+
+    def _apply(self, operations: List[Operation]) -> None:
+        """操作を1つの作業単位で反映（失敗した場合は1件ずつ反映し直す）"""
+        try:
+            # 追加したTodoのIDは作業単位が確定してから公開する（ロールバックしたIDで書き込みを受け付けない）
+            added: Dict[int, int] = {}
+            with self.wrapped.unit_of_work():
+                missing = sum(self._apply_group(method, group, added) for method, group in self._group(operations))
+        except Exception as e:
+            print(f"書き込みキュー反映エラー: {e}")
+            with self._cond:
+                self._metrics['fallbacks'] += 1
+            # 失敗した操作だけを取り除くため、1件ずつ個別に反映する
+            for operation in operations:
+                self._apply_one(operation)
+            return
+        for ref, todo_id in added.items():
+            self._resolve_added(ref, todo_id)
+        if missing:
+            self._count_missing(missing)
+
+    def _resolve(self, todo_id: int, added: Optional[Dict[int, int]] = None) -> Optional[int]:
+        """仮IDを反映後のIDに読み替える（added は反映中の作業単位で追加したID、反映できていない仮IDは None）"""
+        if todo_id >= 0:
+            return todo_id
+        if added and todo_id in added:
+            return added[todo_id]
+        with self._cond:
+            return self._resolved.get(todo_id)
+
+    def _resolve_added(self, ref: int, todo_id: int) -> None:
+        """追加したTodoの仮IDと反映後のIDを対応付ける"""
+        with self._cond:
+            self._resolved[ref] = todo_id
+            self._resolved.move_to_end(ref)
+            while len(self._resolved) > self.max_pending:
+                self._resolved.popitem(last=False)
+            # 反映前に削除されていなければ、反映後のIDで書き込みを受け付ける
+            if ref in self._known_ids:
+                self._known_ids.discard(ref)
+                self._known_ids.add(todo_id)
+
+    def _count_missing(self, count: int = 1) -> None:
+        """対象のTodoが無かった書き込みを数える"""
+        with self._cond:
+            self._metrics['missing'] += count
+
+    def _apply_one(self, operation: Operation) -> None:
+        """操作を1件反映（失敗したらバックオフして再試行し、それでも失敗したらデッドレターに残す）"""
+        method, args, _, ref = operation
+        if method in ('update_todo_state', 'delete_todo'):
+            todo_id = self._resolve(args[0])
+            if todo_id is None:
+                # 追加を反映できなかった仮IDへの書き込み
+                self._count_missing()
+                return
+            args = (todo_id,) + args[1:]
+
+        error = ""
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                with self._cond:
+                    self._metrics['retries'] += 1
+                time.sleep(self.retry_backoff * 2 ** (attempt - 1))
+            try:
+                # エラーを False にして返すメソッドもあるため、作業単位の失敗（例外）として受け取る
+                with self.wrapped.unit_of_work():
+                    if method == 'add_todo':
+                        # 仮IDを読み替えるため、追加したIDを返す一括追加で1件追加する
+                        title, category_ids = args
+                        added = self.wrapped.bulk_add_todos([{'title': title, 'category_ids': category_ids}])
+                        result = len(added) == 1
+                    else:
+                        result = getattr(self.wrapped, method)(*args)
+            except Exception as e:
+                print(f"書き込みキュー反映エラー: {method}: {e}")
+                error = str(e)
+                continue
+            if result:
+                if method == 'add_todo':
+                    self._resolve_added(ref, added[0])
+                return
+            if method in ('update_todo_state', 'delete_todo'):
+                # エラー無しで False の場合は対象のTodoが存在しない（再試行しても結果は変わらない）
+                self._count_missing()
+                with self._cond:
+                    self._known_ids.discard(args[0])
+                return
+            error = f"{method} returned False"
+            break
+
+        print(f"書き込みキュー反映エラー: {method} を反映できなかったため破棄しました")
+        with self._cond:
+            if ref is not None:
+                self._known_ids.discard(ref)
+            self._metrics['dropped'] += 1
+            self._dead_letters.append({
+                'method': method,
+                'args': list(args),
+                'error': error,
+                'failed_at': time.time(),
+            })
+
+    def get_dead_letters(self) -> List[Dict[str, Any]]:
+        """再試行しても反映できなかった書き込みの一覧（古い順）"""
+        with self._cond:
+            return list(self._dead_letters)
+
+    @staticmethod
+    def _group(operations: List[Operation]) -> Iterator[Tuple[str, List[Operation]]]:
+        """連続する同じ種類の操作（状態の更新は同じ状態ごと）をまとめる"""
+        def key(operation: Operation) -> Tuple[str, Any]:
+            method, args, _, _ = operation
+            return method, args[1] if method == 'update_todo_state' else None
+
+        for (method, _), group in itertools.groupby(operations, key=key):
+            yield method, list(group)
+
+    def _apply_group(self, method: str, operations: List[Operation], added: Dict[int, int]) -> int:
+        """同じ種類の操作を一括操作で反映し、対象のTodoが無かった件数を返す"""
+        if method == 'add_todo':
+            todo_ids = self.wrapped.bulk_add_todos(
+                ({'title': title, 'category_ids': category_ids} for _, (title, category_ids), _, _ in operations),
+                batch_size=self.batch_size
+            )
+            if len(todo_ids) != len(operations):
+                # 仮IDを対応付けられないため、作業単位ごとロールバックして1件ずつ反映し直す
+                raise RuntimeError(f"一括追加の件数が一致しません: {len(todo_ids)}/{len(operations)}")
+            added.update((ref, todo_id) for (_, _, _, ref), todo_id in zip(operations, todo_ids))
+            return 0
+        if method == 'add_category':
+            self.wrapped.bulk_add_categories((title for _, (title,), _, _ in operations),
+                                             batch_size=self.batch_size)
+            return 0
+
+        # 仮IDは同じ反映の中で先に追加したTodoのIDに読み替える
+        todo_ids = [self._resolve(args[0], added) for _, args, _, _ in operations]
+        found = [todo_id for todo_id in todo_ids if todo_id is not None]
+        if method == 'update_todo_state':
+            self.wrapped.bulk_update_state(found, operations[0][1][1])
+        else:
+            self.wrapped.bulk_delete(found)
+        return len(todo_ids) - len(found)
+
+    def get_write_behind_stats(self) -> Dict[str, Any]:
+        """キューのメトリクスを取得"""
+        with self._cond:
+            stats: Dict[str, Any] = {
+                'pending': len(self._pending),
+                'in_flight': self._taken - self._flushed,
+                'batch_size': self.batch_size,
+                'max_pending': self.max_pending,
+                'flush_interval': self.flush_interval,
+                'closed': self._closed,
+                'dead_letters': len(self._dead_letters),
+            }
+            stats.update({
+                key: (round(value, 6) if isinstance(value, float) else int(value))
+                for key, value in self._metrics.items()
+            })
+            return stats
+
+    def close(self) -> None:
+        """残りの書き込みを反映してスレッドを止め、包んだリポジトリもクローズ"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        _live_buffers.discard(self)
+        close = getattr(self.wrapped, 'close', None)
+        if close is not None:
+            close()
+
+    @contextmanager
+    def unit_of_work(self) -> Iterator[None]:
+        """未反映の書き込みを反映してから、包んだリポジトリの作業単位を開始（中の書き込みは直接行う）"""
+        self.flush()
+        outer = getattr(self._local, 'direct', False)
+        self._local.direct = True
+        try:
+            with self.wrapped.unit_of_work():
+                yield
+        finally:
+            self._local.direct = outer
+
+    # --- 書き込み（キューに積む） ---
+
+    def add_todo(self, title: str, category_ids: Optional[List[int]] = None) -> bool:
+        """新しいTodoをキューに積む"""
+        if not title.strip():
+            return False
+        return self._write('add_todo', title, list(category_ids or []))
+
+    def add_category(self, title: str) -> bool:
+        """新しいカテゴリをキューに積む"""
+        if not title.strip():
+            return False
+        return self._write('add_category', title)
+
+    def update_todo_state(self, todo_id: int, new_state: str) -> bool:
+        """Todoの状態の更新をキューに積む（存在を確認できないIDは直接更新する）"""
+        return self._write_existing('update_todo_state', todo_id, new_state)
+
+    def delete_todo(self, todo_id: int) -> bool:
+        """Todoの削除をキューに積む（存在を確認できないIDは直接削除する）"""
+        return self._write_existing('delete_todo', todo_id)
+
+    # --- 戻り値が必要な書き込み（反映してから直接行う） ---
+
+    def _resolve_all(self, todo_ids: Iterable[int]) -> List[int]:
+        """仮IDを反映後のIDに読み替える（反映できなかった仮IDは除く）"""
+        resolved = (self._resolve(todo_id) for todo_id in todo_ids)
+        return [todo_id for todo_id in resolved if todo_id is not None]
+
+    def _forget(self, todo_ids: Optional[Iterable[int]] = None) -> None:
+        """削除したTodoのIDを存在を確認できたIDから外す（Noneの場合はキューの中の仮ID以外を全て外す）"""
+        with self._cond:
+            if todo_ids is None:
+                self._known_ids = {todo_id for todo_id in self._known_ids if todo_id < 0}
+            else:
+                self._known_ids.difference_update(todo_ids)
+
+    def bulk_add_todos(self, todos: Iterable[Dict[str, Any]], batch_size: int = 1000) -> List[int]:
+        """Todoを一括追加"""
+        self.flush()
+        return self.wrapped.bulk_add_todos(todos, batch_size)
+
+    def bulk_add_categories(self, titles: Iterable[str], batch_size: int = 1000) -> List[int]:
+        """カテゴリを一括追加"""
+        self.flush()
+        return self.wrapped.bulk_add_categories(titles, batch_size)
+
+    def bulk_update_state(self, todo_ids: Iterable[int], new_state: str) -> int:
+        """複数Todoの状態を更新"""
+        self.flush()
+        return self.wrapped.bulk_update_state(self._resolve_all(todo_ids), new_state)
+
+    def bulk_delete(self, todo_ids: Iterable[int]) -> int:
+        """複数Todoを削除"""
+        self.flush()
+        todo_ids = self._resolve_all(todo_ids)
+        self._forget(todo_ids)
+        return self.wrapped.bulk_delete(todo_ids)
+
+    def update_state_where(self, new_state: str, filter_state: str = "all",
+                           filter_category: Optional[int] = None) -> int:
+        """条件に合うTodoの状態を更新"""
+        self.flush()
+        return self.wrapped.update_state_where(new_state, filter_state, filter_category)
+
+    def delete_where(self, filter_state: str = "all", filter_category: Optional[int] = None) -> int:
+        """条件に合うTodoを削除"""
+        self.flush()
+        self._forget()
+        return self.wrapped.delete_where(filter_state, filter_category)
+
+    def initialize_schema(self) -> List[int]:
+        """未適用のスキーマ移行を適用"""
+        return self.wrapped.initialize_schema()
+
+    # --- 読み込み（未反映の書き込みを重ねて読む） ---
+
+    def _read(self, read: Callable[[], Any],
+              merge: Optional[Callable[[Any, PendingWrites], Any]] = None,
+              can_merge: Callable[[PendingWrites], bool] = lambda pending: True) -> Any:
+        """
+        未反映の書き込みを重ねて読み込む
+
+        Args:
+            read: 包んだリポジトリからの読み込み
+            merge: 読み込み結果に未反映の書き込みを重ねる関数（Noneの場合は重ねない）
+            can_merge: 未反映の書き込みを重ねて正しい結果になるか（False の場合は反映してから読む）
+        """
+        if getattr(self._local, 'direct', False):
+            # 作業単位の中は反映済みの状態に直接書き込んでいる
+            return read()
+
+        with self._gate.read():
+            with self._cond:
+                pending = PendingWrites(self._pending, self._resolved) if self._pending else None
+            if pending is None or can_merge(pending):
+                result = read()
+                if pending is not None:
+                    with self._cond:
+                        self._metrics['merged_reads'] += 1
+                    if merge is not None:
+                        result = merge(result, pending)
+                return result
+
+        with self._cond:
+            self._metrics['flushing_reads'] += 1
+        self.flush()
+        return read()
+
+    def _remember(self, todos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """読み込んだTodoのIDを存在を確認できたIDとして覚える"""
+        with self._cond:
+            self._known_ids.update(todo['id'] for todo in todos if todo['id'] >= 0)
+        return todos
+
+    def get_todo_categories(self, todo_id: int) -> List[Dict[str, Any]]:
+        """指定されたTodoのカテゴリを取得"""
+        return self.get_categories_for_todos([todo_id])[todo_id]
+
+    def get_categories_for_todos(self, todo_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        """複数TodoのカテゴリをTodoIDごとにまとめて取得（未反映のTodoは積んだカテゴリIDから求める）"""
+        def read() -> Dict[int, List[Dict[str, Any]]]:
+            resolved = {todo_id: self._resolve(todo_id) for todo_id in todo_ids}
+            existing = {todo_id: real_id for todo_id, real_id in resolved.items() if real_id is not None}
+            if not existing:
+                return {}
+            categories = self.wrapped.get_categories_for_todos(list(dict.fromkeys(existing.values())))
+            return {todo_id: categories.get(real_id, []) for todo_id, real_id in existing.items()}
+
+        def merge(result: Dict[int, List[Dict[str, Any]]],
+                  pending: PendingWrites) -> Dict[int, List[Dict[str, Any]]]:
+            todos = [pending.added[todo_id] for todo_id in todo_ids
+                     if todo_id not in result and todo_id in pending.added]
+            merged = {todo['id']: todo['categories']
+                      for todo in pending.with_categories(todos, self.wrapped.get_all_categories)}
+            return {**merged, **result}
+
+        result = self._read(read, merge)
+        return {todo_id: result.get(todo_id, []) for todo_id in todo_ids}
+
+    def _merged_list(self, read: Callable[[], List[Dict[str, Any]]],
+                     filter_state: str = "all") -> List[Dict[str, Any]]:
+        """並び順が実装ごとに異なる一覧の読み込み（未反映の追加がある場合は反映してから読む）"""
+        return self._remember(self._read(
+            read,
+            lambda todos, pending: pending.apply(todos, filter_state),
+            lambda pending: not pending.added and pending.can_filter(filter_state),
+        ))
+
+    def get_filtered_todos(self, filter_state: str = "all",
+                           filter_category: Optional[int] = None) -> List[Dict[str, Any]]:
+        """フィルター条件に基づいてTodoを取得"""
+        return self._merged_list(lambda: self.wrapped.get_filtered_todos(filter_state, filter_category),
+                                 filter_state)
+
+    def get_filtered_todos_with_categories(self, filter_state: str = "all",
+                                           filter_category: Optional[int] = None) -> List[Dict[str, Any]]:
+        """フィルター条件に基づいてTodoをカテゴリ付きで取得"""
+        return self._merged_list(
+            lambda: self.wrapped.get_filtered_todos_with_categories(filter_state, filter_category),
+            filter_state
+        )
+
+    def get_todos_page(self, filter_state: str = "all", filter_category: Optional[int] = None,
+                       limit: int = 50, cursor: Optional[str] = None,
+                       with_categories: bool = False) -> Dict[str, Any]:
+        """Todoを1ページ分取得（未反映の追加は最も新しいTodoとして最初のページに含める）"""
+        def added(pending: PendingWrites) -> List[Dict[str, Any]]:
+            return pending.added_todos(filter_state, filter_category) if cursor is None else []
+
+        def merge(page: Dict[str, Any], pending: PendingWrites) -> Dict[str, Any]:
+            new_todos = added(pending)
+            if with_categories:
+                new_todos = pending.with_categories(new_todos, self.wrapped.get_all_categories)
+            todos = pending.apply(page['items'], filter_state)
+            # 未反映の追加の分だけ押し出された行は、次のページの先頭になる
+            existing = todos[:limit - len(new_todos)]
+            next_cursor = page['next_cursor']
+            if len(existing) < len(todos):
+                next_cursor = encode_page_cursor(existing[-1]['created_at'], existing[-1]['id'])
+            return {'items': new_todos + existing, 'next_cursor': next_cursor}
+
+        page = self._read(
+            lambda: self.wrapped.get_todos_page(filter_state, filter_category, limit, cursor, with_categories),
+            merge,
+            # 次のページのカーソルには反映済みの行が必要
+            lambda pending: pending.can_filter(filter_state) and len(added(pending)) < limit,
+        )
+        self._remember(page['items'])
+        return page
+
+    def iter_todos(self, filter_state: str = "all", filter_category: Optional[int] = None,
+                   batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Todoを batch_size 件ずつ読み込みながら順に返す（読み込みが長く続くため、反映してから読む）"""
+        self.flush()
+        return self.wrapped.iter_todos(filter_state, filter_category, batch_size)
+
+    def search_todos(self, query: str, filter_state: str = "all", filter_category: Optional[int] = None,
+                     limit: int = 50, with_categories: bool = False) -> List[Dict[str, Any]]:
+        """タイトルでTodoを検索（未反映の追加は最も新しいTodoとして先頭に含める）"""
+        def merge(todos: List[Dict[str, Any]], pending: PendingWrites) -> List[Dict[str, Any]]:
+            new_todos = pending.added_todos(filter_state, filter_category, query) if split_search_terms(query) else []
+            if with_categories:
+                new_todos = pending.with_categories(new_todos, self.wrapped.get_all_categories)
+            return (new_todos + pending.apply(todos, filter_state))[:limit]
+
+        return self._remember(self._read(
+            lambda: self.wrapped.search_todos(query, filter_state, filter_category, limit, with_categories),
+            merge,
+            lambda pending: pending.can_filter(filter_state),
+        ))
+
+    def get_statistics(self) -> Dict[str, int]:
+        """統計情報を取得（未反映の追加を件数に加える）"""
+        def merge(statistics: Dict[str, int], pending: PendingWrites) -> Dict[str, int]:
+            done = sum(todo['state'] == 'done' for todo in pending.added.values())
+            total = statistics['total'] + len(pending.added)
+            return {'total': total, 'todo': total - statistics['done'] - done, 'done': statistics['done'] + done}
+
+        # 既存のTodoの状態変更・削除は変更前の状態が分からないため、反映してから数える
+        return self._read(self.wrapped.get_statistics, merge, lambda pending: not pending.changes_existing())
+
+    def get_category_statistics(self) -> List[Dict[str, Any]]:
+        """カテゴリごとの統計情報を取得（未反映の追加を件数に加える）"""
+        def merge(statistics: List[Dict[str, Any]], pending: PendingWrites) -> List[Dict[str, Any]]:
+            merged = []
+            for row in statistics:
+                added = [todo for todo in pending.added.values()
+                         if row['id'] in pending.added_categories[todo['id']]]
+                done = sum(todo['state'] == 'done' for todo in added)
+                merged.append({**row, 'total': row['total'] + len(added),
+                               'todo': row['todo'] + len(added) - done, 'done': row['done'] + done})
+            return merged
+
+        return self._read(self.wrapped.get_category_statistics, merge,
+                          lambda pending: not pending.changes_existing() and not pending.categories)
+
+    def get_all_todos(self) -> List[Dict[str, Any]]:
+        """全てのTodoを取得"""
+        return self._merged_list(self.wrapped.get_all_todos)
+
+    def get_all_categories(self) -> List[Dict[str, Any]]:
+        """全てのカテゴリを取得（未反映のカテゴリの追加がある場合だけ反映してから読む）"""
+        return self._read(self.wrapped.get_all_categories, can_merge=lambda pending: not pending.categories)
@@ -0,0 +1,176 @@
+import asyncio
+import unittest
+import os
+import sys
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import tempfile
+from unittest.mock import patch
+
+from async_repository import (
+    AsyncMemoryTodoRepository, AsyncThreadedTodoRepository, AsyncTodoRepositoryFactory, to_asyncpg_query
+)
+from async_service import AsyncTodoService
+from sqlite_repository import SqliteTodoRepository
+
+
+class TestAsyncMemoryTodoRepository(unittest.TestCase):
+    """AsyncMemoryTodoRepositoryのテストクラス"""
+
+    def setUp(self):
+        """テスト前の準備"""
+        self.service = AsyncTodoService(AsyncMemoryTodoRepository())
+
+    def run_async(self, coroutine):
+        """コルーチンを実行"""
+        return asyncio.run(coroutine)
+
+    def test_add_and_filter(self):
+        """Todo追加とフィルターのテスト"""
+        async def scenario():
+            await self.service.add_category("カテゴリ1")
+            await self.service.add_todo("Todo1", [1])
+            await self.service.add_todo("Todo2")
+            await self.service.update_todo_state(2, "done")
+            return (
+                await self.service.get_filtered_todos_with_categories("all", 1),
+                await self.service.get_statistics(),
+            )
+
+        todos, stats = self.run_async(scenario())
+        self.assertEqual([todo['title'] for todo in todos], ["Todo1"])
+        self.assertEqual(todos[0]['categories'][0]['title'], "カテゴリ1")
+        self.assertEqual(stats, {'total': 2, 'todo': 1, 'done': 1})
+
+    def test_bulk_add_and_iter(self):
+        """一括追加とストリーミング取得のテスト"""
+        async def scenario():
+            todo_ids = await self.service.bulk_add_todos({'title': f"Todo{i}"} for i in range(5))
+            streamed = [todo['id'] async for todo in self.service.iter_todos(batch_size=2)]
+            return todo_ids, streamed
+
+        todo_ids, streamed = self.run_async(scenario())
+        self.assertEqual(todo_ids, [1, 2, 3, 4, 5])
+        self.assertEqual(streamed, [5, 4, 3, 2, 1])
+
+    def test_search_todos(self):
+        """タイトル検索のテスト"""
+        async def scenario():
+            await self.service.bulk_add_todos([{'title': "牛乳を買う"}, {'title': "会議の準備"}])
+            return await self.service.search_todos("牛乳")
+
+        self.assertEqual([todo['title'] for todo in self.run_async(scenario())], ["牛乳を買う"])
+
+    def test_bulk_operations(self):
+        """一括更新・削除のテスト"""
+        async def scenario():
+            await self.service.bulk_add_todos([{'title': f"Todo{i}"} for i in range(4)])
+            updated = await self.service.bulk_update_state([1, 2], "done")
+            deleted = await self.service.delete_where("done")
+            return updated, deleted, await self.service.get_statistics()
+
+        self.assertEqual(self.run_async(scenario()), (2, 2, {'total': 2, 'todo': 2, 'done': 0}))
+
+    def test_concurrent_requests(self):
+        """並行リクエストで件数が失われないテスト"""
+        async def scenario():
+            await asyncio.gather(*(self.service.add_todo(f"Todo{i}") for i in range(50)))
+            return await self.service.get_statistics()
+
+        self.assertEqual(self.run_async(scenario())['total'], 50)
+
+
+class TestAsyncThreadedTodoRepository(unittest.TestCase):
+    """AsyncThreadedTodoRepository（SQLite）のテストクラス"""
+
+    def setUp(self):
+        """テスト前の準備"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.repository = AsyncThreadedTodoRepository(
+            SqliteTodoRepository(os.path.join(self.temp_dir.name, "todos.db"))
+        )
+        self.service = AsyncTodoService(self.repository)
+
+    def tearDown(self):
+        """テスト後の後片付け"""
+        asyncio.run(self.service.close())
+        self.temp_dir.cleanup()
+
+    def test_add_filter_and_iter(self):
+        """Todo追加・フィルター・ストリーミング取得のテスト"""
+        async def scenario():
+            await self.service.initialize_schema()
+            await self.service.add_category("カテゴリ1")
+            await asyncio.gather(*(self.service.add_todo(f"Todo{i}", [1]) for i in range(5)))
+            await self.service.update_todo_state(1, "done")
+            return (
+                await self.service.get_filtered_todos_with_categories("todo", 1),
+                sorted([todo['id'] async for todo in self.service.iter_todos(batch_size=2)]),
+                await self.service.get_statistics(),
+            )
+
+        todos, streamed, stats = asyncio.run(scenario())
+        self.assertEqual(len(todos), 4)
+        self.assertEqual(todos[0]['categories'][0]['title'], "カテゴリ1")
+        self.assertEqual(streamed, [1, 2, 3, 4, 5])
+        self.assertEqual(stats, {'total': 5, 'todo': 4, 'done': 1})
+
+
+class TestAsyncTodoRepositoryFactory(unittest.TestCase):
+    """AsyncTodoRepositoryFactoryのテストクラス"""
+
+    def test_sqlite(self):
+        """SQLITEではSQLiteリポジトリをスレッド経由で包むテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "todos.db")
+            with patch.dict(os.environ, {'DATABASE_TYPE': 'sqlite', 'SQLITE_DATABASE_PATH': path}):
+                repository = AsyncTodoRepositoryFactory.create_repository()
+            self.assertIsInstance(repository, AsyncThreadedTodoRepository)
+            self.assertIsInstance(repository.repository, SqliteTodoRepository)
+            self.assertEqual(repository.repository.path, path)
+            asyncio.run(repository.close())
+
+    def test_memory(self):
+        """MEMORYではメモリリポジトリを返すテスト"""
+        with patch.dict(os.environ, {'DATABASE_TYPE': 'MEMORY'}):
+            self.assertIsInstance(AsyncTodoRepositoryFactory.create_repository(), AsyncMemoryTodoRepository)
+
+    def test_memory_with_data_dir(self):
+        """MEMORY_DATA_DIRを指定すると永続化付きメモリリポジトリになり、再起動後も残るテスト"""
+        from memory_persistence import DurableMemoryTodoRepository
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with patch.dict(os.environ, {'DATABASE_TYPE': 'MEMORY', 'MEMORY_DATA_DIR': temp_dir}):
+                repository = AsyncTodoRepositoryFactory.create_repository()
+                self.assertIsInstance(repository, AsyncThreadedTodoRepository)
+                self.assertIsInstance(repository.repository, DurableMemoryTodoRepository)
+                asyncio.run(repository.add_todo("永続化されるTodo"))
+                asyncio.run(repository.close())
+
+                reopened = AsyncTodoRepositoryFactory.create_repository()
+                todos = asyncio.run(reopened.get_all_todos())
+                asyncio.run(reopened.close())
+            self.assertEqual([todo['title'] for todo in todos], ["永続化されるTodo"])
+
+    def test_unsupported_type(self):
+        """未対応のDATABASE_TYPEではエラーになるテスト"""
+        with patch.dict(os.environ, {'DATABASE_TYPE': 'MYSQL'}):
+            with self.assertRaises(ValueError):
+                AsyncTodoRepositoryFactory.create_repository()
+
+
+class TestAsyncPostgresQuery(unittest.TestCase):
+    """asyncpg用クエリ変換のテストクラス"""
+
+    def test_to_asyncpg_query(self):
+        """プレースホルダ変換のテスト"""
+        query = "SELECT * FROM todos WHERE state = %s AND (created_at, id) < (%s::timestamp, %s)"
+        self.assertEqual(
+            to_asyncpg_query(query),
+            "SELECT * FROM todos WHERE state = $1 AND (created_at, id) < ($2::timestamp, $3)"
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import os
+import sys
+
+# benchmarksディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from run_benchmarks import (
+    compare_with_baseline, generate_dataset, missing_repository_cases, repository_cases, run_backend
+)
+
+
+class TestBenchmarks(unittest.TestCase):
+    """ベンチマークハーネスのテストクラス"""
+
+    def test_generate_dataset_is_deterministic(self):
+        """同じ引数なら同じデータセットが生成されるテスト"""
+        dataset = generate_dataset(100, 5, 2, done_ratio=0.5, seed=1)
+
+        self.assertEqual(dataset, generate_dataset(100, 5, 2, done_ratio=0.5, seed=1))
+        self.assertEqual(len(dataset['todos']), 100)
+        self.assertEqual(len(dataset['done']), 50)
+        self.assertTrue(all(len(todo['category_indexes']) <= 2 for todo in dataset['todos']))
+
+    def test_every_repository_method_is_covered(self):
+        """TodoRepository の全メソッドに計測ケースがあるテスト"""
+        context = {'repository': None, 'rng': None, 'todo_ids': [], 'category_ids': [], 'reserved_ids': [],
+                   'reserved_batches': [], 'reserved_category_ids': []}
+
+        self.assertEqual(missing_repository_cases(repository_cases(context)), [])
+
+    def test_run_memory_backend(self):
+        """メモリバックエンドで全ケースを計測できるテスト"""
+        results = run_backend('memory', generate_dataset(200, 5, 2), repeat=3, warmup=1, seed=1)
+
+        self.assertIn('memory.get_todos_page', results)
+        self.assertIn('memory.service.get_statistics', results)
+        self.assertTrue(all(result['runs'] >= 1 for result in results.values()))
+
+    def test_run_durable_memory_backend(self):
+        """永続化付きのメモリバックエンドで全ケースを計測できるテスト"""
+        results = run_backend('durable_memory', generate_dataset(200, 5, 2), repeat=3, warmup=1, seed=1)
+
+        self.assertIn('durable_memory.bulk_update_state', results)
+        self.assertIn('durable_memory.write_behind.add_todo_and_flush', results)
+
+    def test_run_sqlite_backend(self):
+        """SQLiteバックエンドで全ケースを計測できるテスト"""
+        results = run_backend('sqlite', generate_dataset(200, 5, 2), repeat=3, warmup=1, seed=1)
+
+        self.assertIn('sqlite.bulk_delete', results)
+        self.assertIn('sqlite.write_behind.add_todo_and_flush', results)
+
+    def test_compare_with_baseline(self):
+        """しきい値と計測誤差を考慮して回帰を検出するテスト"""
+        baseline = {'a': {'median_ms': 1.0}, 'b': {'median_ms': 1.0}, 'c': {'median_ms': 0.01}}
+        results = {
+            'a': {'median_ms': 1.5},   # 50%悪化 -> 回帰
+            'b': {'median_ms': 1.1},   # しきい値内
+            'c': {'median_ms': 0.03},  # 増加率は大きいが誤差の範囲
+            'd': {'median_ms': 9.0},   # ベースラインに無い
+        }
+
+        regressions = compare_with_baseline(results, baseline, threshold=0.25, min_delta_ms=0.05)
+
+        self.assertEqual([regression['name'] for regression in regressions], ['a'])
+
+
+if __name__ == '__main__':
+    unittest.main()
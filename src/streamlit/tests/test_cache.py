@@ -0,0 +1,108 @@
+import unittest
+import os
+import sys
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from cache import TTLCache, NullCache
+
+
+class FakeClock:
+    """テスト用の時計"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache(unittest.TestCase):
+    """TTLCacheのテストクラス"""
+
+    def setUp(self):
+        """テスト前の準備"""
+        self.clock = FakeClock()
+        self.cache = TTLCache(maxsize=2, ttl=10, clock=self.clock)
+        self.loads = 0
+
+    def load(self, value):
+        """読み込み回数を数えるローダー"""
+        def loader():
+            self.loads += 1
+            return value
+        return loader
+
+    def test_hit_and_miss(self):
+        """ヒット・ミスのテスト"""
+        self.assertEqual(self.cache.get_or_load('a', ['t'], self.load([1])), [1])
+        self.assertEqual(self.cache.get_or_load('a', ['t'], self.load([2])), [1])
+
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(self.loads, 1)
+
+    def test_returns_copy(self):
+        """呼び出し側の変更がキャッシュに影響しないテスト"""
+        self.cache.get_or_load('a', [], self.load([1])).append(2)
+        self.assertEqual(self.cache.get_or_load('a', [], self.load([])), [1])
+
+    def test_ttl_expiration(self):
+        """有効期限切れのテスト"""
+        self.cache.get_or_load('a', [], self.load(1))
+        self.clock.now = 11
+
+        self.assertEqual(self.cache.get_or_load('a', [], self.load(2)), 2)
+        self.assertEqual(self.cache.stats()['expirations'], 1)
+
+    def test_lru_eviction(self):
+        """最も使われていないエントリが追い出されるテスト"""
+        self.cache.get_or_load('a', [], self.load(1))
+        self.cache.get_or_load('b', [], self.load(2))
+        self.cache.get_or_load('a', [], self.load(1))
+        self.cache.get_or_load('c', [], self.load(3))
+
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+        self.assertEqual(self.cache.get_or_load('a', [], self.load(0)), 1)
+        self.assertEqual(self.cache.get_or_load('b', [], self.load(0)), 0)
+
+    def test_invalidate_by_tag(self):
+        """タグ単位の無効化のテスト"""
+        self.cache.get_or_load('a', ['todos'], self.load(1))
+        self.cache.get_or_load('b', ['categories'], self.load(2))
+
+        self.assertEqual(self.cache.invalidate(['todos']), 1)
+        self.assertEqual(self.cache.get_or_load('a', ['todos'], self.load(3)), 3)
+        self.assertEqual(self.cache.get_or_load('b', ['categories'], self.load(0)), 2)
+
+    def test_invalidation_during_load_is_not_cached(self):
+        """読み込み中に無効化された結果はキャッシュしないテスト"""
+        def loader():
+            self.cache.invalidate(['todos'])
+            return 'stale'
+
+        self.assertEqual(self.cache.get_or_load('a', ['todos'], loader), 'stale')
+        self.assertEqual(self.cache.get_or_load('a', ['todos'], self.load('fresh')), 'fresh')
+
+    def test_clear_during_load_is_not_cached(self):
+        """読み込み中に clear() された結果は、まだ索引に無いタグでもキャッシュしないテスト"""
+        def loader():
+            self.cache.clear()
+            return 'stale'
+
+        self.assertEqual(self.cache.get_or_load('a', ['todos'], loader), 'stale')
+        self.assertEqual(self.cache.get_or_load('a', ['todos'], self.load('fresh')), 'fresh')
+
+    def test_null_cache(self):
+        """NullCacheは常に読み込むテスト"""
+        cache = NullCache()
+        cache.get_or_load('a', [], self.load(1))
+        cache.get_or_load('a', [], self.load(1))
+
+        self.assertEqual(self.loads, 2)
+        self.assertFalse(cache.stats()['enabled'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,201 @@
+import asyncio
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from async_repository import AsyncMemoryTodoRepository, AsyncTodoRepository
+from instrumentation import (
+    InstrumentedAsyncTodoRepository, InstrumentedTodoRepository, RepositoryMetrics, normalize_sql
+)
+from repository import MemoryTodoRepository, NeonTodoRepository, TodoRepository, _timed_cursor_class
+from service import TodoService
+
+
+class TestInstrumentedTodoRepository(unittest.TestCase):
+    """InstrumentedTodoRepositoryのテストクラス"""
+
+    def setUp(self):
+        """テスト前の準備"""
+        self.metrics = RepositoryMetrics()
+        self.repository = InstrumentedTodoRepository(MemoryTodoRepository(), self.metrics)
+
+    def test_is_a_todo_repository(self):
+        """TodoRepository として扱え、サービスから利用できるテスト"""
+        self.assertIsInstance(self.repository, TodoRepository)
+        service = TodoService(self.repository)
+        service.add_todo("Todo1")
+        self.assertEqual(service.get_database_info()['repository_class'], "MemoryTodoRepository")
+
+    def test_records_calls_and_rows(self):
+        """呼び出し回数と返却行数が記録されるテスト"""
+        self.repository.add_category("A")
+        self.repository.add_todo("Todo1", [1])
+        self.repository.add_todo("Todo2")
+        self.repository.get_all_todos()
+        self.repository.get_todos_page(limit=1)
+        self.repository.get_statistics()
+        self.repository.get_categories_for_todos([1, 2, 99])
+
+        snapshot = self.metrics.snapshot()
+        # 統計の値や問い合わせたIDの数ではなく、返したカテゴリの件数を数える
+        self.assertEqual(snapshot['get_statistics']['rows'], 0)
+        self.assertEqual(snapshot['get_categories_for_todos']['rows'], 1)
+        self.assertEqual(snapshot['add_todo']['calls'], 2)
+        self.assertEqual(snapshot['get_all_todos']['rows'], 2)
+        self.assertEqual(snapshot['get_todos_page']['rows'], 1)
+        self.assertGreaterEqual(snapshot['get_all_todos']['total_seconds'], 0)
+
+    def test_records_errors(self):
+        """例外は記録した上で送出されるテスト"""
+        wrapped = MagicMock()
+        wrapped.get_all_todos.side_effect = RuntimeError("connection lost")
+        repository = InstrumentedTodoRepository(wrapped, self.metrics)
+
+        with self.assertRaises(RuntimeError):
+            repository.get_all_todos()
+
+        self.assertEqual(self.metrics.snapshot()['get_all_todos']['errors'], 1)
+
+    def test_generator_is_measured_until_exhausted(self):
+        """ジェネレータは読み切った時点で件数が記録されるテスト"""
+        self.repository.bulk_add_todos([{'title': f'Todo{i}'} for i in range(5)])
+
+        todos = list(self.repository.iter_todos(batch_size=2))
+
+        self.assertEqual(len(todos), 5)
+        snapshot = self.metrics.snapshot()['iter_todos']
+        self.assertEqual((snapshot['calls'], snapshot['rows'], snapshot['errors']), (1, 5, 0))
+
+    def test_request_scope(self):
+        """リクエスト内の呼び出しだけが集計されるテスト"""
+        self.repository.add_todo("範囲外")
+        with self.metrics.request_scope() as request:
+            self.repository.get_all_todos()
+            self.repository.get_all_todos()
+            self.metrics.record_query("SELECT  *\n FROM todos", 0.002)
+
+        summary = request.summary()
+        self.assertEqual(summary['calls'], 2)
+        self.assertEqual(summary['by_method']['get_all_todos']['calls'], 2)
+        self.assertEqual(summary['round_trips'], 1)
+        self.assertEqual(summary['queries'][0]['sql'], "SELECT * FROM todos")
+        self.assertIsNone(self.metrics.current_request())
+
+    def test_to_prometheus(self):
+        """Prometheusのテキスト形式で出力されるテスト"""
+        self.repository.get_all_todos()
+        self.metrics.record_query("UPDATE todos SET state = %s", 0.3, error=True)
+
+        text = self.metrics.to_prometheus()
+
+        self.assertIn('todo_repository_calls_total{method="get_all_todos"} 1', text)
+        self.assertIn('todo_repository_call_duration_seconds_bucket{method="get_all_todos",le="+Inf"} 1', text)
+        self.assertIn('todo_repository_call_duration_seconds_count{method="get_all_todos"} 1', text)
+        self.assertIn('todo_db_query_duration_seconds_bucket{command="UPDATE",le="0.25"} 0', text)
+        self.assertIn('todo_db_query_duration_seconds_bucket{command="UPDATE",le="0.5"} 1', text)
+        self.assertIn('todo_db_query_errors_total{command="UPDATE"} 1', text)
+
+    def test_normalize_sql(self):
+        """SQLの空白が詰められるテスト"""
+        self.assertEqual(normalize_sql(b"SELECT 1\n  FROM t"), "SELECT 1 FROM t")
+
+
+class TestNeonQueryHook(unittest.TestCase):
+    """NeonTodoRepository のSQL計測のテストクラス"""
+
+    @patch('repository.psycopg2.connect')
+    def test_queries_are_reported(self, mock_connect):
+        """プールの接続で実行したSQLがメトリクスに記録されるテスト"""
+        with patch.dict(os.environ, {'NEON_DATABASE_URL': 'postgresql://test@localhost/test'}):
+            repository = NeonTodoRepository()
+        metrics = RepositoryMetrics()
+        InstrumentedTodoRepository(repository, metrics)
+
+        conn = repository._get_connection()
+        for listener in conn.query_listeners:
+            listener("SELECT id FROM todos", 0.01, False)
+
+        self.assertEqual(mock_connect.call_args.kwargs['connection_factory'].__name__, "QueryTimingConnection")
+        self.assertIn('todo_db_queries_total{command="SELECT"} 1', metrics.to_prometheus())
+
+    def test_timed_cursor_notifies_listeners(self):
+        """計測付きカーソルが execute の結果をリスナーへ通知するテスト"""
+        class FakeCursor:
+            def __init__(self, connection):
+                self.connection = connection
+
+            def execute(self, query, vars=None):
+                if query == "BROKEN":
+                    raise RuntimeError("syntax error")
+
+        listener = MagicMock()
+        cursor = _timed_cursor_class(FakeCursor)(MagicMock(query_listeners=[listener]))
+
+        cursor.execute("SELECT 1")
+        with self.assertRaises(RuntimeError):
+            cursor.execute("BROKEN")
+
+        self.assertEqual([call.args[0] for call in listener.call_args_list], ["SELECT 1", "BROKEN"])
+        self.assertEqual([call.args[2] for call in listener.call_args_list], [False, True])
+
+
+    def test_named_cursor_fetches_are_reported(self):
+        """名前付きカーソルの反復で、取得ごとの往復が FETCH として通知されるテスト"""
+        class FakeNamedCursor:
+            arraysize = 1
+            itersize = 2
+
+            def __init__(self, connection, name=None):
+                self.connection = connection
+                self.name = name
+                self.rows = [1, 2, 3]
+
+            def fetchmany(self, size):
+                rows, self.rows = self.rows[:size], self.rows[size:]
+                return rows
+
+            def __iter__(self):
+                return iter(self.rows)
+
+        listener = MagicMock()
+        cursor_class = _timed_cursor_class(FakeNamedCursor)
+
+        self.assertEqual(list(cursor_class(MagicMock(query_listeners=[listener]), "todo_stream")), [1, 2, 3])
+        self.assertEqual([call.args[0] for call in listener.call_args_list],
+                         ["FETCH FORWARD 2 FROM todo_stream"] * 3)
+
+        # 名前の無いカーソルの取得はクライアント側だけで完結するため通知しない
+        listener.reset_mock()
+        self.assertEqual(list(cursor_class(MagicMock(query_listeners=[listener]))), [1, 2, 3])
+        listener.assert_not_called()
+
+
+class TestInstrumentedAsyncTodoRepository(unittest.TestCase):
+    """InstrumentedAsyncTodoRepositoryのテストクラス"""
+
+    def test_records_async_calls(self):
+        """非同期メソッドと非同期ジェネレータが計測されるテスト"""
+        metrics = RepositoryMetrics()
+        repository = InstrumentedAsyncTodoRepository(AsyncMemoryTodoRepository(), metrics)
+        self.assertIsInstance(repository, AsyncTodoRepository)
+
+        async def scenario():
+            await repository.bulk_add_todos([{'title': f'Todo{i}'} for i in range(3)])
+            todos = [todo async for todo in repository.iter_todos(batch_size=2)]
+            return todos, await repository.get_all_todos()
+
+        todos, all_todos = asyncio.run(scenario())
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(len(todos), 3)
+        self.assertEqual(snapshot['iter_todos']['rows'], 3)
+        self.assertEqual(snapshot['get_all_todos']['rows'], len(all_todos))
+        self.assertEqual(snapshot['bulk_add_todos']['calls'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+import os
+import sys
+import threading
+import time
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from locks import AtomicCounter, ReadWriteLock
+
+
+class TestReadWriteLock(unittest.TestCase):
+    """ReadWriteLockのテストクラス"""
+
+    def setUp(self):
+        """テスト前の準備"""
+        self.lock = ReadWriteLock()
+
+    def test_readers_run_concurrently(self):
+        """読み込み同士が並行して実行されるテスト"""
+        barrier = threading.Barrier(3, timeout=2)
+
+        def read():
+            with self.lock.read():
+                # 3スレッドが同時に読み込みロックを保持できなければタイムアウトする
+                barrier.wait()
+
+        threads = [threading.Thread(target=read) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertFalse(barrier.broken)
+
+    def test_writer_excludes_readers(self):
+        """書き込み中は読み込みが待たされるテスト"""
+        events = []
+
+        def read():
+            with self.lock.read():
+                events.append("read")
+
+        self.lock.acquire_write()
+        reader = threading.Thread(target=read)
+        reader.start()
+        time.sleep(0.05)
+        events.append("write")
+        self.lock.release_write()
+        reader.join()
+
+        self.assertEqual(events, ["write", "read"])
+
+    def test_waiting_writer_blocks_new_readers(self):
+        """書き込み待ちがある間は新しい読み込みが待たされるテスト"""
+        events = []
+        self.lock.acquire_read()
+
+        def write():
+            with self.lock.write():
+                events.append("write")
+
+        def read():
+            with self.lock.read():
+                events.append("read")
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        time.sleep(0.05)
+        reader = threading.Thread(target=read)
+        reader.start()
+        time.sleep(0.05)
+        self.assertEqual(events, [])
+        self.lock.release_read()
+        writer.join()
+        reader.join()
+
+        self.assertEqual(events, ["write", "read"])
+
+    def test_writer_is_reentrant(self):
+        """書き込みを保持したスレッドが入れ子で取得できるテスト"""
+        with self.lock.write():
+            with self.lock.write():
+                with self.lock.read():
+                    pass
+        # 完全に解放されていれば他のスレッドが取得できる
+        acquired = []
+
+        def write():
+            with self.lock.write():
+                acquired.append(True)
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        thread.join(timeout=1)
+        self.assertEqual(acquired, [True])
+
+    def test_release_write_from_other_thread(self):
+        """保持していないスレッドからの解放はエラーになるテスト"""
+        with self.assertRaises(RuntimeError):
+            self.lock.release_write()
+
+
+class TestAtomicCounter(unittest.TestCase):
+    """AtomicCounterのテストクラス"""
+
+    def test_concurrent_next_is_unique(self):
+        """並行して採番しても重複しないテスト"""
+        counter = AtomicCounter()
+        values = []
+
+        def allocate():
+            values.extend(counter.next() for _ in range(1000))
+
+        threads = [threading.Thread(target=allocate) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(values), list(range(1, 8001)))
+        self.assertEqual(counter.value, 8001)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,251 @@
+import json
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from memory_persistence import AppendOnlyLog, AppendOnlyLogError, DurableMemoryTodoRepository, read_log
+from repository import MemoryTodoRepository, TodoRepositoryFactory
+from service import TodoService
+
+
+class TornFile:
+    """最初の書き込みだけ途中まで書いて失敗するファイル"""
+
+    def __init__(self, file):
+        self.file = file
+        self.torn = False
+
+    def write(self, data):
+        if not self.torn:
+            self.torn = True
+            self.file.write(bytes(data[:len(data) // 2]))
+            raise OSError("No space left on device")
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+class TestDurableMemoryTodoRepository(unittest.TestCase):
+    """DurableMemoryTodoRepositoryのテストクラス"""
+
+    def setUp(self):
+        """テスト前の準備"""
+        self.directory = tempfile.mkdtemp()
+        self.repository = DurableMemoryTodoRepository(self.directory, snapshot_every=0)
+
+    def tearDown(self):
+        """テスト後の後片付け"""
+        self.repository.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def crash_and_reopen(self, **options):
+        """スナップショットを取らずにログだけ閉じ（クラッシュ相当）、同じディレクトリから開き直す"""
+        self.repository._log.close()
+        self.repository = DurableMemoryTodoRepository(self.directory, **options)
+        return self.repository
+
+    def state_of(self, repository):
+        """比較用にリポジトリの内容を取得"""
+        return (
+            repository.get_all_todos(),
+            repository.get_all_categories(),
+            repository.todo_categories,
+            repository.get_category_statistics(),
+            repository.next_todo_id,
+            repository.next_category_id,
+        )
+
+    def populate(self):
+        """全ての種類の更新操作を実行"""
+        self.repository.bulk_add_categories(["仕事", "家"])
+        self.repository.add_category("趣味")
+        self.repository.add_todo("買い物に行く", [1, 2])
+        self.repository.bulk_add_todos([{'title': f"Todo{i}", 'category_ids': [3]} for i in range(6)])
+        self.repository.update_todo_state(1, "done")
+        self.repository.bulk_update_state([2, 3], "done")
+        self.repository.update_state_where("done", "todo", 3)
+        self.repository.delete_todo(4)
+        self.repository.bulk_delete([5, 99])
+        self.repository.delete_where("done", 3)
+
+    def test_replay_log(self):
+        """ログの再生で全ての更新操作が復元されるテスト"""
+        self.populate()
+        expected = self.state_of(self.repository)
+
+        reopened = self.crash_and_reopen()
+
+        self.assertEqual(self.state_of(reopened), expected)
+        self.assertEqual([todo['id'] for todo in reopened.search_todos("買い物")], [1])
+        self.assertEqual(reopened.get_statistics(), self.repository.get_statistics())
+        self.assertTrue(reopened.add_todo("新しいTodo"))
+        self.assertEqual(reopened.get_all_todos()[-1]['id'], expected[4])
+
+    def test_snapshot_and_log_tail(self):
+        """スナップショットとそれ以降のログから復元され、古いファイルが削除されるテスト"""
+        self.repository.bulk_add_todos({'title': f"Todo{i}"} for i in range(5))
+        self.assertIsNotNone(self.repository.snapshot())
+        self.repository.update_todo_state(1, "done")
+        self.repository.delete_todo(2)
+        expected = self.state_of(self.repository)
+
+        files = sorted(os.listdir(self.directory))
+        self.assertEqual(files, ['log-0000000000000006.jsonl', 'snapshot-0000000000000005.json'])
+        reopened = self.crash_and_reopen()
+
+        self.assertEqual(self.state_of(reopened), expected)
+        self.assertEqual(reopened.get_persistence_stats()['records_since_snapshot'], 2)
+
+    def test_snapshot_is_plain_json(self):
+        """スナップショットはJSONで保存され、JSONでないファイルは読み込まずに無視するテスト"""
+        self.repository.add_category("仕事")
+        self.repository.add_todo("Todo1", [1])
+        path = self.repository.snapshot()
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['todos'][0][:2], [1, "Todo1"])
+
+        # pickle などJSONでない内容は実行せず、読み込みエラーとして古い状態（ここでは空）から復元する
+        with open(path, 'wb') as f:
+            f.write(pickle.dumps({'format': 2}))
+        reopened = self.crash_and_reopen()
+        self.assertEqual(reopened.get_all_todos(), [])
+
+    def test_close_writes_snapshot(self):
+        """クローズ時にスナップショットが作成され、次回はログの再生が不要になるテスト"""
+        self.populate()
+        expected = self.state_of(self.repository)
+        self.repository.close()
+
+        self.repository = DurableMemoryTodoRepository(self.directory)
+
+        self.assertEqual(self.state_of(self.repository), expected)
+        self.assertEqual(self.repository.get_persistence_stats()['records_since_snapshot'], 0)
+
+    def test_periodic_snapshot(self):
+        """記録の件数が snapshot_every に達するとスナップショットが作成されるテスト"""
+        self.repository.snapshot_every = 3
+        for i in range(3):
+            self.repository.add_todo(f"Todo{i}")
+        # バックグラウンドのスナップショットが終わるのを待つ
+        with self.repository._snapshot_lock:
+            pass
+
+        self.assertEqual(self.repository.get_persistence_stats()['last_snapshot']['seq'], 3)
+        self.assertIn('snapshot-0000000000000003.json', os.listdir(self.directory))
+
+    def test_unit_of_work(self):
+        """作業単位は1行で記録され、ロールバックした更新は記録されないテスト"""
+        with self.repository.unit_of_work():
+            self.repository.add_todo("Todo1")
+            self.repository.update_todo_state(1, "done")
+        with self.assertRaises(RuntimeError):
+            with self.repository.unit_of_work():
+                self.repository.add_todo("Todo2")
+                raise RuntimeError("rollback")
+        self.repository._log.close()
+
+        records = [record for _, path in sorted((name, os.path.join(self.directory, name))
+                                                for name in os.listdir(self.directory))
+                   for record in read_log(path)]
+        self.assertEqual([record['op'] for record in records], ['batch'])
+        self.assertEqual([record['op'] for record in records[0]['records']], ['todo', 'state'])
+
+        reopened = DurableMemoryTodoRepository(self.directory)
+        self.repository = reopened
+        self.assertEqual([(todo['title'], todo['state']) for todo in reopened.get_all_todos()], [("Todo1", "done")])
+
+    def test_torn_last_line_is_ignored(self):
+        """書き込み途中で終わった末尾の行は無視され、その後の追記は新しいセグメントに書かれるテスト"""
+        self.repository.add_todo("Todo1")
+        self.repository.add_todo("Todo2")
+        self.repository._log.close()
+        path = os.path.join(self.directory, 'log-0000000000000001.jsonl')
+        with open(path, 'rb+') as f:
+            f.truncate(os.path.getsize(path) - 5)
+
+        reopened = self.crash_and_reopen()
+        self.assertEqual([todo['title'] for todo in reopened.get_all_todos()], ["Todo1"])
+        reopened.add_todo("Todo3")
+
+        reopened = self.crash_and_reopen()
+        self.assertEqual([todo['title'] for todo in reopened.get_all_todos()], ["Todo1", "Todo3"])
+
+    def test_fsync_modes(self):
+        """どのfsyncの設定でも書き込んだ内容が読めるテスト"""
+        for fsync in ('always', 'interval', 'never'):
+            with self.subTest(fsync=fsync):
+                directory = tempfile.mkdtemp()
+                try:
+                    log = AppendOnlyLog(directory, 1, fsync=fsync, fsync_interval=0.01)
+                    seq = [log.append({'op': 'delete', 'ids': [i]}) for i in range(10)][-1]
+                    log.wait(seq)
+                    stats = log.stats()
+                    log.close()
+
+                    self.assertEqual((seq, stats['durable_seq'], stats['records']), (10, 10, 10))
+                    self.assertEqual(len(list(read_log(os.path.join(directory, 'log-0000000000000001.jsonl')))), 10)
+                finally:
+                    shutil.rmtree(directory, ignore_errors=True)
+
+        with self.assertRaises(ValueError):
+            AppendOnlyLog(self.directory, 1, fsync='sometimes')
+
+    def test_fsync_error_fails_write(self):
+        """fsyncに失敗した更新操作はエラーになり、記録は書き直されるテスト"""
+        with patch('memory_persistence.WRITE_RETRY_INTERVAL', 10):
+            with patch('memory_persistence.os.fsync', side_effect=OSError("Input/output error")):
+                with self.assertRaises(AppendOnlyLogError):
+                    self.repository.add_todo("Todo1")
+                # 書き込めていない記録がある間はスナップショットを取らない
+                self.assertIsNone(self.repository.snapshot())
+            stats = self.repository.get_persistence_stats()
+            self.assertEqual((stats['durable_seq'], stats['buffered']), (0, 1))
+            self.assertIn("Input/output error", stats['last_error'])
+            self.assertGreaterEqual(stats['errors'], 1)
+
+            reopened = self.crash_and_reopen()
+        self.assertEqual([todo['title'] for todo in reopened.get_all_todos()], ["Todo1"])
+
+    def test_torn_write_is_truncated(self):
+        """途中まで書いて失敗した行を切り詰め、その後の記録が失われないテスト"""
+        self.repository.add_todo("Todo1")
+        self.repository._log._file = TornFile(self.repository._log._file)
+        with patch('memory_persistence.WRITE_RETRY_INTERVAL', 10):
+            with self.assertRaises(AppendOnlyLogError):
+                self.repository.add_todo("Todo2")
+            reopened = self.crash_and_reopen()
+        self.assertEqual([todo['title'] for todo in reopened.get_all_todos()], ["Todo1", "Todo2"])
+
+        reopened.add_todo("Todo3")
+        reopened = self.crash_and_reopen()
+        self.assertEqual([todo['title'] for todo in reopened.get_all_todos()], ["Todo1", "Todo2", "Todo3"])
+
+    def test_factory_and_service(self):
+        """MEMORY_DATA_DIR を指定した場合だけファクトリが永続化付きのリポジトリを作成するテスト"""
+        with patch.dict(os.environ, {'DATABASE_TYPE': 'MEMORY', 'MEMORY_DATA_DIR': ''}):
+            self.assertIs(type(TodoRepositoryFactory.create_repository()), MemoryTodoRepository)
+
+        env = {'DATABASE_TYPE': 'MEMORY', 'MEMORY_DATA_DIR': os.path.join(self.directory, 'factory'),
+               'MEMORY_FSYNC': 'interval', 'MEMORY_SNAPSHOT_EVERY': '10'}
+        with patch.dict(os.environ, env):
+            repository = TodoRepositoryFactory.create_repository()
+            try:
+                self.assertIsInstance(repository, DurableMemoryTodoRepository)
+                self.assertEqual(repository.snapshot_every, 10)
+                self.assertTrue(TodoService(repository).add_todo("Todo1"))
+                info = TodoService(repository).get_database_info()
+                self.assertEqual(info['persistence']['fsync'], 'interval')
+            finally:
+                repository.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
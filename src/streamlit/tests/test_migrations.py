@@ -0,0 +1,141 @@
+import unittest
+from unittest.mock import MagicMock
+import os
+import sys
+import threading
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import migrations
+from migrations import (
+    MIGRATIONS, MIGRATION_LOCK_ID, apply_migrations, apply_state_count_triggers, ensure_schema, pending_migrations
+)
+
+
+class TestMigrations(unittest.TestCase):
+    """スキーマ移行のテストクラス"""
+
+    def setUp(self):
+        """テスト前の準備"""
+        self.connection = MagicMock()
+        self.cursor = MagicMock()
+        self.connection.cursor.return_value.__enter__.return_value = self.cursor
+
+    def executed_sql(self):
+        """実行されたSQLの一覧"""
+        return [call[0][0] for call in self.cursor.execute.call_args_list]
+
+    def test_versions_are_unique_and_ordered(self):
+        """バージョンが重複せず昇順で定義されているテスト"""
+        versions = [version for version, _, _ in MIGRATIONS]
+        self.assertEqual(versions, sorted(set(versions)))
+
+    def test_pending_migrations(self):
+        """未適用の移行だけが返されるテスト"""
+        self.assertEqual([m[0] for m in pending_migrations([])], [1, 2, 3, 4])
+        self.assertEqual([m[0] for m in pending_migrations([1, 2])], [3, 4])
+        self.assertEqual(pending_migrations([1, 2, 3, 4]), [])
+
+    def test_apply_all_migrations(self):
+        """初回はロックを取って全ての移行を適用するテスト"""
+        self.cursor.fetchall.return_value = []
+
+        versions = apply_migrations(self.connection)
+
+        self.assertEqual(versions, [1, 2, 3, 4])
+        self.assertEqual(self.cursor.execute.call_args_list[0][0],
+                         ("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,)))
+        sql = "\n".join(self.executed_sql())
+        self.assertIn("ON todos (state, created_at DESC, id DESC)", sql)
+        self.assertIn("ON todo_categories (category_id, todo_id)", sql)
+        self.assertIn("CREATE TABLE IF NOT EXISTS todo_state_counts", sql)
+        # カウンタのトリガーは counter モードの場合だけ別に設置する
+        self.assertNotIn("CREATE TRIGGER", sql)
+        self.assertIn("USING GIN (title gin_trgm_ops)", sql)
+        self.connection.commit.assert_called_once()
+
+    def test_apply_is_noop_when_up_to_date(self):
+        """適用済みの場合はDDLを実行しないテスト"""
+        self.cursor.fetchall.return_value = [(version,) for version, _, _ in MIGRATIONS]
+
+        versions = apply_migrations(self.connection)
+
+        self.assertEqual(versions, [])
+        self.assertFalse(any("CREATE INDEX" in sql for sql in self.executed_sql()))
+        self.connection.commit.assert_called_once()
+
+    def test_state_count_triggers_follow_mode(self):
+        """counter モードではロックを取って数え直してからトリガーを設置し、それ以外では削除するテスト"""
+        apply_state_count_triggers(self.connection, True)
+        install = self.executed_sql()[-1]
+
+        self.assertEqual(self.cursor.execute.call_args_list[0][0],
+                         ("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,)))
+        self.assertLess(install.index("LOCK TABLE todos IN SHARE ROW EXCLUSIVE MODE"),
+                        install.index("INSERT INTO todo_state_counts"))
+        self.assertLess(install.index("INSERT INTO todo_state_counts"),
+                        install.index("CREATE TRIGGER todos_state_counts_insert"))
+
+        apply_state_count_triggers(self.connection, False)
+        drop = self.executed_sql()[-1]
+
+        self.assertIn("DROP TRIGGER IF EXISTS todos_state_counts_update ON todos", drop)
+        self.assertNotIn("CREATE TRIGGER", drop)
+        self.assertEqual(self.connection.commit.call_count, 2)
+
+    def test_failure_rolls_back(self):
+        """移行に失敗した場合はロールバックして例外を送出するテスト"""
+        self.cursor.fetchall.return_value = [(1,)]
+        self.cursor.execute.side_effect = [None, None, None, Exception("boom")]
+
+        with self.assertRaises(Exception):
+            apply_migrations(self.connection)
+
+        self.connection.rollback.assert_called_once()
+        self.connection.commit.assert_not_called()
+
+
+class TestEnsureSchema(unittest.TestCase):
+    """プロセス内で1回だけ移行を適用する処理のテストクラス"""
+
+    def setUp(self):
+        """テスト前の準備"""
+        migrations._initialized_schemas.clear()
+
+    def tearDown(self):
+        """テスト後の後始末"""
+        migrations._initialized_schemas.clear()
+
+    def test_applies_once_per_key(self):
+        """同じ接続先には1回だけ適用されるテスト"""
+        apply = MagicMock(return_value=[1, 2, 3])
+
+        self.assertEqual(ensure_schema("db1", apply), [1, 2, 3])
+        self.assertEqual(ensure_schema("db1", apply), [])
+        ensure_schema("db2", apply)
+
+        self.assertEqual(apply.call_count, 2)
+
+    def test_concurrent_calls_apply_once(self):
+        """並行して呼び出されても1回だけ適用されるテスト"""
+        apply = MagicMock(return_value=[1])
+        threads = [threading.Thread(target=ensure_schema, args=("db", apply)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        apply.assert_called_once()
+
+    def test_failure_is_raised_and_retried(self):
+        """失敗は例外として送出され、次の呼び出しで再試行されるテスト"""
+        apply = MagicMock(side_effect=[Exception("connection refused"), [1]])
+
+        with self.assertRaises(Exception):
+            ensure_schema("db", apply)
+        self.assertEqual(ensure_schema("db", apply), [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
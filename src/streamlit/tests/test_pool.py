@@ -0,0 +1,152 @@
+import unittest
+from unittest.mock import MagicMock
+import os
+import sys
+import threading
+import time
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from pool import ConnectionPool, PoolClosedError, PoolTimeoutError
+
+
+class FakeConnection:
+    """テスト用の接続"""
+
+    def __init__(self):
+        self.closed = 0
+        self.cursor_mock = MagicMock()
+
+    def cursor(self):
+        return self.cursor_mock
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+class TestConnectionPool(unittest.TestCase):
+    """ConnectionPoolのテストクラス"""
+
+    def setUp(self):
+        """テスト前の準備"""
+        self.created = []
+
+        def connect():
+            conn = FakeConnection()
+            self.created.append(conn)
+            return conn
+
+        self.connect = connect
+
+    def test_reuses_connection(self):
+        """返却した接続が再利用されるテスト"""
+        pool = ConnectionPool(self.connect, min_size=1, max_size=2)
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+
+        self.assertIs(first, second)
+        self.assertEqual(len(self.created), 1)
+        self.assertEqual(pool.stats()['checkouts'], 2)
+
+    def test_warm_up_to_min_size(self):
+        """初回取得時に最小接続数まで接続を作成するテスト"""
+        pool = ConnectionPool(self.connect, min_size=3, max_size=5)
+        self.assertEqual(len(self.created), 0)
+
+        with pool.connection():
+            stats = pool.stats()
+
+        self.assertEqual(stats['size'], 3)
+        self.assertEqual(stats['in_use'], 1)
+
+    def test_max_size_timeout(self):
+        """最大接続数に達した場合にタイムアウトするテスト"""
+        pool = ConnectionPool(self.connect, min_size=0, max_size=1, timeout=0.05)
+        conn = pool.getconn()
+
+        with self.assertRaises(PoolTimeoutError):
+            pool.getconn()
+
+        pool.putconn(conn)
+        self.assertIs(pool.getconn(), conn)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_waiter_receives_returned_connection(self):
+        """待機中のスレッドが返却された接続を受け取るテスト"""
+        pool = ConnectionPool(self.connect, min_size=0, max_size=1, timeout=2)
+        conn = pool.getconn()
+        received = []
+
+        thread = threading.Thread(target=lambda: received.append(pool.getconn()))
+        thread.start()
+        time.sleep(0.05)
+        pool.putconn(conn)
+        thread.join(timeout=2)
+
+        self.assertEqual(received, [conn])
+        self.assertEqual(pool.stats()['waits'], 1)
+
+    def test_closed_connection_is_replaced(self):
+        """切断された接続が取得時に作り直されるテスト"""
+        pool = ConnectionPool(self.connect, min_size=0, max_size=1)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        conn.closed = 1
+
+        new_conn = pool.getconn()
+
+        self.assertIsNot(new_conn, conn)
+        self.assertEqual(pool.stats()['health_check_failures'], 1)
+
+    def test_failed_ping_is_replaced(self):
+        """疎通確認に失敗した接続が作り直されるテスト"""
+        pool = ConnectionPool(self.connect, min_size=0, max_size=1, health_check_interval=0)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        conn.cursor_mock.__enter__.return_value.execute.side_effect = Exception("server closed")
+
+        new_conn = pool.getconn()
+
+        self.assertIsNot(new_conn, conn)
+        self.assertEqual(conn.closed, 1)
+
+    def test_idle_eviction(self):
+        """最小接続数を超える未使用接続が破棄されるテスト"""
+        pool = ConnectionPool(self.connect, min_size=1, max_size=3, max_idle_seconds=0.01)
+        conns = [pool.getconn() for _ in range(3)]
+        for conn in conns:
+            pool.putconn(conn)
+        time.sleep(0.02)
+
+        with pool.connection():
+            pass
+
+        stats = pool.stats()
+        self.assertEqual(stats['size'], 1)
+        self.assertEqual(stats['evicted'], 2)
+
+    def test_close(self):
+        """クローズ後は接続を取得できず、返却された接続も閉じられるテスト"""
+        pool = ConnectionPool(self.connect, min_size=0, max_size=2)
+        idle = pool.getconn()
+        busy = pool.getconn()
+        pool.putconn(idle)
+
+        pool.close()
+        self.assertEqual(idle.closed, 1)
+        with self.assertRaises(PoolClosedError):
+            pool.getconn()
+
+        pool.putconn(busy)
+        self.assertEqual(busy.closed, 1)
+        self.assertEqual(pool.stats()['size'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
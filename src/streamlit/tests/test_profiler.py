@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+import tempfile
+import time
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from instrumentation import InstrumentedTodoRepository, RepositoryMetrics
+from profiler import RerunProfiler, is_profiling_enabled
+from repository import MemoryTodoRepository
+
+
+class TestRerunProfiler(unittest.TestCase):
+    """RerunProfilerのテストクラス"""
+
+    def setUp(self):
+        """テスト前の準備"""
+        self.metrics = RepositoryMetrics()
+        self.repository = InstrumentedTodoRepository(MemoryTodoRepository(), self.metrics)
+
+    def test_enabled_by_env(self):
+        """環境変数で有効・無効が切り替わるテスト"""
+        with patch.dict(os.environ, {'TODO_PROFILE': 'true'}):
+            self.assertTrue(is_profiling_enabled())
+            self.assertTrue(RerunProfiler().enabled)
+        with patch.dict(os.environ, {'TODO_PROFILE': '0'}):
+            self.assertFalse(is_profiling_enabled())
+
+    def test_disabled_records_nothing(self):
+        """無効の場合は何も記録しないテスト"""
+        profiler = RerunProfiler(enabled=False)
+        profiler.start()
+        profiler.start_phase("statistics")
+        profiler.finish()
+
+        self.assertEqual(profiler.timeline(), [])
+        self.assertEqual(profiler.total_ms, 0.0)
+
+    def test_timeline(self):
+        """フェーズとリポジトリ呼び出しが開始順に並ぶテスト"""
+        with self.metrics.request_scope() as request:
+            profiler = RerunProfiler(request, enabled=True)
+            profiler.start()
+            profiler.start_phase("statistics")
+            self.repository.get_statistics()
+            profiler.start_phase("todo_list")
+            time.sleep(0.002)
+            self.repository.get_todos_page()
+            profiler.finish()
+
+        timeline = profiler.timeline()
+        self.assertEqual([(row['kind'], row['name']) for row in timeline], [
+            ('phase', 'statistics'),
+            ('repository', 'get_statistics'),
+            ('phase', 'todo_list'),
+            ('repository', 'get_todos_page'),
+        ])
+        todo_list = timeline[2]
+        self.assertGreaterEqual(todo_list['ms'], 2)
+        self.assertGreaterEqual(timeline[3]['start_ms'], todo_list['start_ms'])
+        self.assertLessEqual(timeline[3]['end_ms'], todo_list['end_ms'])
+        self.assertGreaterEqual(profiler.total_ms, todo_list['end_ms'])
+
+    def test_dump_cprofile_stats(self):
+        """保存先を指定すると cProfile の結果が保存されるテスト"""
+        with tempfile.TemporaryDirectory() as dump_dir:
+            profiler = RerunProfiler(enabled=True, dump_dir=dump_dir)
+            profiler.start()
+            self.repository.get_all_todos()
+            profiler.finish()
+
+            self.assertTrue(os.path.exists(profiler.dump_path))
+            self.assertIn("get_all_todos", profiler.top_functions())
+
+
+if __name__ == '__main__':
+    unittest.main()
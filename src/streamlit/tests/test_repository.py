@@ -2,11 +2,17 @@ import unittest
 from unittest.mock import patch, MagicMock
 import os
 import sys
+import threading
+from typing import List
 
 # srcディレクトリをパスに追加
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from repository import TodoRepository, MemoryTodoRepository, NeonTodoRepository, TodoRepositoryFactory
+from repository import (
+    TodoRepository, MemoryTodoRepository, NeonTodoRepository, TodoRepositoryFactory, UnitOfWorkError,
+    encode_page_cursor, decode_page_cursor
+)
+import migrations
 
 
 class TestMemoryTodoRepository(unittest.TestCase):
@@ -43,6 +49,18 @@ class TestMemoryTodoRepository(unittest.TestCase):
         self.assertFalse(result)
         self.assertEqual(len(self.repository.categories), 1)
     
+    def test_bulk_add(self):
+        """一括追加のテスト"""
+        category_ids = self.repository.bulk_add_categories(["カテゴリ1", " ", "カテゴリ2"])
+        self.assertEqual(category_ids, [1, 2])
+        
+        todo_ids = self.repository.bulk_add_todos(
+            {'title': f"Todo{i}", 'category_ids': [1] if i % 2 else None} for i in range(5)
+        )
+        self.assertEqual(todo_ids, [1, 2, 3, 4, 5])
+        self.assertEqual(len(self.repository.get_filtered_todos("all", 1)), 2)
+        self.assertEqual(self.repository.get_statistics()['total'], 5)
+    
     def test_get_todo_categories(self):
         """Todoカテゴリ取得のテスト"""
         # カテゴリとTodoを作成
@@ -57,6 +75,20 @@ class TestMemoryTodoRepository(unittest.TestCase):
         self.assertIn("カテゴリ1", category_titles)
         self.assertIn("カテゴリ2", category_titles)
     
+    def test_get_categories_for_todos(self):
+        """複数Todoのカテゴリ一括取得のテスト"""
+        self.repository.add_category("カテゴリ1")
+        self.repository.add_category("カテゴリ2")
+        self.repository.add_todo("Todo1", [1, 2])
+        self.repository.add_todo("Todo2", [2])
+        self.repository.add_todo("Todo3")
+        
+        result = self.repository.get_categories_for_todos([1, 2, 3, 999])
+        self.assertEqual([cat['title'] for cat in result[1]], ["カテゴリ1", "カテゴリ2"])
+        self.assertEqual([cat['title'] for cat in result[2]], ["カテゴリ2"])
+        self.assertEqual(result[3], [])
+        self.assertEqual(result[999], [])
+    
     def test_get_filtered_todos(self):
         """フィルター機能のテスト"""
         # テストデータを作成
@@ -77,6 +109,70 @@ class TestMemoryTodoRepository(unittest.TestCase):
         todos = self.repository.get_filtered_todos("todo", 1)
         self.assertEqual(len(todos), 2)
     
+    def test_get_filtered_todos_with_categories(self):
+        """カテゴリ付きTodo取得のテスト"""
+        self.repository.add_category("カテゴリ1")
+        self.repository.add_todo("Todo1", [1])
+        self.repository.add_todo("Todo2")
+        self.repository.update_todo_state(2, "done")
+        
+        todos = self.repository.get_filtered_todos_with_categories()
+        self.assertEqual([todo['title'] for todo in todos], ["Todo1", "Todo2"])
+        self.assertEqual([cat['title'] for cat in todos[0]['categories']], ["カテゴリ1"])
+        self.assertEqual(todos[1]['categories'], [])
+        
+        todos = self.repository.get_filtered_todos_with_categories("done")
+        self.assertEqual([todo['title'] for todo in todos], ["Todo2"])
+        
+        # 保持しているTodoには 'categories' を付与しない
+        self.assertNotIn('categories', self.repository.todos[0])
+    
+    def test_get_todos_page(self):
+        """キーセットページングのテスト"""
+        for i in range(1, 6):
+            self.repository.add_todo(f"Todo{i}")
+        
+        page = self.repository.get_todos_page(limit=2)
+        self.assertEqual([todo['id'] for todo in page['items']], [5, 4])
+        self.assertIsNotNone(page['next_cursor'])
+        
+        # ページの途中で削除されても続きから取得できる
+        self.repository.delete_todo(3)
+        page = self.repository.get_todos_page(limit=2, cursor=page['next_cursor'])
+        self.assertEqual([todo['id'] for todo in page['items']], [2, 1])
+        self.assertIsNone(page['next_cursor'])
+    
+    def test_get_todos_page_with_filters(self):
+        """フィルター付きキーセットページングのテスト"""
+        self.repository.add_category("カテゴリ1")
+        for i in range(1, 11):
+            self.repository.add_todo(f"Todo{i}", [1] if i % 2 == 0 else None)
+        self.repository.update_todo_state(10, "done")
+        
+        page = self.repository.get_todos_page("todo", 1, limit=3, with_categories=True)
+        self.assertEqual([todo['id'] for todo in page['items']], [8, 6, 4])
+        self.assertEqual(page['items'][0]['categories'][0]['title'], "カテゴリ1")
+        
+        page = self.repository.get_todos_page("todo", 1, limit=3, cursor=page['next_cursor'])
+        self.assertEqual([todo['id'] for todo in page['items']], [2])
+        self.assertIsNone(page['next_cursor'])
+        
+        page = self.repository.get_todos_page("todo", limit=20)
+        self.assertEqual(len(page['items']), 9)
+    
+    def test_iter_todos(self):
+        """ストリーミング取得のテスト"""
+        for i in range(1, 8):
+            self.repository.add_todo(f"Todo{i}")
+        
+        todo_ids = [todo['id'] for todo in self.repository.iter_todos(batch_size=3)]
+        self.assertEqual(todo_ids, [7, 6, 5, 4, 3, 2, 1])
+    
+    def test_invalid_page_cursor(self):
+        """不正なページングカーソルのテスト"""
+        with self.assertRaises(ValueError):
+            self.repository.get_todos_page(cursor="invalid")
+    
     def test_update_todo_state(self):
         """Todo状態更新のテスト"""
         self.repository.add_todo("テストTodo")
@@ -116,6 +212,246 @@ class TestMemoryTodoRepository(unittest.TestCase):
         self.assertEqual(stats['done'], 1)
         self.assertEqual(stats['todo'], 1)
 
+    
+    def test_get_category_statistics(self):
+        """カテゴリ別統計情報取得のテスト"""
+        self.repository.add_category("カテゴリ1")
+        self.repository.add_category("カテゴリ2")
+        self.repository.add_todo("Todo1", [1, 2])
+        self.repository.add_todo("Todo2", [1])
+        self.repository.add_todo("Todo3", [1])
+        self.repository.update_todo_state(1, "done")
+        self.repository.update_todo_state(2, "done")
+        self.repository.update_todo_state(2, "todo")
+        self.repository.update_todo_state(3, "done")
+        self.repository.delete_todo(3)
+        
+        stats = self.repository.get_category_statistics()
+        self.assertEqual(stats, [
+            {'id': 1, 'title': "カテゴリ1", 'total': 2, 'todo': 1, 'done': 1},
+            {'id': 2, 'title': "カテゴリ2", 'total': 1, 'todo': 0, 'done': 1},
+        ])
+        self.assertEqual(self.repository.get_statistics(), {'total': 2, 'todo': 1, 'done': 1})
+    
+    def test_search_todos(self):
+        """タイトル検索のテスト"""
+        self.repository.add_category("買い物")
+        self.repository.add_todo("牛乳を買う", [1])
+        self.repository.add_todo("Buy milk")
+        self.repository.add_todo("会議の準備")
+        self.repository.add_todo("牛乳パックを捨てる")
+        self.repository.update_todo_state(4, "done")
+        
+        # 新しい順に部分一致で返す（大文字小文字は区別しない）
+        self.assertEqual([todo['id'] for todo in self.repository.search_todos("牛乳")], [4, 1])
+        self.assertEqual([todo['id'] for todo in self.repository.search_todos("MILK")], [2])
+        # 空白区切りの語は全て含むものだけ
+        self.assertEqual([todo['id'] for todo in self.repository.search_todos("牛乳 買う")], [1])
+        # 1文字の検索語
+        self.assertEqual([todo['id'] for todo in self.repository.search_todos("会")], [3])
+        # bigramが全て含まれても連続していなければ一致しない
+        self.assertEqual(self.repository.search_todos("牛乳捨"), [])
+        self.assertEqual(self.repository.search_todos("  "), [])
+        
+        # フィルター・件数・カテゴリ付与との組み合わせ
+        self.assertEqual([todo['id'] for todo in self.repository.search_todos("牛乳", "done")], [4])
+        self.assertEqual([todo['id'] for todo in self.repository.search_todos("牛乳", filter_category=1)], [1])
+        self.assertEqual(len(self.repository.search_todos("牛乳", limit=1)), 1)
+        results = self.repository.search_todos("牛乳を買", with_categories=True)
+        self.assertEqual(results[0]['categories'][0]['title'], "買い物")
+    
+    def test_search_index_updated_on_delete(self):
+        """削除したTodoが検索結果とインデックスから除かれるテスト"""
+        self.repository.add_todo("牛乳を買う")
+        self.repository.delete_todo(1)
+        
+        self.assertEqual(self.repository.search_todos("牛乳"), [])
+        self.assertEqual(self.repository._search_index, {})
+    
+    def test_bulk_update_state(self):
+        """複数Todoの状態を一括更新するテスト"""
+        self.repository.add_category("仕事")
+        self.repository.bulk_add_todos({'title': f"タスク{i}", 'category_ids': [1]} for i in range(5))
+        self.repository.update_todo_state(1, "done")
+        
+        # 既に完了のTodoと存在しないIDは数えない
+        self.assertEqual(self.repository.bulk_update_state([1, 2, 3, 99], "done"), 2)
+        
+        self.assertEqual(self.repository.get_statistics(), {'total': 5, 'todo': 2, 'done': 3})
+        self.assertEqual(self.repository.get_category_statistics()[0]['done'], 3)
+        self.assertEqual([todo['id'] for todo in self.repository.get_filtered_todos("done")], [1, 2, 3])
+        self.assertEqual(self.repository.bulk_update_state([], "done"), 0)
+    
+    def test_bulk_delete(self):
+        """複数Todoを一括削除するテスト"""
+        self.repository.add_category("仕事")
+        self.repository.bulk_add_todos({'title': f"牛乳{i}", 'category_ids': [1]} for i in range(5))
+        self.repository.update_todo_state(2, "done")
+        
+        self.assertEqual(self.repository.bulk_delete([2, 4, 99]), 2)
+        
+        self.assertEqual(self.repository.get_statistics(), {'total': 3, 'todo': 3, 'done': 0})
+        self.assertEqual(self.repository.get_category_statistics()[0]['total'], 3)
+        self.assertEqual([todo['id'] for todo in self.repository.get_todos_page()['items']], [5, 3, 1])
+        self.assertEqual([todo['id'] for todo in self.repository.search_todos("牛乳")], [5, 3, 1])
+        self.assertEqual(self.repository.get_todo_categories(2), [])
+    
+    def test_update_state_where(self):
+        """フィルター条件に合う全てのTodoの状態を更新するテスト"""
+        self.repository.add_category("仕事")
+        self.repository.add_category("個人")
+        self.repository.add_todo("タスク1", [1])
+        self.repository.add_todo("タスク2", [1])
+        self.repository.add_todo("タスク3", [2])
+        
+        # カテゴリ「仕事」を全て完了にする
+        self.assertEqual(self.repository.update_state_where("done", filter_category=1), 2)
+        self.assertEqual([todo['id'] for todo in self.repository.get_filtered_todos("done")], [1, 2])
+        self.assertEqual(self.repository.update_state_where("done", "todo", 1), 0)
+        
+        # 完了済みを全て未完了に戻す
+        self.assertEqual(self.repository.update_state_where("todo", "done"), 2)
+        self.assertEqual(self.repository.get_statistics()['done'], 0)
+    
+    def test_delete_where(self):
+        """フィルター条件に合う全てのTodoを削除するテスト"""
+        self.repository.add_category("仕事")
+        self.repository.add_todo("タスク1", [1])
+        self.repository.add_todo("タスク2", [1])
+        self.repository.add_todo("タスク3")
+        self.repository.update_state_where("done", filter_category=1)
+        self.repository.update_todo_state(3, "done")
+        
+        # カテゴリ「仕事」の完了済みだけを削除
+        self.assertEqual(self.repository.delete_where("done", 1), 2)
+        self.assertEqual([todo['id'] for todo in self.repository.get_all_todos()], [3])
+        self.assertEqual(self.repository.get_category_statistics()[0]['total'], 0)
+        
+        self.assertEqual(self.repository.delete_where(), 1)
+        self.assertEqual(self.repository.get_todos_page()['items'], [])
+    
+    def test_unit_of_work_commits(self):
+        """作業単位の中の操作がそのまま反映されるテスト"""
+        with self.repository.unit_of_work():
+            category_id = self.repository.bulk_add_categories(["仕事"])[0]
+            self.repository.add_todo("タスク1", [category_id])
+            # 入れ子は外側に合流する
+            with self.repository.unit_of_work():
+                self.repository.update_todo_state(1, "done")
+        
+        self.assertEqual(self.repository.get_todo_categories(1)[0]['title'], "仕事")
+        self.assertEqual(self.repository.get_statistics()['done'], 1)
+    
+    def test_unit_of_work_rolls_back(self):
+        """例外時は作業単位の開始時点の状態とインデックスに戻るテスト"""
+        self.repository.add_category("仕事")
+        self.repository.add_todo("牛乳を買う", [1])
+        self.repository.add_todo("会議の準備", [1])
+        before = (self.repository.get_all_todos(), self.repository.get_category_statistics(),
+                  self.repository.get_todos_page()['items'])
+        
+        with self.assertRaises(RuntimeError):
+            with self.repository.unit_of_work():
+                self.repository.add_todo("牛乳パック", [1])
+                self.repository.update_todo_state(2, "done")
+                self.repository.delete_todo(1)
+                self.repository.add_category("個人")
+                raise RuntimeError("途中で失敗")
+        
+        self.assertEqual((self.repository.get_all_todos(), self.repository.get_category_statistics(),
+                          self.repository.get_todos_page()['items']), before)
+        self.assertEqual(self.repository.get_statistics(), {'total': 2, 'todo': 2, 'done': 0})
+        self.assertEqual([todo['id'] for todo in self.repository.search_todos("牛乳")], [1])
+        self.assertEqual([todo['id'] for todo in self.repository.get_filtered_todos("all", 1)], [1, 2])
+        # 採番済みのIDは戻さない
+        self.assertTrue(self.repository.add_todo("タスク"))
+        self.assertEqual(self.repository.get_all_todos()[-1]['id'], 4)
+    
+    def test_shared_across_threads(self):
+        """複数スレッドから共有しても追加が失われないテスト"""
+        def add_todos(worker: int):
+            for i in range(100):
+                self.repository.add_todo(f"Todo{worker}-{i}")
+        
+        threads = [threading.Thread(target=add_todos, args=(worker,)) for worker in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        todo_ids = [todo['id'] for todo in self.repository.get_all_todos()]
+        self.assertEqual(len(todo_ids), 800)
+        self.assertEqual(len(set(todo_ids)), 800)
+    
+    def test_concurrent_stress(self):
+        """並行した追加・更新・削除と参照で更新の消失・ID重複・不整合が無いテスト"""
+        self.repository.bulk_add_categories([f"カテゴリ{i}" for i in range(4)])
+        writers, todos_per_writer = 8, 150
+        allocated: List[List[int]] = [[] for _ in range(writers)]
+        done_ids: List[List[int]] = [[] for _ in range(writers)]
+        deleted_ids: List[List[int]] = [[] for _ in range(writers)]
+        errors: List[str] = []
+        running = threading.Event()
+        running.set()
+        
+        def write(worker: int):
+            category_ids = [worker % 4 + 1]
+            for i in range(0, todos_per_writer, 10):
+                allocated[worker].extend(self.repository.bulk_add_todos(
+                    {'title': f"Todo{worker}-{j}", 'category_ids': category_ids} for j in range(i, i + 10)
+                ))
+            for index, todo_id in enumerate(allocated[worker]):
+                if index % 2 == 0:
+                    self.assertTrue(self.repository.update_todo_state(todo_id, "done"))
+                    done_ids[worker].append(todo_id)
+                if index % 3 == 0:
+                    self.assertTrue(self.repository.delete_todo(todo_id))
+                    deleted_ids[worker].append(todo_id)
+        
+        def read():
+            while running.is_set():
+                if any(todo['state'] != 'done' for todo in self.repository.get_filtered_todos("done")):
+                    errors.append("状態フィルターの結果に未完了のTodoが含まれる")
+                stats = self.repository.get_statistics()
+                if stats['total'] != stats['todo'] + stats['done']:
+                    errors.append(f"統計情報が不整合: {stats}")
+                for category in self.repository.get_category_statistics():
+                    if not 0 <= category['done'] <= category['total']:
+                        errors.append(f"カテゴリ別統計が不整合: {category}")
+                page = self.repository.get_todos_page(limit=50, with_categories=True)
+                keys = [(todo['created_at'], todo['id']) for todo in page['items']]
+                if keys != sorted(keys, reverse=True):
+                    errors.append("ページの並び順が不正")
+        
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        writer_threads = [threading.Thread(target=write, args=(worker,)) for worker in range(writers)]
+        for thread in readers + writer_threads:
+            thread.start()
+        for thread in writer_threads:
+            thread.join()
+        running.clear()
+        for thread in readers:
+            thread.join()
+        
+        self.assertEqual(errors, [])
+        all_ids = [todo_id for ids in allocated for todo_id in ids]
+        self.assertEqual(len(all_ids), writers * todos_per_writer)
+        self.assertEqual(len(set(all_ids)), len(all_ids))
+        self.assertEqual(self.repository.next_todo_id, len(all_ids) + 1)
+        
+        deleted = {todo_id for ids in deleted_ids for todo_id in ids}
+        done = {todo_id for ids in done_ids for todo_id in ids} - deleted
+        remaining = set(all_ids) - deleted
+        self.assertEqual({todo['id'] for todo in self.repository.get_all_todos()}, remaining)
+        self.assertEqual({todo['id'] for todo in self.repository.get_filtered_todos("done")}, done)
+        self.assertEqual(self.repository.get_statistics(), {
+            'total': len(remaining), 'todo': len(remaining) - len(done), 'done': len(done)
+        })
+        category_stats = self.repository.get_category_statistics()
+        self.assertEqual(sum(category['total'] for category in category_stats), len(remaining))
+        self.assertEqual(sum(category['done'] for category in category_stats), len(done))
+        self.assertEqual(len(list(self.repository.iter_todos(batch_size=100))), len(remaining))
+
 
 class TestTodoRepositoryFactory(unittest.TestCase):
     """TodoRepositoryFactoryのテストクラス"""
@@ -137,6 +473,12 @@ class TestTodoRepositoryFactory(unittest.TestCase):
         """デフォルトリポジトリ作成のテスト"""
         repository = TodoRepositoryFactory.create_repository()
         self.assertIsInstance(repository, MemoryTodoRepository)
+    
+    @patch.dict(os.environ, {'DATABASE_TYPE': 'MYSQL'})
+    def test_unsupported_database_type(self):
+        """未対応のDATABASE_TYPEでは（非同期のファクトリと同じく）エラーになるテスト"""
+        with self.assertRaises(ValueError):
+            TodoRepositoryFactory.create_repository()
 
 
 class TestNeonTodoRepository(unittest.TestCase):
@@ -158,6 +500,24 @@ class TestNeonTodoRepository(unittest.TestCase):
             'NEON_DATABASE_PASSWORD': 'test-pass'
         }):
             self.repository = NeonTodoRepository()
+        # 各操作のSQLだけを検証するため、スキーマ移行は適用済みとして扱う
+        migrations._initialized_schemas.add(self.repository.connection_string)
+        self.addCleanup(migrations._initialized_schemas.discard, self.repository.connection_string)
+    
+    @patch('repository.psycopg2.connect')
+    def test_schema_is_applied_before_first_operation(self, mock_connect):
+        """initialize_schema() を呼び出さなくても、最初の操作の前に1回だけ移行を適用するテスト（Neon）"""
+        mock_connect.return_value = self.mock_connection
+        self.mock_connection.__enter__.return_value = self.mock_connection
+        self.mock_cursor.fetchone.return_value = (0, 0)
+        migrations._initialized_schemas.discard(self.repository.connection_string)
+        
+        with patch.object(self.repository, '_apply_migrations', return_value=[1]) as apply:
+            self.repository.get_statistics()
+            with self.repository.unit_of_work():
+                self.repository.get_statistics()
+        
+        apply.assert_called_once()
     
     def test_get_connection_string(self):
         """接続文字列取得のテスト"""
@@ -173,6 +533,276 @@ class TestNeonTodoRepository(unittest.TestCase):
         result = self.repository.add_todo("テストTodo")
         self.assertTrue(result)
         self.mock_cursor.execute.assert_called()
+    
+    @patch('repository.psycopg2.connect')
+    def test_get_categories_for_todos(self, mock_connect):
+        """複数Todoのカテゴリ一括取得のテスト（Neon）"""
+        mock_connect.return_value.__enter__.return_value = self.mock_connection
+        self.mock_cursor.fetchall.return_value = [
+            {'todo_id': 1, 'id': 10, 'title': 'カテゴリ1', 'created_at': None},
+            {'todo_id': 1, 'id': 11, 'title': 'カテゴリ2', 'created_at': None},
+            {'todo_id': 2, 'id': 11, 'title': 'カテゴリ2', 'created_at': None},
+        ]
+        
+        result = self.repository.get_categories_for_todos([1, 2, 3])
+        
+        # 1回のクエリでまとめて取得する
+        self.assertEqual(self.mock_cursor.execute.call_count, 1)
+        query, params = self.mock_cursor.execute.call_args[0]
+        self.assertIn("ANY(%s)", query)
+        self.assertEqual(params, ([1, 2, 3],))
+        self.assertEqual([cat['id'] for cat in result[1]], [10, 11])
+        self.assertEqual([cat['id'] for cat in result[2]], [11])
+        self.assertEqual(result[3], [])
+    
+    @patch('repository.psycopg2.connect')
+    def test_get_filtered_todos_with_categories(self, mock_connect):
+        """カテゴリ付きTodo取得のテスト（Neon）"""
+        mock_connect.return_value.__enter__.return_value = self.mock_connection
+        self.mock_cursor.fetchall.return_value = [
+            {'id': 1, 'title': 'Todo1', 'state': 'todo', 'created_at': None,
+             'updated_at': None, 'categories': [{'id': 10, 'title': 'カテゴリ1'}]},
+        ]
+        
+        todos = self.repository.get_filtered_todos_with_categories("todo", 10)
+        
+        self.assertEqual(self.mock_cursor.execute.call_count, 1)
+        query, params = self.mock_cursor.execute.call_args[0]
+        self.assertIn("json_agg", query)
+        self.assertEqual(params, ["todo", 10])
+        self.assertEqual(todos[0]['categories'][0]['title'], 'カテゴリ1')
+    
+    @patch('repository.psycopg2.connect')
+    def test_get_todos_page(self, mock_connect):
+        """キーセットページングのテスト（Neon）"""
+        mock_connect.return_value.__enter__.return_value = self.mock_connection
+        self.mock_cursor.fetchall.return_value = [
+            {'id': 3, 'title': 'Todo3', 'state': 'todo', 'created_at': '2025-01-03T00:00:00'},
+            {'id': 2, 'title': 'Todo2', 'state': 'todo', 'created_at': '2025-01-02T00:00:00'},
+            {'id': 1, 'title': 'Todo1', 'state': 'todo', 'created_at': '2025-01-01T00:00:00'},
+        ]
+        cursor = encode_page_cursor('2025-01-04T00:00:00', 4)
+        
+        page = self.repository.get_todos_page("todo", limit=2, cursor=cursor)
+        
+        query, params = self.mock_cursor.execute.call_args[0]
+        self.assertIn("(t.created_at, t.id) < (%s::timestamp, %s)", query)
+        self.assertIn("ORDER BY t.created_at DESC, t.id DESC LIMIT %s", query)
+        self.assertEqual(params, ["todo", '2025-01-04T00:00:00', 4, 3])
+        self.assertEqual([todo['id'] for todo in page['items']], [3, 2])
+        self.assertEqual(decode_page_cursor(page['next_cursor']), ('2025-01-02T00:00:00', 2))
+    
+    @patch('repository.psycopg2.connect')
+    def test_search_todos(self, mock_connect):
+        """タイトル検索のテスト（Neon）"""
+        mock_connect.return_value.__enter__.return_value = self.mock_connection
+        self.mock_cursor.fetchall.return_value = [{'id': 1, 'title': '100%の牛乳'}]
+        
+        todos = self.repository.search_todos("牛乳  100%", "todo", limit=20)
+        
+        query, params = self.mock_cursor.execute.call_args[0]
+        self.assertEqual(query.count("t.title ILIKE %s"), 2)
+        self.assertEqual(params, ["todo", "%牛乳%", "%100\\%%", 20])
+        self.assertEqual(todos, [{'id': 1, 'title': '100%の牛乳'}])
+    
+    @patch('repository.psycopg2.connect')
+    def test_bulk_update_state(self, mock_connect):
+        """一括状態更新を1つのUPDATE文で行うテスト（Neon）"""
+        mock_connect.return_value.__enter__.return_value = self.mock_connection
+        self.mock_cursor.rowcount = 2
+        
+        updated = self.repository.bulk_update_state(iter([1, 2, 3]), "done")
+        
+        query, params = self.mock_cursor.execute.call_args[0]
+        self.assertIn("WHERE id = ANY(%s) AND state <> %s", query)
+        self.assertEqual(params, ("done", [1, 2, 3], "done"))
+        self.assertEqual(self.mock_cursor.execute.call_count, 1)
+        self.assertEqual(updated, 2)
+        self.assertEqual(self.repository.bulk_update_state([], "done"), 0)
+    
+    @patch('repository.psycopg2.connect')
+    def test_bulk_delete(self, mock_connect):
+        """一括削除を1つのDELETE文で行うテスト（Neon）"""
+        mock_connect.return_value.__enter__.return_value = self.mock_connection
+        self.mock_cursor.rowcount = 3
+        
+        deleted = self.repository.bulk_delete([1, 2, 3])
+        
+        self.mock_cursor.execute.assert_called_once_with("DELETE FROM todos WHERE id = ANY(%s)", ([1, 2, 3],))
+        self.assertEqual(deleted, 3)
+    
+    @patch('repository.psycopg2.connect')
+    def test_update_and_delete_where(self, mock_connect):
+        """条件付きの一括更新・削除のテスト（Neon）"""
+        mock_connect.return_value.__enter__.return_value = self.mock_connection
+        self.mock_cursor.rowcount = 4
+        
+        self.assertEqual(self.repository.update_state_where("done", "todo", 7), 4)
+        query, params = self.mock_cursor.execute.call_args[0]
+        self.assertTrue(query.startswith("UPDATE todos t SET state = %s"))
+        self.assertIn("f.category_id = %s", query)
+        self.assertEqual(params, ["done", "todo", 7, "done"])
+        
+        self.assertEqual(self.repository.delete_where("done"), 4)
+        self.assertEqual(self.mock_cursor.execute.call_args[0], ("DELETE FROM todos t WHERE t.state = %s", ["done"]))
+    
+    @patch('repository.psycopg2.connect')
+    def test_unit_of_work_single_transaction(self, mock_connect):
+        """作業単位の中の操作が1つの接続・1回のコミットで行われるテスト（Neon）"""
+        mock_connect.return_value = self.mock_connection
+        self.mock_connection.__enter__.return_value = self.mock_connection
+        self.mock_cursor.fetchone.return_value = {'id': 1}
+        self.mock_cursor.rowcount = 1
+        
+        with self.repository.unit_of_work():
+            self.repository.add_category("仕事")
+            self.repository.add_todo("タスク", [1])
+            self.repository.update_todo_state(1, "done")
+            self.mock_connection.commit.assert_not_called()
+        
+        self.mock_connection.commit.assert_called_once()
+        self.assertEqual(self.repository.get_pool_stats()['checkouts'], 1)
+        # 作業単位の外では操作ごとにコミットされる
+        self.repository.add_category("個人")
+        self.assertEqual(self.mock_connection.commit.call_count, 2)
+    
+    @patch('repository.psycopg2.connect')
+    def test_unit_of_work_rolls_back_on_failure(self, mock_connect):
+        """作業単位の中の操作が失敗すると全体をロールバックするテスト（Neon）"""
+        mock_connect.return_value = self.mock_connection
+        self.mock_connection.__enter__.return_value = self.mock_connection
+        self.mock_cursor.execute.side_effect = [None, Exception("foreign key violation")]
+        
+        with self.assertRaises(UnitOfWorkError):
+            with self.repository.unit_of_work():
+                self.assertTrue(self.repository.add_category("仕事"))
+                self.assertFalse(self.repository.delete_todo(1))
+        
+        self.mock_connection.rollback.assert_called_once()
+        self.mock_connection.commit.assert_not_called()
+    
+    @patch('repository.psycopg2.connect')
+    def test_iter_todos_uses_server_side_cursor(self, mock_connect):
+        """ストリーミング取得で名前付きカーソルを使うテスト（Neon）"""
+        mock_connect.return_value.__enter__.return_value = self.mock_connection
+        self.mock_cursor.__iter__.return_value = iter([{'id': 2}, {'id': 1}])
+        
+        todos = list(self.repository.iter_todos(batch_size=500))
+        
+        self.assertEqual(todos, [{'id': 2}, {'id': 1}])
+        self.assertIn('name', self.mock_connection.cursor.call_args.kwargs)
+        self.assertEqual(self.mock_cursor.itersize, 500)
+    
+    @patch('repository.psycopg2.connect')
+    def test_iter_todos_raises_when_interrupted(self, mock_connect):
+        """ストリーミング取得が途中で失敗した場合に例外が伝わるテスト（Neon）"""
+        mock_connect.return_value.__enter__.return_value = self.mock_connection
+        
+        def rows():
+            yield {'id': 2}
+            raise RuntimeError("connection lost")
+        
+        self.mock_cursor.__iter__.side_effect = lambda: rows()
+        todos = []
+        
+        with self.assertRaises(RuntimeError):
+            for todo in self.repository.iter_todos(batch_size=500):
+                todos.append(todo)
+        self.assertEqual(todos, [{'id': 2}])
+    
+    @patch('repository.psycopg2.connect')
+    def test_get_statistics_single_query(self, mock_connect):
+        """統計情報を1クエリで取得するテスト（Neon）"""
+        mock_connect.return_value.__enter__.return_value = self.mock_connection
+        self.mock_cursor.fetchone.return_value = (5, 2)
+        
+        stats = self.repository.get_statistics()
+        
+        self.assertEqual(stats, {'total': 5, 'todo': 3, 'done': 2})
+        self.assertEqual(self.mock_cursor.execute.call_count, 1)
+        self.assertIn("FILTER (WHERE state = 'done')", self.mock_cursor.execute.call_args[0][0])
+    
+    @patch('repository.psycopg2.connect')
+    def test_get_statistics_counter_mode(self, mock_connect):
+        """カウンタ表から統計情報を取得するテスト（Neon）"""
+        mock_connect.return_value.__enter__.return_value = self.mock_connection
+        self.mock_cursor.fetchone.return_value = (5, 2)
+        self.repository.stats_mode = 'counter'
+        
+        stats = self.repository.get_statistics()
+        
+        self.assertEqual(stats, {'total': 5, 'todo': 3, 'done': 2})
+        self.assertEqual(self.mock_cursor.execute.call_count, 1)
+        self.assertIn("FROM todo_state_counts", self.mock_cursor.execute.call_args[0][0])
+    
+    @patch('repository.execute_values')
+    @patch('repository.psycopg2.connect')
+    def test_bulk_add_todos(self, mock_connect, mock_execute_values):
+        """一括追加がバッチ単位でINSERT・コミットされるテスト（Neon）"""
+        mock_connect.return_value.__enter__.return_value = self.mock_connection
+        mock_execute_values.side_effect = [[(1,), (2,)], None, [(3,)]]
+        
+        todo_ids = self.repository.bulk_add_todos([
+            {'title': 'Todo1', 'category_ids': [10, 11]},
+            {'title': 'Todo2'},
+            {'title': ''},
+            {'title': 'Todo3'},
+        ], batch_size=2)
+        
+        self.assertEqual(todo_ids, [1, 2, 3])
+        # 1バッチ目: Todo + カテゴリ関連付け、2バッチ目: Todoのみ
+        self.assertEqual(mock_execute_values.call_count, 3)
+        self.assertEqual(mock_execute_values.call_args_list[0][0][2], [('Todo1',), ('Todo2',)])
+        self.assertEqual(mock_execute_values.call_args_list[1][0][2], [(1, 10), (1, 11)])
+        self.assertEqual(self.mock_connection.commit.call_count, 2)
+    
+    @patch('repository.psycopg2.connect')
+    def test_connection_is_pooled(self, mock_connect):
+        """複数の呼び出しで接続が再利用されるテスト（Neon）"""
+        mock_connect.return_value.__enter__.return_value = self.mock_connection
+        self.mock_cursor.fetchone.return_value = {'id': 1}
+        
+        self.repository.add_todo("テストTodo1")
+        self.repository.add_todo("テストTodo2")
+        
+        # Todo追加2回でも接続は1回だけ作成される
+        self.assertEqual(mock_connect.call_count, 1)
+        stats = self.repository.get_pool_stats()
+        self.assertEqual(stats['in_use'], 0)
+        self.assertEqual(stats['checkouts'], 2)
+    
+    @patch('repository.psycopg2.connect')
+    def test_no_ddl_on_hot_path(self, mock_connect):
+        """通常の操作ではDDLを実行しないテスト（Neon）"""
+        mock_connect.return_value.__enter__.return_value = self.mock_connection
+        self.mock_cursor.fetchone.return_value = (0, 0)
+        
+        self.repository.get_statistics()
+        
+        self.assertEqual(self.mock_cursor.execute.call_count, 1)
+        self.assertNotIn("CREATE", self.mock_cursor.execute.call_args[0][0])
+    
+    @patch('repository.psycopg2.connect')
+    def test_initialize_schema_shared_across_instances(self, mock_connect):
+        """スキーマ初期化が同じ接続先のインスタンス間で共有されるテスト（Neon）"""
+        mock_connect.return_value = self.mock_connection
+        self.mock_cursor.fetchall.return_value = []
+        migrations._initialized_schemas.clear()
+        try:
+            self.assertEqual(self.repository.initialize_schema(), [1, 2, 3, 4])
+            
+            with patch.dict(os.environ, {
+                'NEON_DATABASE_HOST': 'test-host',
+                'NEON_DATABASE_NAME': 'test-db',
+                'NEON_DATABASE_USER': 'test-user',
+                'NEON_DATABASE_PASSWORD': 'test-pass'
+            }):
+                other_repository = NeonTodoRepository()
+            self.assertEqual(other_repository.initialize_schema(), [])
+            # 2つ目のインスタンスは接続を作成しない
+            self.assertEqual(mock_connect.call_count, 1)
+        finally:
+            migrations._initialized_schemas.clear()
 
 
 if __name__ == '__main__':
@@ -5,6 +5,8 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from typing import Dict, List, Any
 from service import TodoService
+from repository import MemoryTodoRepository
+from cache import TTLCache
 
 
 class TestTodoService:
@@ -250,6 +252,19 @@ class TestTodoService:
         assert len(debug_info['todos']) == 1
         assert len(debug_info['categories']) == 1
     
+    def test_get_debug_info_is_bounded(self):
+        """デバッグ情報は件数と先頭の一部だけを返すテスト"""
+        for i in range(5):
+            self.service.add_todo(f"タスク{i}")
+            self.service.add_category(f"カテゴリ{i}")
+        
+        debug_info = self.service.get_debug_info(sample_size=2)
+        
+        assert debug_info['total_todos'] == 5
+        assert debug_info['total_categories'] == 5
+        assert [todo['title'] for todo in debug_info['todos']] == ["タスク4", "タスク3"]
+        assert len(debug_info['categories']) == 2
+    
     def test_load_and_get_state(self):
         """状態のロードと取得のテスト"""
         # 初期状態を設定
@@ -269,4 +284,111 @@ class TestTodoService:
         assert len(new_service.categories) == 1
         assert new_service.categories[0]['title'] == "仕事"
         assert new_service.next_todo_id == 2
-        assert new_service.next_category_id == 2
\ No newline at end of file
+        assert new_service.next_category_id == 2
+
+class TestTodoServiceCache:
+    """TodoServiceのキャッシュのテストクラス"""
+    
+    def setup_method(self):
+        """各テストメソッドの前に実行されるセットアップ"""
+        self.repository = MemoryTodoRepository()
+        self.service = TodoService(self.repository, cache=TTLCache(maxsize=64, ttl=60))
+    
+    def test_read_is_cached(self):
+        """同じ引数の読み込みがキャッシュされるテスト"""
+        self.service.add_todo("タスク1")
+        self.service.get_filtered_todos("all")
+        
+        # リポジトリを直接変更してもキャッシュされた結果が返る
+        self.repository.add_todo("タスク2")
+        
+        assert len(self.service.get_filtered_todos("all")) == 1
+        assert self.service.get_debug_info()['cache']['hits'] >= 1
+    
+    def test_add_todo_invalidates(self):
+        """Todo追加で一覧と統計が無効化されるテスト"""
+        self.service.add_todo("タスク1")
+        assert self.service.get_statistics()['total'] == 1
+        
+        self.service.add_todo("タスク2")
+        
+        assert self.service.get_statistics()['total'] == 2
+        assert len(self.service.get_filtered_todos("todo")) == 2
+    
+    def test_bulk_operations_invalidate(self):
+        """一括更新・削除で一覧と統計が無効化されるテスト"""
+        for i in range(3):
+            self.service.add_todo(f"タスク{i}")
+        assert self.service.get_statistics()['done'] == 0
+        
+        assert self.service.bulk_update_state([1, 2], "done") == 2
+        assert self.service.get_statistics()['done'] == 2
+        
+        assert self.service.update_state_where("done") == 1
+        assert len(self.service.get_filtered_todos("done")) == 3
+        
+        assert self.service.bulk_delete([1]) == 1
+        assert self.service.delete_where("done") == 2
+        assert self.service.get_statistics()['total'] == 0
+    
+    def test_unit_of_work(self):
+        """作業単位の中ではキャッシュを使わず、終了時にキャッシュを破棄するテスト"""
+        self.service.add_todo("タスク1")
+        assert self.service.get_statistics()['total'] == 1
+        
+        with self.service.unit_of_work() as service:
+            category_id = service.bulk_add_categories(["仕事"])[0]
+            service.add_todo("タスク2", [category_id])
+            assert service.get_statistics()['total'] == 2
+        
+        assert self.service.get_filtered_todos("all", category_id)[0]['title'] == "タスク2"
+        
+        try:
+            with self.service.unit_of_work() as service:
+                service.add_todo("タスク3")
+                raise ValueError("rollback")
+        except ValueError:
+            pass
+        assert self.service.get_statistics()['total'] == 2
+    
+    def test_search_is_invalidated_by_add(self):
+        """検索結果がTodo追加で無効化されるテスト"""
+        self.service.add_todo("牛乳を買う")
+        assert len(self.service.search_todos("牛乳")) == 1
+        
+        self.service.add_todo("牛乳を飲む")
+        
+        assert [todo['title'] for todo in self.service.search_todos("牛乳")] == ["牛乳を飲む", "牛乳を買う"]
+    
+    def test_update_state_keeps_categories(self):
+        """状態更新ではカテゴリ一覧のキャッシュが残るテスト"""
+        self.service.add_category("仕事")
+        self.service.add_todo("タスク", [1])
+        self.service.get_all_categories()
+        self.service.get_filtered_todos("done")
+        
+        self.service.update_todo_state(1, "done")
+        
+        assert len(self.service.get_filtered_todos("done")) == 1
+        misses = self.service.cache.stats()['misses']
+        self.service.get_all_categories()
+        assert self.service.cache.stats()['misses'] == misses
+    
+    def test_add_category_invalidates(self):
+        """カテゴリ追加でカテゴリ一覧が無効化されるテスト"""
+        assert self.service.get_all_categories() == []
+        
+        self.service.add_category("仕事")
+        
+        assert len(self.service.get_all_categories()) == 1
+    
+    def test_delete_todo_invalidates(self):
+        """Todo削除で一覧とカテゴリの関連付けが無効化されるテスト"""
+        self.service.add_category("仕事")
+        self.service.add_todo("タスク", [1])
+        assert len(self.service.get_todo_categories(1)) == 1
+        
+        self.service.delete_todo(1)
+        
+        assert self.service.get_todo_categories(1) == []
+        assert self.service.get_filtered_todos("all") == []
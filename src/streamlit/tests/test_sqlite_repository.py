@@ -0,0 +1,257 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from repository import TodoRepository, TodoRepositoryFactory, UnitOfWorkError
+from service import TodoService
+from sqlite_repository import SqliteTodoRepository
+
+
+class TestSqliteTodoRepository(unittest.TestCase):
+    """SqliteTodoRepositoryのテストクラス"""
+
+    def setUp(self):
+        """テスト前の準備"""
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'todo.sqlite3')
+        self.repository = SqliteTodoRepository(self.path)
+        self.repository.initialize_schema()
+
+    def tearDown(self):
+        """テスト後の後片付け"""
+        self.repository.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_schema(self):
+        """WALモードで、Postgresと同じインデックスが作成されるテスト"""
+        conn = self.repository._get_connection()
+        indexes = {row['name'] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+        self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], 3)
+        self.assertTrue({'idx_todos_created_at_id', 'idx_todos_state_created_at_id',
+                         'idx_todo_categories_category_id_todo_id'} <= indexes)
+        # pg_trgm のタイトル検索インデックスに相当するFTS5表
+        self.assertIsNotNone(conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'todos_title_fts'"
+        ).fetchone())
+
+    def test_add_and_get(self):
+        """追加したTodoとカテゴリが新しい順に取得できるテスト"""
+        self.assertTrue(self.repository.add_category("仕事"))
+        self.assertTrue(self.repository.add_todo("  タスク1  ", [1]))
+        self.assertTrue(self.repository.add_todo("タスク2"))
+        self.assertFalse(self.repository.add_todo("   "))
+
+        todos = self.repository.get_all_todos()
+
+        self.assertEqual([todo['title'] for todo in todos], ["タスク2", "タスク1"])
+        self.assertEqual(self.repository.get_todo_categories(2), [])
+        self.assertEqual(self.repository.get_todo_categories(1)[0]['title'], "仕事")
+        self.assertEqual(self.repository.get_all_categories()[0]['title'], "仕事")
+
+    def test_data_survives_reopen(self):
+        """作り直したリポジトリからも同じデータが読めるテスト"""
+        self.repository.bulk_add_categories(["仕事"])
+        self.repository.add_todo("タスク1", [1])
+        self.repository.close()
+
+        reopened = SqliteTodoRepository(self.path)
+        try:
+            self.assertEqual(reopened.initialize_schema(), [])
+            self.assertEqual(reopened.get_filtered_todos("all", 1)[0]['title'], "タスク1")
+        finally:
+            reopened.close()
+
+    def test_bulk_add(self):
+        """一括追加でIDが入力順に返り、空タイトルはスキップされるテスト"""
+        category_ids = self.repository.bulk_add_categories(["A", " ", "B"])
+        todo_ids = self.repository.bulk_add_todos(
+            [{'title': f"Todo{i}", 'category_ids': category_ids} for i in range(5)] + [{'title': ''}],
+            batch_size=2
+        )
+
+        self.assertEqual(category_ids, [1, 2])
+        self.assertEqual(todo_ids, [1, 2, 3, 4, 5])
+        categories = self.repository.get_categories_for_todos([1, 5, 99])
+        self.assertEqual([category['id'] for category in categories[5]], [1, 2])
+        self.assertEqual(categories[99], [])
+
+    def test_filters_and_statistics(self):
+        """状態・カテゴリのフィルターと統計のテスト"""
+        self.repository.bulk_add_categories(["A", "B"])
+        self.repository.bulk_add_todos([
+            {'title': "Todo1", 'category_ids': [1]},
+            {'title': "Todo2", 'category_ids': [1, 2]},
+            {'title': "Todo3"},
+        ])
+        self.assertTrue(self.repository.update_todo_state(2, "done"))
+        self.assertFalse(self.repository.update_todo_state(99, "done"))
+
+        self.assertEqual([todo['id'] for todo in self.repository.get_filtered_todos("todo", 1)], [1])
+        self.assertEqual([todo['id'] for todo in self.repository.get_filtered_todos("done")], [2])
+        todos = self.repository.get_filtered_todos_with_categories("all", 2)
+        self.assertEqual([category['title'] for category in todos[0]['categories']], ["A", "B"])
+        self.assertEqual(self.repository.get_statistics(), {'total': 3, 'todo': 2, 'done': 1})
+        self.assertEqual(
+            [(row['id'], row['total'], row['done'], row['todo']) for row in self.repository.get_category_statistics()],
+            [(1, 2, 1, 1), (2, 1, 1, 0)]
+        )
+
+    def test_todos_page_and_iter(self):
+        """キーセットページングとストリーム取得のテスト"""
+        self.repository.bulk_add_todos({'title': f"Todo{i}"} for i in range(5))
+
+        first = self.repository.get_todos_page(limit=2, with_categories=True)
+        second = self.repository.get_todos_page(limit=2, cursor=first['next_cursor'])
+        last = self.repository.get_todos_page(limit=2, cursor=second['next_cursor'])
+
+        self.assertEqual([todo['id'] for todo in first['items']], [5, 4])
+        self.assertEqual(first['items'][0]['categories'], [])
+        self.assertEqual([todo['id'] for todo in second['items']], [3, 2])
+        self.assertEqual(([todo['id'] for todo in last['items']], last['next_cursor']), ([1], None))
+        self.assertEqual([todo['id'] for todo in self.repository.iter_todos(batch_size=2)], [5, 4, 3, 2, 1])
+
+    def test_search_todos(self):
+        """部分一致検索（複数語はAND、LIKEの特殊文字はエスケープ）のテスト"""
+        self.repository.bulk_add_todos([
+            {'title': "Buy milk"}, {'title': "会議の資料"}, {'title': "100% done"}, {'title': "a_b"},
+        ])
+
+        self.assertEqual([todo['id'] for todo in self.repository.search_todos("MILK buy")], [1])
+        self.assertEqual([todo['id'] for todo in self.repository.search_todos("資料 会議")], [2])
+        self.assertEqual([todo['id'] for todo in self.repository.search_todos("%")], [3])
+        self.assertEqual([todo['id'] for todo in self.repository.search_todos("_")], [4])
+        self.assertEqual(self.repository.search_todos("   "), [])
+
+    def test_search_uses_title_index(self):
+        """3文字以上の語はFTS5インデックスで絞り込み、削除したTodoは検索されないテスト"""
+        self.repository.bulk_add_todos([{'title': "Buy milk"}, {'title': "Buy bread"}, {'title': "milkshake"}])
+        self.assertTrue(self.repository.delete_todo(3))
+
+        sql, params = self.repository._build_todo_query(search_terms=["milk", "b"])
+        plan = " ".join(row[3] for row in self.repository._get_connection().execute(f"EXPLAIN QUERY PLAN {sql}", params))
+
+        self.assertIn("todos_title_fts", plan)
+        self.assertEqual([todo['id'] for todo in self.repository.search_todos("milk")], [1])
+        self.assertEqual([todo['id'] for todo in self.repository.search_todos("BREAD buy")], [2])
+
+    def test_todos_page_reads_one_snapshot(self):
+        """ページのTodoとカテゴリを同じスナップショットから読むテスト"""
+        self.repository.add_category("仕事")
+        self.repository.add_todo("Todo1", [1])
+        writer = SqliteTodoRepository(self.path)
+        get_categories_for_todos = self.repository.get_categories_for_todos
+
+        def delete_then_read(todo_ids):
+            # Todoを読んだ後、カテゴリを読む前に別の接続が削除する
+            self.assertTrue(writer.delete_todo(1))
+            return get_categories_for_todos(todo_ids)
+
+        try:
+            with patch.object(self.repository, 'get_categories_for_todos', side_effect=delete_then_read):
+                page = self.repository.get_todos_page(with_categories=True)
+        finally:
+            writer.close()
+
+        self.assertEqual([category['title'] for category in page['items'][0]['categories']], ["仕事"])
+        self.assertEqual(self.repository.get_todos_page()['items'], [])
+
+    def test_delete_cascades(self):
+        """Todoの削除で関連付けも削除されるテスト"""
+        self.repository.add_category("A")
+        self.repository.add_todo("Todo1", [1])
+
+        self.assertTrue(self.repository.delete_todo(1))
+        self.assertFalse(self.repository.delete_todo(1))
+        conn = self.repository._get_connection()
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM todo_categories").fetchone()[0], 0)
+
+    def test_bulk_operations(self):
+        """一括更新・一括削除・条件指定の更新と削除のテスト"""
+        self.repository.add_category("A")
+        self.repository.bulk_add_todos([{'title': f"Todo{i}", 'category_ids': [1] if i < 3 else []}
+                                        for i in range(6)])
+
+        self.assertEqual(self.repository.bulk_update_state([1, 2, 99], "done"), 2)
+        self.assertEqual(self.repository.bulk_update_state([1, 2], "done"), 0)
+        self.assertEqual(self.repository.update_state_where("done", "todo", 1), 1)
+        self.assertEqual(self.repository.bulk_delete([4, 99]), 1)
+        self.assertEqual(self.repository.delete_where("done"), 3)
+        self.assertEqual(self.repository.bulk_delete([]), 0)
+
+        self.assertEqual([todo['id'] for todo in self.repository.get_all_todos()], [6, 5])
+
+    def test_unit_of_work(self):
+        """作業単位の中の操作は終了時にまとめてコミットされ、失敗時は全体がロールバックされるテスト"""
+        with self.repository.unit_of_work():
+            category_id = self.repository.bulk_add_categories(["A"])[0]
+            self.repository.add_todo("Todo1", [category_id])
+            with self.repository.unit_of_work():
+                self.repository.update_todo_state(1, "done")
+        self.assertEqual(self.repository.get_statistics()['done'], 1)
+
+        with self.assertRaises(RuntimeError):
+            with self.repository.unit_of_work():
+                self.repository.add_todo("Todo2")
+                raise RuntimeError("rollback")
+
+        with self.assertRaises(UnitOfWorkError):
+            with self.repository.unit_of_work():
+                self.repository.add_todo("Todo3")
+                # 存在しないカテゴリへの関連付けは外部キー制約で失敗する
+                self.assertFalse(self.repository.add_todo("Todo4", [99]))
+
+        self.assertEqual([todo['title'] for todo in self.repository.get_all_todos()], ["Todo1"])
+
+    def test_connection_per_thread(self):
+        """スレッドごとに接続が作られ、他のスレッドの書き込みが読めるテスト"""
+        connections = []
+
+        def worker(i):
+            self.repository.add_todo(f"Todo{i}")
+            connections.append(self.repository._get_connection())
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(set(map(id, connections))), 4)
+        self.assertEqual(self.repository.get_statistics()['total'], 4)
+
+    def test_schema_is_created_on_first_use(self):
+        """initialize_schema() を呼び出さなくても、最初の操作の前にスキーマが作成されるテスト"""
+        repository = SqliteTodoRepository(os.path.join(self.directory, 'fresh.sqlite3'))
+        try:
+            self.assertTrue(repository.add_todo("Todo1"))
+            self.assertEqual([todo['title'] for todo in repository.get_all_todos()], ["Todo1"])
+            self.assertEqual(repository.initialize_schema(), [])
+        finally:
+            repository.close()
+
+    def test_factory_and_service(self):
+        """DATABASE_TYPE=SQLITE でファクトリがSQLiteリポジトリを作成するテスト"""
+        env = {'DATABASE_TYPE': 'SQLITE', 'SQLITE_DATABASE_PATH': os.path.join(self.directory, 'factory.sqlite3')}
+        with patch.dict(os.environ, env):
+            repository = TodoRepositoryFactory.create_repository()
+            service = TodoService(repository)
+            try:
+                self.assertIsInstance(repository, TodoRepository)
+                self.assertEqual(service.initialize_schema(), [1, 2, 3])
+                self.assertTrue(service.add_todo("Todo1"))
+                self.assertEqual(service.get_database_info()['sqlite_path'], env['SQLITE_DATABASE_PATH'])
+            finally:
+                repository.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,276 @@
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from repository import MemoryTodoRepository, TodoRepository, TodoRepositoryFactory
+from service import TodoService
+from write_behind import WriteBehindTodoRepository, write_behind_prometheus
+
+
+class BlockingMemoryTodoRepository(MemoryTodoRepository):
+    """反映（bulk_add_todos）を止めておけるメモリリポジトリ"""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+        self.release.set()
+        self.bulk_calls = []
+
+    def bulk_add_todos(self, todos, batch_size=1000):
+        self.release.wait(5)
+        todos = list(todos)
+        self.bulk_calls.append(len(todos))
+        return super().bulk_add_todos(todos, batch_size)
+
+
+class TestWriteBehindTodoRepository(unittest.TestCase):
+    """WriteBehindTodoRepositoryのテストクラス"""
+
+    def setUp(self):
+        """テスト前の準備"""
+        self.wrapped = BlockingMemoryTodoRepository()
+        self.repository = WriteBehindTodoRepository(self.wrapped, batch_size=10, flush_interval=60,
+                                                    max_pending=20, timeout=0.2)
+
+    def tearDown(self):
+        """テスト後の後片付け"""
+        self.wrapped.release.set()
+        self.repository.close()
+
+    def test_is_a_todo_repository(self):
+        """TodoRepository として扱え、サービスから利用できるテスト"""
+        self.assertIsInstance(self.repository, TodoRepository)
+        service = TodoService(self.repository)
+        self.assertTrue(service.add_todo("Todo1"))
+        self.assertIn('write_behind', service.get_database_info())
+
+    def test_writes_are_queued(self):
+        """書き込みはキューに積まれ、呼び出し元はすぐに戻るテスト"""
+        self.wrapped.release.clear()
+        self.assertTrue(self.repository.add_todo("Todo1"))
+        self.assertTrue(self.repository.add_todo("Todo2"))
+        self.assertFalse(self.repository.add_todo("  "))
+
+        self.assertEqual(self.wrapped.todos, [])
+        self.assertEqual(self.repository.get_write_behind_stats()['pending'], 2)
+
+    def test_read_your_writes(self):
+        """未反映の書き込みが反映を待たずに読み込み結果に重ねられるテスト"""
+        self.wrapped.add_category("仕事")
+        self.wrapped.add_todo("既存1")
+        self.wrapped.add_todo("既存2")
+        self.repository.get_todos_page()
+        self.wrapped.release.clear()
+
+        self.assertTrue(self.repository.add_todo("新規", [1]))
+        self.assertTrue(self.repository.update_todo_state(1, "done"))
+        self.assertTrue(self.repository.delete_todo(2))
+
+        page = self.repository.get_todos_page(with_categories=True)
+        self.assertEqual([(todo['id'], todo['title'], todo['state']) for todo in page['items']],
+                         [(-1, "新規", 'todo'), (1, "既存1", 'done')])
+        self.assertEqual(page['items'][0]['categories'][0]['title'], "仕事")
+        self.assertEqual(self.repository.get_todo_categories(-1)[0]['title'], "仕事")
+        self.assertEqual([todo['id'] for todo in self.repository.search_todos("新")], [-1])
+        self.assertEqual(self.repository.get_all_categories()[0]['title'], "仕事")
+        # 反映を待っていない
+        self.assertEqual(self.wrapped.bulk_calls, [])
+        stats = self.repository.get_write_behind_stats()
+        self.assertEqual((stats['pending'], stats['merged_reads'], stats['flushing_reads']), (3, 4, 0))
+
+        # 反映前に受け取った仮IDへの書き込みは、反映後のIDに読み替える
+        self.assertTrue(self.repository.update_todo_state(-1, "done"))
+        self.wrapped.release.set()
+        self.repository.flush()
+        self.assertTrue(self.repository.delete_todo(-1))
+        self.repository.flush()
+        self.assertEqual([(todo['id'], todo['state']) for todo in self.wrapped.get_all_todos()], [(1, 'done')])
+        # 連続する追加は1回の一括追加にまとめられる
+        self.assertEqual(self.wrapped.bulk_calls, [1])
+
+    def test_statistics_include_pending_additions(self):
+        """統計は未反映の追加を加えて返し、既存のTodoの変更がある場合だけ反映してから数えるテスト"""
+        self.wrapped.add_category("仕事")
+        self.wrapped.add_todo("既存1", [1])
+        self.repository.get_all_todos()
+        self.wrapped.release.clear()
+        self.repository.add_todo("新規1", [1])
+        self.repository.add_todo("新規2")
+        self.repository.update_todo_state(-2, "done")
+
+        self.assertEqual(self.repository.get_statistics(), {'total': 3, 'todo': 2, 'done': 1})
+        self.assertEqual([(row['total'], row['todo']) for row in self.repository.get_category_statistics()],
+                         [(2, 2)])
+        self.assertEqual(self.wrapped.bulk_calls, [])
+
+        self.wrapped.release.set()
+        self.repository.update_todo_state(1, "done")
+        self.assertEqual(self.repository.get_statistics(), {'total': 3, 'todo': 1, 'done': 2})
+        self.assertEqual(self.repository.get_write_behind_stats()['flushing_reads'], 1)
+
+    def test_state_filter_flushes_pending_state_changes(self):
+        """未反映の状態変更がある中で状態を絞り込む場合は、反映してから読むテスト"""
+        self.wrapped.add_todo("Todo1")
+        self.repository.get_todos_page()
+        self.repository.update_todo_state(1, "done")
+
+        page = self.repository.get_todos_page(filter_state="done")
+
+        self.assertEqual([todo['id'] for todo in page['items']], [1])
+        self.assertEqual(self.repository.get_write_behind_stats()['flushing_reads'], 1)
+
+    def test_unknown_ids_are_not_queued(self):
+        """存在を確認できないIDへの書き込みは直接行い、存在しないIDには False を返すテスト"""
+        self.wrapped.add_todo("Todo1")
+
+        self.assertFalse(self.repository.update_todo_state(99, "done"))
+        self.assertFalse(self.repository.delete_todo(99))
+        self.assertFalse(self.repository.update_todo_state(-5, "done"))
+        # 読み込んでいないが存在するTodoは直接更新する
+        self.assertTrue(self.repository.update_todo_state(1, "done"))
+        self.assertEqual(self.wrapped.get_all_todos()[0]['state'], "done")
+        self.assertEqual(self.repository.get_write_behind_stats()['enqueued'], 0)
+
+        # 削除をキューに積んだTodoは存在しないものとして扱う
+        self.assertTrue(self.repository.delete_todo(1))
+        self.assertFalse(self.repository.delete_todo(1))
+        self.assertFalse(self.repository.update_todo_state(1, "todo"))
+        self.assertEqual(self.wrapped.get_all_todos(), [])
+
+    def test_flush_on_batch_size(self):
+        """batch_size 件たまると読み込みを待たずに反映されるテスト"""
+        for i in range(10):
+            self.repository.add_todo(f"Todo{i}")
+
+        self.assertTrue(self.repository.flush(timeout=5))
+        self.assertEqual(self.wrapped.bulk_calls, [10])
+
+    def test_flush_on_interval(self):
+        """flush_interval 秒経つと反映されるテスト"""
+        repository = WriteBehindTodoRepository(self.wrapped, batch_size=10, flush_interval=0.01)
+        try:
+            repository.add_todo("Todo1")
+            for _ in range(500):
+                if self.wrapped.bulk_calls:
+                    break
+                threading.Event().wait(0.01)
+            self.assertEqual(self.wrapped.bulk_calls, [1])
+        finally:
+            repository.close()
+
+    def test_backpressure(self):
+        """キューが一杯になると書き込み側が待たされ、空かなければ失敗するテスト"""
+        self.wrapped.release.clear()
+        results = [self.repository.add_todo(f"Todo{i}") for i in range(31)]
+
+        # 10件は反映中、20件はキューの中
+        self.assertTrue(all(results[:30]))
+        self.assertFalse(results[30])
+        stats = self.repository.get_write_behind_stats()
+        self.assertEqual((stats['pending'], stats['in_flight'], stats['timeouts']), (20, 10, 1))
+
+        self.wrapped.release.set()
+        self.assertEqual(self.repository.get_statistics()['total'], 30)
+
+    def test_failed_flush_is_applied_one_by_one(self):
+        """一括の反映に失敗した場合は1件ずつ反映し直すテスト"""
+        added = []
+
+        def bulk_add_todos(todos, batch_size=1000):
+            todos = list(todos)
+            if len(todos) > 1:
+                raise RuntimeError("foreign key violation")
+            added.append((todos[0]['title'], todos[0]['category_ids']))
+            return [len(added)]
+
+        wrapped = MagicMock()
+        wrapped.bulk_add_todos.side_effect = bulk_add_todos
+        repository = WriteBehindTodoRepository(wrapped, batch_size=10, flush_interval=60)
+        try:
+            repository.add_todo("Todo1", [1])
+            repository.add_todo("Todo2")
+            repository.update_todo_state(-2, "done")
+            repository.flush()
+        finally:
+            repository.close()
+
+        self.assertEqual(added, [("Todo1", [1]), ("Todo2", [])])
+        # 仮IDは1件ずつ反映したTodoのIDに読み替える
+        wrapped.update_todo_state.assert_called_once_with(2, "done")
+        self.assertEqual(repository.get_write_behind_stats()['fallbacks'], 1)
+
+    def test_failed_writes_are_retried_then_dead_lettered(self):
+        """1件ずつの反映は再試行し、それでも失敗した書き込みはデッドレターに残るテスト"""
+        wrapped = MagicMock()
+        wrapped.get_all_todos.return_value = [{'id': 99, 'title': "Todo99", 'state': 'todo'}]
+        # 一括の反映は失敗し、Todo1 は2回目で成功、Todo2 は追加されない
+        wrapped.bulk_add_todos.side_effect = [RuntimeError("connection lost"), RuntimeError("connection lost"), [1], []]
+        wrapped.bulk_update_state.side_effect = RuntimeError("connection lost")
+        # 読み込んだ後に別のプロセスが削除したTodoの更新はエラー無しで False になる
+        wrapped.update_todo_state.return_value = False
+        repository = WriteBehindTodoRepository(wrapped, batch_size=10, flush_interval=60,
+                                               max_retries=2, retry_backoff=0.001)
+        try:
+            repository.get_all_todos()
+            repository.add_todo("Todo1")
+            repository.add_todo("Todo2")
+            repository.update_todo_state(99, "done")
+            repository.flush()
+
+            stats = repository.get_write_behind_stats()
+            dead_letters = repository.get_dead_letters()
+            metrics = write_behind_prometheus()
+        finally:
+            repository.close()
+
+        self.assertEqual(wrapped.bulk_add_todos.call_count, 4)
+        self.assertEqual((stats['retries'], stats['missing'], stats['dropped'], stats['dead_letters']), (1, 1, 1, 1))
+        self.assertEqual([(letter['method'], letter['args']) for letter in dead_letters], [('add_todo', ["Todo2", []])])
+        self.assertIn('todo_write_behind_operations_total{outcome="dropped"} 1', metrics)
+        self.assertIn('todo_write_behind_dead_letters 1', metrics)
+
+    def test_unit_of_work_writes_directly(self):
+        """作業単位の中の書き込みはキューを通さず、包んだリポジトリの作業単位で行われるテスト"""
+        self.repository.add_todo("Todo1")
+        with self.assertRaises(RuntimeError):
+            with self.repository.unit_of_work():
+                self.assertEqual(len(self.wrapped.todos), 1)
+                self.repository.add_todo("Todo2")
+                self.assertEqual(len(self.wrapped.todos), 2)
+                raise RuntimeError("rollback")
+
+        self.assertEqual([todo['title'] for todo in self.repository.get_all_todos()], ["Todo1"])
+
+    def test_close_flushes(self):
+        """クローズ時に残りの書き込みが反映され、以降は直接書き込むテスト"""
+        self.repository.add_todo("Todo1")
+        self.repository.close()
+
+        self.assertEqual(len(self.wrapped.todos), 1)
+        self.assertTrue(self.repository.add_todo("Todo2"))
+        self.assertEqual(len(self.wrapped.todos), 2)
+        self.assertTrue(self.repository.get_write_behind_stats()['closed'])
+
+    @patch('repository.psycopg2.connect')
+    def test_factory(self, mock_connect):
+        """環境変数で有効にするとファクトリがNeonリポジトリを包むテスト"""
+        env = {'DATABASE_TYPE': 'NEON', 'NEON_DATABASE_URL': 'postgresql://test@localhost/test',
+               'TODO_WRITE_BEHIND': 'true', 'TODO_WRITE_BEHIND_BATCH_SIZE': '50'}
+        with patch.dict(os.environ, env):
+            repository = TodoRepositoryFactory.create_repository()
+        try:
+            self.assertIsInstance(repository, WriteBehindTodoRepository)
+            self.assertEqual(repository.batch_size, 50)
+            self.assertEqual(type(repository.wrapped).__name__, "NeonTodoRepository")
+            self.assertIn('checkouts', repository.get_pool_stats())
+        finally:
+            repository.close()
+
+
+if __name__ == '__main__':
+    unittest.main()